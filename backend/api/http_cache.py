@@ -0,0 +1,103 @@
+import time
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.http.response import HttpResponseBase
+from django.utils.cache import get_conditional_response
+from rest_framework.renderers import JSONRenderer
+
+from core.metrics import response_cache_results
+
+# -----------------------------
+#  VERSIONED GET RESPONSES
+# -----------------------------
+# Read-mostly endpoints (skills list, me, my skills, user detail) are
+# versioned: every resource they read has a version number in the
+# "response_versions" cache, bumped by api/signals.py after each committed
+# write.
+#
+#   ETag           built from the versions (time_ns stamps) -> If-None-Match
+#                  answers 304
+#   body           rendered JSON, cached in-process ("responses") under the
+#                  same versions, so a hit runs neither the queries nor the
+#                  serializer
+#
+# The versions must be shared by every process writing or serving the data
+# (ASGI workers, manage.py, the shell), or a process would keep answering
+# 304 for data another one changed; see CACHES in core/settings.py. Writes
+# that send no signals (bulk_create, update(), raw SQL) call bump_versions()
+# themselves.
+#
+# Like the recommendation cache, a lost or expired version key restarts from
+# the clock, which can only make a cached response or ETag look stale. The
+# key is only stored once a response was built, so 404s leave nothing.
+RESPONSE_CACHE = "responses"
+VERSION_CACHE = "response_versions"
+
+SKILL_CATALOG = "skill_catalog"  # names/ids of all skills
+USER_VERSION = "user:{}"  # a user's account, profile and skill rows
+
+_renderer = JSONRenderer()
+
+
+def user_version_key(user_id):
+    return USER_VERSION.format(user_id)
+
+
+def bump_versions(*keys):
+    """
+    Call after the write is committed (transaction.on_commit).
+    """
+    cache = caches[VERSION_CACHE]
+    current = cache.get_many(keys)
+    cache.set_many(
+        {key: max(time.time_ns(), current.get(key, 0) + 1) for key in keys}
+    )
+
+
+def versioned_response(request, name, version_keys, build):
+    """
+    GET response for a resource that only changes with version_keys.
+
+    name identifies the response among those with the same versions
+    (e.g. "user-detail:5"); build() returns the data to serialize, or
+    a Response (errors), which is returned as is and never cached.
+    """
+    versions_cache = caches[VERSION_CACHE]
+    # taken before build(): a write committed meanwhile bumps past it
+    stamp = time.time_ns()
+    found = versions_cache.get_many(version_keys)
+    versions = [found.get(key, stamp) for key in version_keys]
+    etag = '"%s-%s"' % (name, "-".join(str(v) for v in versions))
+
+    headers = {
+        # no Last-Modified: whole seconds can't tell two writes apart
+        "ETag": etag,
+        # per user, and always revalidated (cheap: usually a 304)
+        "Cache-Control": "private, no-cache",
+    }
+
+    not_modified = get_conditional_response(request._request, etag=etag)
+    if not_modified is not None:
+        response_cache_results.inc("not_modified")
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    cache = caches[RESPONSE_CACHE]
+    body_key = f"body:{etag}"
+    body = cache.get(body_key)
+    if body is None:
+        data = build()
+        if isinstance(data, HttpResponseBase):
+            return data  # e.g. a 404: no version is stored for it
+        body = _renderer.render(data)
+        cache.set(body_key, body)
+        response_cache_results.inc("miss")
+    else:
+        response_cache_results.inc("hit")
+
+    for key in version_keys:
+        if key not in found:
+            versions_cache.add(key, stamp)
+    return HttpResponse(body, content_type="application/json", headers=headers)
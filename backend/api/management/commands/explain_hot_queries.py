@@ -0,0 +1,117 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import OuterRef, Q, Subquery
+
+from api.models import Conversation, LearningRequest, UserSkillHave, UserSkillWant
+from api.pagination import NewestFirstCursorPagination
+from api.services import ACTIVE_REQUEST_STATUSES
+from chat.models import Message
+
+# any ids do: the plan depends on the shape of the query, not the values
+USER_ID = 1
+OTHER_ID = 2
+PAGE = NewestFirstCursorPagination.page_size + 1
+ORDER = NewestFirstCursorPagination.ordering
+
+
+def _connections():
+    conversation = Conversation.objects.filter(
+        Q(user1=OuterRef("from_user"), user2=OuterRef("to_user"))
+        | Q(user1=OuterRef("to_user"), user2=OuterRef("from_user"))
+    ).order_by("id").values("id")[:1]
+    return (
+        LearningRequest.objects.filter(status="accepted")
+        .filter(Q(from_user_id=USER_ID) | Q(to_user_id=USER_ID))
+        .annotate(conversation_id=Subquery(conversation))
+        .order_by(*ORDER)[:PAGE]
+    )
+
+
+# name -> queryset, one per request-path query that has to stay indexed
+HOT_QUERIES = {
+    "requests.incoming": lambda: (
+        LearningRequest.objects.filter(to_user_id=USER_ID)
+        .select_related("from_user", "to_user")
+        .order_by(*ORDER)[:PAGE]
+    ),
+    "requests.outgoing": lambda: (
+        LearningRequest.objects.filter(from_user_id=USER_ID)
+        .select_related("from_user", "to_user")
+        .order_by(*ORDER)[:PAGE]
+    ),
+    "requests.duplicate_check": lambda: LearningRequest.objects.filter(
+        from_user_id=USER_ID,
+        to_user_id=OTHER_ID,
+        status__in=["pending", "accepted"],
+    ),
+    "requests.exclusions": lambda: (
+        LearningRequest.objects.filter(status__in=ACTIVE_REQUEST_STATUSES)
+        .order_by()
+        .filter(Q(from_user_id__in=[USER_ID]) | Q(to_user_id__in=[USER_ID]))
+        .values_list("from_user_id", "to_user_id")
+    ),
+    "connections": _connections,
+    "chat.history": lambda: (
+        Message.objects.filter(room_id="room").order_by(*ORDER)[:PAGE]
+    ),
+    "skills.have": lambda: UserSkillHave.objects.filter(user_id=USER_ID),
+    "skills.want": lambda: UserSkillWant.objects.filter(user_id=USER_ID),
+    "skills.have_pair": lambda: UserSkillHave.objects.filter(
+        user_id=USER_ID, skill_id=OTHER_ID
+    ),
+}
+
+# SQLite: "SCAN api_learningrequest" (no index); PostgreSQL: "Seq Scan on ..."
+FULL_SCAN = re.compile(r"(\bSCAN (?!.*\bUSING\b).*|\bSeq Scan on\b.*)")
+SORT_STEP = re.compile(r"(USE TEMP B-TREE FOR ORDER BY|\bSort\b)")
+
+
+def full_scans(plan):
+    """
+    Plan lines that read a whole table.
+    """
+    return [
+        line.strip() for line in plan.splitlines() if FULL_SCAN.search(line)
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        "Run EXPLAIN on the hot request-path queries and fail if any of them "
+        "falls back to a full table scan (run after adding/removing indexes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--verbose-plans",
+            action="store_true",
+            help="Print the whole plan of every query.",
+        )
+
+    def handle(self, *args, **options):
+        failed = []
+        for name, build in HOT_QUERIES.items():
+            plan = build().explain()
+            scans = full_scans(plan)
+
+            if scans:
+                failed.append(name)
+                self.stdout.write(self.style.ERROR(f"FULL SCAN  {name}"))
+                for line in scans:
+                    self.stdout.write(f"    {line}")
+            elif SORT_STEP.search(plan):
+                self.stdout.write(self.style.WARNING(f"sort       {name}"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"ok         {name}"))
+
+            if options["verbose_plans"]:
+                for line in plan.splitlines():
+                    self.stdout.write(f"    {line}")
+
+        if failed:
+            raise CommandError(
+                f"{len(failed)} hot quer{'y' if len(failed) == 1 else 'ies'} "
+                f"without an index on {connection.vendor}: {', '.join(failed)}"
+            )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.search import rebuild_search_index, search_index_available
+
+
+class Command(BaseCommand):
+    help = (
+        "Rewrite the user search index (api_user_search) from the user and "
+        "skill tables, e.g. after bulk imports that bypassed the signals."
+    )
+
+    def handle(self, *args, **options):
+        if not search_index_available():
+            self.stdout.write("No search index on this database, nothing to do.")
+            return
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            count = rebuild_search_index()
+        self.stdout.write(
+            f"Indexed {count} users in {time.perf_counter() - started:.2f}s."
+        )
@@ -0,0 +1,72 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.models import UserSkillWant
+from api.services import get_recommendations_for_users
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute mentor recommendations for many users at once "
+        "(nightly digests, suggested-pairs report). "
+        "Writes one JSON object per line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="user_ids",
+            help="Learner id (repeatable). Default: every user who wants a skill.",
+        )
+        parser.add_argument("--top-k", type=int, default=5)
+        parser.add_argument("--min-score", type=float, default=0.0)
+        parser.add_argument(
+            "--mutual",
+            action="store_true",
+            help="Rank swap partners (both directions) instead of mentors.",
+        )
+        parser.add_argument(
+            "--output",
+            help="File to write to (default: stdout).",
+        )
+
+    def handle(self, *args, **options):
+        user_ids = options["user_ids"]
+        if not user_ids:
+            user_ids = list(
+                UserSkillWant.objects
+                .values_list("user_id", flat=True)
+                .distinct()
+                .order_by("user_id")
+            )
+
+        results = get_recommendations_for_users(
+            user_ids,
+            top_k=options["top_k"],
+            min_score=options["min_score"],
+            mutual=options["mutual"],
+        )
+
+        out = open(options["output"], "w") if options["output"] else self.stdout
+        try:
+            for user_id in user_ids:
+                out.write(
+                    json.dumps(
+                        {
+                            "user_id": user_id,
+                            "recommendations": [
+                                {"id": mentor_id, "score": score}
+                                for mentor_id, score in results[user_id]
+                            ],
+                        }
+                    )
+                    + "\n"
+                )
+        finally:
+            if out is not self.stdout:
+                out.close()
+
+        self.stderr.write(f"Scored {len(user_ids)} users.")
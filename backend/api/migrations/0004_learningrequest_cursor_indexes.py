@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_userprofile'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='learningrequest',
+            index=models.Index(fields=['to_user', '-created_at', '-id'], name='lr_to_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='learningrequest',
+            index=models.Index(fields=['from_user', '-created_at', '-id'], name='lr_from_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def drop_duplicate_skill_rows(apps, schema_editor):
+    """
+    Keep the newest row per (user, skill) so the unique constraints can be
+    added. The matcher already used the last row's level for duplicates.
+    """
+    for model_name in ("UserSkillHave", "UserSkillWant"):
+        model = apps.get_model("api", model_name)
+        keep = (
+            model.objects.values("user", "skill")
+            .annotate(last_id=Max("id"))
+            .values_list("last_id", flat=True)
+        )
+        model.objects.exclude(id__in=list(keep)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_learningrequest_cursor_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_skill_rows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='learningrequest',
+            index=models.Index(fields=['from_user', 'to_user', 'status'], name='lr_pair_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='userskillhave',
+            constraint=models.UniqueConstraint(fields=('user', 'skill'), name='unique_user_skill_have'),
+        ),
+        migrations.AddConstraint(
+            model_name='userskillwant',
+            constraint=models.UniqueConstraint(fields=('user', 'skill'), name='unique_user_skill_want'),
+        ),
+    ]
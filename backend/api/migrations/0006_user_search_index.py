@@ -0,0 +1,48 @@
+from django.db import migrations
+
+# FTS5 side table for api/search.py (SQLite only; other databases keep
+# the substring scan). rowid is the user id.
+CREATE_SQL = """
+CREATE VIRTUAL TABLE api_user_search USING fts5(
+    username, full_name, teaches, wants,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '1 2 3'
+)
+"""
+
+SKILLS_SQL = """coalesce((
+    SELECT group_concat(s.name, ' ') FROM {table} x
+    JOIN api_skill s ON s.id = x.skill_id WHERE x.user_id = u.id
+), '')"""
+
+POPULATE_SQL = f"""
+INSERT INTO api_user_search(rowid, username, full_name, teaches, wants)
+SELECT u.id, u.username, u.first_name || ' ' || u.last_name,
+       {SKILLS_SQL.format(table="api_userskillhave")},
+       {SKILLS_SQL.format(table="api_userskillwant")}
+FROM auth_user u
+"""
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(CREATE_SQL)
+    schema_editor.execute(POPULATE_SQL)
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute("DROP TABLE api_user_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_skill_uniqueness_and_request_pair_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+    ]
@@ -27,6 +27,14 @@ class UserSkillHave(models.Model):
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
     level = models.CharField(max_length=20, choices=LEVEL_CHOICES)
 
+    class Meta:
+        constraints = [
+            # one level per skill; also the (user, skill) lookup index
+            models.UniqueConstraint(
+                fields=["user", "skill"], name="unique_user_skill_have"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} has {self.skill.name} ({self.level})"
 
@@ -39,6 +47,13 @@ class UserSkillWant(models.Model):
     )
     skill = models.ForeignKey(Skill, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "skill"], name="unique_user_skill_want"
+            ),
+        ]
+
     def __str__(self):
         return f"{self.user.username} wants {self.skill.name}"
 
@@ -71,6 +86,22 @@ class LearningRequest(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # inbox / outbox cursor pages: WHERE user = ? ORDER BY created_at, id
+            models.Index(
+                fields=["to_user", "-created_at", "-id"],
+                name="lr_to_user_created_idx",
+            ),
+            models.Index(
+                fields=["from_user", "-created_at", "-id"],
+                name="lr_from_user_created_idx",
+            ),
+            # duplicate check on create: from_user, to_user, status IN (...)
+            models.Index(
+                fields=["from_user", "to_user", "status"],
+                name="lr_pair_status_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.from_user.username} -> {self.to_user.username} ({self.status})"
@@ -0,0 +1,17 @@
+from rest_framework.pagination import CursorPagination
+
+
+# -----------------------------
+#  CURSOR (KEYSET) PAGINATION
+# -----------------------------
+# The cursor encodes the last created_at seen, so page N costs the same
+# as page 1 (no OFFSET scan) and rows inserted meanwhile don't shift pages.
+class NewestFirstCursorPagination(CursorPagination):
+    """
+    Newest rows first; ?cursor=<next/previous link>, ?page_size=<n>.
+    """
+
+    ordering = ("-created_at", "-id")
+    page_size = 50
+    page_size_query_param = "page_size"
+    max_page_size = 200
@@ -0,0 +1,193 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+
+from .models import Skill, UserSkillHave, UserSkillWant
+
+User = get_user_model()
+
+
+# -----------------------------
+#  USER SEARCH INDEX
+# -----------------------------
+# On SQLite, users are searched through an FTS5 side table (created by
+# migration 0006) instead of LIKE '%q%' scans over auth_user:
+#
+#   rowid      user id
+#   username   "john_doe" -> tokens john, doe
+#   full_name  first + last name
+#   teaches    names of the skills the user has
+#   wants      names of the skills the user wants
+#
+# Tokens are case- and accent-insensitive (remove_diacritics) and every
+# query token is a prefix, so "jo" finds "José" while the user is still
+# typing. api/signals.py keeps rows in sync with User and skill writes;
+# `manage.py rebuild_user_search` rebuilds the whole table.
+SEARCH_TABLE = "api_user_search"
+
+# Ranking is by tiers, each one a LIMIT query that stops at the first
+# matches instead of scoring every matching row (a one-letter prefix
+# matches most of the table):
+#   1. whole words of the username / name ("ana" -> Ana)
+#   2. word prefixes of the username / name ("ana" -> Anabel)
+#   3. word prefixes anywhere, skills included ("ana" -> teaches Analytics)
+# Users within a tier come in id order.
+NAME_COLUMNS = "{username full_name}"
+
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def search_index_available():
+    return connection.vendor == "sqlite"
+
+
+def _skills_sql(table):
+    return (
+        f"SELECT group_concat(s.name, ' ') FROM {table} x "
+        f"JOIN {Skill._meta.db_table} s ON s.id = x.skill_id "
+        f"WHERE x.user_id = u.id"
+    )
+
+
+def _index_sql(where=""):
+    return (
+        f"INSERT INTO {SEARCH_TABLE}(rowid, username, full_name, teaches, wants) "
+        f"SELECT u.id, u.username, u.first_name || ' ' || u.last_name, "
+        f"coalesce(({_skills_sql(UserSkillHave._meta.db_table)}), ''), "
+        f"coalesce(({_skills_sql(UserSkillWant._meta.db_table)}), '') "
+        f"FROM {User._meta.db_table} u {where}"
+    )
+
+
+def index_users(user_ids):
+    """
+    (Re)write the search rows of these users from the current data.
+    Users that no longer exist just lose their row.
+    """
+    user_ids = list(user_ids)
+    if not user_ids or not search_index_available():
+        return
+    for start in range(0, len(user_ids), 500):  # SQLite variable limit
+        chunk = user_ids[start:start + 500]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})", chunk
+            )
+            cursor.execute(_index_sql(f"WHERE u.id IN ({placeholders})"), chunk)
+
+
+def index_users_with_skill(skill_id):
+    """
+    After a skill rename: rewrite everyone who has or wants it.
+    """
+    user_ids = set()
+    for model in (UserSkillHave, UserSkillWant):
+        user_ids.update(
+            model.objects.filter(skill_id=skill_id).values_list("user_id", flat=True)
+        )
+    index_users(sorted(user_ids))
+
+
+def rebuild_search_index():
+    """
+    Rewrite the whole table. Returns the number of indexed users.
+    """
+    if not search_index_available():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(_index_sql())
+        # merge the b-trees the bulk insert left behind
+        cursor.execute(
+            f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"
+        )
+        cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+        return cursor.fetchone()[0]
+
+
+# -----------------------------
+#  QUERIES
+# -----------------------------
+def _terms(text, prefix=True):
+    # every word is quoted, so FTS5 syntax in the input is inert
+    star = "*" if prefix else ""
+    return " AND ".join(f'"{token}"{star}' for token in _TOKEN.findall(text))
+
+
+def build_matches(q="", teaches=""):
+    """
+    FTS5 MATCH expressions of the ranking tiers, best first: the words
+    of q in the name columns, then anywhere; every word of teaches must
+    start a word of the teaches column. [] when there is nothing to match.
+    """
+    skill = _terms(teaches)
+    skill_filter = f" AND teaches : ({skill})" if skill else ""
+
+    if not _terms(q):
+        if not skill:
+            return []
+        return [f"teaches : ({_terms(teaches, prefix=False)})", f"teaches : ({skill})"]
+
+    return [
+        f"{NAME_COLUMNS} : ({_terms(q, prefix=False)}){skill_filter}",
+        f"{NAME_COLUMNS} : ({_terms(q)}){skill_filter}",
+        f"({_terms(q)}){skill_filter}",
+    ]
+
+
+def search_user_ids(q="", teaches="", exclude_id=None, limit=20):
+    """
+    Ids of matching users, best match first.
+    """
+    matches = build_matches(q, teaches)
+    if not matches:
+        return []
+
+    if not search_index_available():
+        return _search_user_ids_scan(q, teaches, exclude_id, limit)
+
+    found = [exclude_id or 0]
+    with connection.cursor() as cursor:
+        for match in matches:
+            placeholders = ", ".join(["%s"] * len(found))
+            cursor.execute(
+                f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+                f"AND rowid NOT IN ({placeholders}) LIMIT %s",
+                [match, *found, limit - len(found) + 1],
+            )
+            found += [row[0] for row in cursor.fetchall()]
+            if len(found) > limit:
+                break
+    return found[1:]
+
+
+def _search_user_ids_scan(q, teaches, exclude_id, limit):
+    # other databases: the old substring scan, plus the skill filter
+    users = User.objects.all()
+    for token in _TOKEN.findall(q):
+        users = users.filter(
+            Q(username__icontains=token)
+            | Q(first_name__icontains=token)
+            | Q(last_name__icontains=token)
+            | Q(skills_have__skill__name__icontains=token)
+        )
+    for token in _TOKEN.findall(teaches):
+        users = users.filter(skills_have__skill__name__icontains=token)
+    return list(
+        users.exclude(id=exclude_id)
+        .distinct()
+        .order_by("username")
+        .values_list("id", flat=True)[:limit]
+    )
+
+
+def search_users(q="", teaches="", exclude_id=None, limit=20):
+    """
+    Matching User objects, best match first.
+    """
+    ids = search_user_ids(q, teaches, exclude_id, limit)
+    users = User.objects.in_bulk(ids)
+    return [users[user_id] for user_id in ids if user_id in users]
@@ -1,15 +1,54 @@
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connections
+from django.db.models import Case, IntegerField, Q, Value, When
 
-from .models import UserSkillHave, UserSkillWant
-from ml.matcher import find_best_mentors  # your ML function
+from .models import LearningRequest, UserSkillHave, UserSkillWant
+from ml.matcher import LEVEL_WEIGHTS, find_best_mentors_batch
+from ml.index import IndexHolder, MentorIndex, SkillArrays
+from core import profiling
 
 User = get_user_model()
 
 
+def user_to_ml_dict(user):
+    """
+    Convert one user (with skills_have__skill / skills_want__skill
+    prefetched) into the dict format used by the matcher.
+    """
+    skills_have = [
+        {
+            "name": ush.skill.name,
+            "level": ush.level,
+        }
+        for ush in user.skills_have.all()
+    ]
+
+    skills_want = [
+        usw.skill.name
+        for usw in user.skills_want.all()
+    ]
+
+    return {
+        "id": user.id,
+        "name": user.username,
+        "skills_have": skills_have,
+        "skills_want": skills_want,
+    }
+
+
 def build_users_list_for_ml():
     """
     Read all users + their skills from DB,
     and convert into the list-of-dicts format expected by matcher.find_best_mentors.
+
+    The recommendation endpoint does not use this any more (see
+    load_skill_arrays); it is kept for find_best_mentors() callers.
     """
     users = (
         User.objects
@@ -17,42 +56,355 @@ def build_users_list_for_ml():
         .prefetch_related("skills_have__skill", "skills_want__skill")
     )
 
-    users_list = []
-
-    for user in users:
-        skills_have = [
-            {
-                "name": ush.skill.name,
-                "level": ush.level,
-            }
-            for ush in user.skills_have.all()
-        ]
-
-        skills_want = [
-            usw.skill.name
-            for usw in user.skills_want.all()
-        ]
-
-        users_list.append(
-            {
-                "id": user.id,
-                "name": user.username,
-                "skills_have": skills_have,
-                "skills_want": skills_want,
-            }
-        )
+    with profiling.span("load_users"):
+        return [user_to_ml_dict(user) for user in users]
+
+
+# -----------------------------
+#  COLUMNAR BULK LOADER
+# -----------------------------
+# rows fetched per round trip while streaming the skill tables
+LOAD_CHUNK_SIZE = 5000
+
+# level -> weight done by the database, so no per-row Python mapping
+LEVEL_WEIGHT_SQL = Case(
+    *[
+        When(level=level, then=Value(weight))
+        for level, weight in LEVEL_WEIGHTS.items()
+    ],
+    default=Value(1),
+    output_field=IntegerField(),
+)
+
+HAVE_DTYPE = np.dtype(
+    [("user_id", np.int64), ("skill_id", np.int64), ("weight", np.int8)]
+)
+WANT_DTYPE = np.dtype([("user_id", np.int64), ("skill_id", np.int64)])
 
-    return users_list
+
+def load_skill_arrays(chunk_size=LOAD_CHUNK_SIZE):
+    """
+    Stream (user_id, skill_id, level weight) triples out of the skill tables
+    into flat NumPy arrays. No model instances, no per-user dicts and no
+    Skill.name lookups: exactly what MentorIndex.from_arrays() needs.
+    """
+    have = np.fromiter(
+        UserSkillHave.objects
+        .annotate(weight=LEVEL_WEIGHT_SQL)
+        .values_list("user_id", "skill_id", "weight")
+        .iterator(chunk_size=chunk_size),
+        dtype=HAVE_DTYPE,
+    )
+    want = np.fromiter(
+        UserSkillWant.objects
+        .values_list("user_id", "skill_id")
+        .iterator(chunk_size=chunk_size),
+        dtype=WANT_DTYPE,
+    )
+
+    return SkillArrays(
+        have_user_ids=have["user_id"],
+        have_skill_ids=have["skill_id"],
+        have_weights=have["weight"],
+        want_user_ids=want["user_id"],
+        want_skill_ids=want["skill_id"],
+    )
 
 
-def get_recommendations_for_user(current_user_id: int, top_k: int = 5):
+# -----------------------------
+#  MENTOR INDEX (long-lived)
+# -----------------------------
+def build_mentor_index():
+    """
+    Build a fresh MentorIndex from the skill tables.
+    """
+    return MentorIndex.from_arrays(load_skill_arrays())
+
+
+def load_user_skills(user_id):
+    """
+    One user's (have_items, want_skill_ids) in MentorIndex.update_user form.
+    """
+    have_items = list(
+        UserSkillHave.objects
+        .filter(user_id=user_id)
+        .annotate(weight=LEVEL_WEIGHT_SQL)
+        .values_list("skill_id", "weight")
+    )
+    want_skill_ids = list(
+        UserSkillWant.objects
+        .filter(user_id=user_id)
+        .values_list("skill_id", flat=True)
+    )
+    return have_items, want_skill_ids
+
+
+def _on_index_swap():
+    # results cached before this point came from the old snapshot
+    bump_skills_version()
+
+
+# Process-wide snapshot. Full rebuilds run on a background thread, which
+# needs its own DB connection closed when it is done.
+mentor_index_holder = IndexHolder(
+    loader=build_mentor_index,
+    user_loader=load_user_skills,
+    on_swap=_on_index_swap,
+    thread_cleanup=connections.close_all,
+    max_age=settings.MENTOR_INDEX_MAX_AGE,
+)
+
+
+def get_mentor_index():
+    """
+    Return the current index snapshot, building it on first use.
+    """
+    return mentor_index_holder.get()
+
+
+def rebuild_mentor_index_async():
+    """
+    Rebuild the index in the background (new/removed skills, bulk imports).
+    Requests keep using the current snapshot meanwhile.
+    """
+    return mentor_index_holder.rebuild_async()
+
+
+def reset_mentor_index():
+    """
+    Drop the index so the next request rebuilds it (tests, bulk imports).
+    """
+    mentor_index_holder.reset()
+    bump_skills_version()
+
+
+def refresh_users_in_index(user_ids, rebuild=False):
+    """
+    Re-read these users' skills and update their rows in the index.
+    Call this after their UserSkillHave / UserSkillWant rows changed;
+    rebuild=True when skills themselves were added or removed.
+    """
+    if rebuild or len(user_ids) > settings.MENTOR_INDEX_REBUILD_OVER_USERS:
+        # queued behind a running rebuild, which may predate the change
+        rebuild_mentor_index_async()
+    else:
+        for user_id in user_ids:
+            mentor_index_holder.update_user(user_id)
+
+    # results cached before this point used the old skills
+    bump_skills_version()
+
+
+# -----------------------------
+#  RECOMMENDATION CACHE
+# -----------------------------
+# Entries are keyed by a global "skills version" plus the learner's own
+# "requests version"; any skill write bumps the first, a learning request
+# involving the learner bumps the second. Old entries are never read again
+# and age out of the LRU/TTL cache.
+RECOMMENDATION_CACHE = "recommendations"
+SKILLS_VERSION_KEY = "skills_version"
+REQUESTS_VERSION_KEY = "requests_version:{}"
+
+_cache_stats = {"hits": 0, "misses": 0}
+_cache_stats_lock = threading.Lock()
+
+
+def _get_version(key):
+    cache = caches[RECOMMENDATION_CACHE]
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so a lost version key can never bring
+        # back entries cached under an older number
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    cache = caches[RECOMMENDATION_CACHE]
+    try:
+        cache.incr(key)
+    except ValueError:
+        # key missing (first write or evicted)
+        cache.set(key, time.time_ns(), timeout=None)
+
+
+def get_skills_version():
+    return _get_version(SKILLS_VERSION_KEY)
+
+
+def bump_skills_version():
+    _bump_version(SKILLS_VERSION_KEY)
+
+
+def _count_cache(name):
+    with _cache_stats_lock:
+        _cache_stats[name] += 1
+
+
+def recommendation_cache_stats():
+    with _cache_stats_lock:
+        stats = dict(_cache_stats)
+    total = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+    stats["skills_version"] = get_skills_version()
+    return stats
+
+
+def get_recommendations_for_user(
+    current_user_id: int,
+    top_k: int = 5,
+    min_score: float = 0.0,
+    mutual: bool = False,
+):
     """
     This is the main function your view will call.
     It takes the user_id (current user),
-    prepares the users list,
-    runs the ML matcher,
-    and returns the matched users.
+    scores every mentor against the long-lived index,
+    and returns the matched users (same shape as find_best_mentors).
+
+    mutual=True returns swap partners: users who can teach the current
+    user AND want something the current user has.
+
+    Users the learner already has a pending/accepted request with (either
+    direction) are never recommended.
+
+    Results are cached until someone's skills change or the learner's
+    requests do. Profiled requests (core/profiling.py) skip the cached
+    result so the profile shows the actual work.
     """
-    users_list = build_users_list_for_ml()
-    matches = find_best_mentors(current_user_id, users_list, top_k=top_k)
+    cache = caches[RECOMMENDATION_CACHE]
+    with profiling.span("index"):
+        # before the key: building or swapping in a snapshot bumps the
+        # skills version, which would orphan the entry stored below
+        index = get_mentor_index()
+    with profiling.span("cache"):
+        key = (
+            f"recs:{current_user_id}:{top_k}:{min_score!r}:{int(mutual)}:"
+            f"{get_skills_version()}:"
+            f"{_get_version(REQUESTS_VERSION_KEY.format(current_user_id))}"
+        )
+        matches = None if profiling.active() else cache.get(key)
+    if matches is not None:
+        _count_cache("hits")
+        return matches
+
+    _count_cache("misses")
+    with profiling.span("compute"):
+        matches = _compute_recommendations(
+            index, current_user_id, top_k, min_score, mutual
+        )
+    cache.set(key, matches)
     return matches
+
+
+def _compute_recommendations(index, current_user_id, top_k, min_score, mutual):
+    with profiling.span("exclusions"):
+        exclude = get_excluded_user_ids(current_user_id)
+    with profiling.span("query"):
+        scored = index.query(
+            current_user_id,
+            top_k=top_k,
+            min_score=min_score,
+            mode=settings.MATCHER_MODE,
+            lsh_params=settings.MATCHER_LSH,
+            mutual=mutual,
+            exclude=exclude,
+        )
+    if not scored:
+        return []
+
+    # only the winners are loaded as full objects
+    with profiling.span("load_winners"):
+        users = (
+            User.objects
+            .filter(id__in=[user_id for user_id, _ in scored])
+            .prefetch_related("skills_have__skill", "skills_want__skill")
+        )
+        by_id = {user.id: user_to_ml_dict(user) for user in users}
+
+    return [
+        {"user": by_id[user_id], "score": score}
+        for user_id, score in scored
+        if user_id in by_id
+    ]
+
+
+def get_recommendations_for_users(
+    user_ids, top_k: int = 5, min_score: float = 0.0, mutual: bool = False
+):
+    """
+    Batch version for digests/reports: score many learners with one
+    matrix product per chunk instead of one request per user.
+
+    Returns {user_id: [(mentor_id, score), ...]}.
+    """
+    return find_best_mentors_batch(
+        get_mentor_index(),
+        user_ids,
+        top_k=top_k,
+        min_score=min_score,
+        mutual=mutual,
+        exclude=load_excluded_user_ids(user_ids),
+    )
+
+
+# -----------------------------
+#  EXCLUSIONS (existing requests)
+# -----------------------------
+# A user the learner already asked (or was asked by) is not a useful
+# recommendation while that request is pending or accepted.
+ACTIVE_REQUEST_STATUSES = ("pending", "accepted")
+EXCLUSIONS_KEY = "excluded:{}"
+
+# above this many learners, read every active request instead of
+# sending a huge IN (...) list
+EXCLUSIONS_IN_LIMIT = 500
+
+
+def load_excluded_user_ids(user_ids):
+    """
+    {user_id: set of the other users in their active requests}, for many
+    users with one query on LearningRequest (both directions).
+    """
+    excluded = {user_id: set() for user_id in user_ids}
+    # .order_by(): no need for Meta.ordering's sort, it's a set
+    qs = LearningRequest.objects.filter(
+        status__in=ACTIVE_REQUEST_STATUSES
+    ).order_by()
+    if len(excluded) <= EXCLUSIONS_IN_LIMIT:
+        qs = qs.filter(Q(from_user_id__in=excluded) | Q(to_user_id__in=excluded))
+
+    for from_id, to_id in qs.values_list("from_user_id", "to_user_id"):
+        if from_id in excluded:
+            excluded[from_id].add(to_id)
+        if to_id in excluded:
+            excluded[to_id].add(from_id)
+    return excluded
+
+
+def get_excluded_user_ids(user_id):
+    """
+    Cached load_excluded_user_ids() for one user.
+    """
+    cache = caches[RECOMMENDATION_CACHE]
+    key = EXCLUSIONS_KEY.format(user_id)
+
+    excluded = cache.get(key)
+    if excluded is None:
+        excluded = frozenset(load_excluded_user_ids([user_id])[user_id])
+        cache.set(key, excluded)
+    return excluded
+
+
+def invalidate_exclusions(*user_ids):
+    """
+    Call after a LearningRequest between these users was created,
+    changed or deleted.
+    """
+    cache = caches[RECOMMENDATION_CACHE]
+    cache.delete_many([EXCLUSIONS_KEY.format(user_id) for user_id in user_ids])
+    for user_id in user_ids:
+        # their cached recommendations used the old exclusions
+        _bump_version(REQUESTS_VERSION_KEY.format(user_id))
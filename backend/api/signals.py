@@ -0,0 +1,239 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from .http_cache import SKILL_CATALOG, bump_versions, user_version_key
+from .models import (
+    LearningRequest,
+    Skill,
+    UserProfile,
+    UserSkillHave,
+    UserSkillWant,
+)
+from .search import index_users, index_users_with_skill
+from .services import invalidate_exclusions, refresh_users_in_index
+
+
+# -----------------------------
+#  BATCHED AFTER-COMMIT WORK
+# -----------------------------
+# A Skill delete cascades to one post_delete per holder: collect their ids
+# and do each kind of follow-up once per transaction, not once per row.
+_pending = threading.local()
+
+
+def _after_commit(kind, items, run):
+    """
+    Add items to this transaction's `kind` batch; run(batch) once it
+    commits. Registered on every call: a rolled-back savepoint drops its
+    callbacks, and the first one left takes the whole batch.
+    """
+    connection = transaction.get_connection()
+    if getattr(_pending, "hooks", None) is not connection.run_on_commit:
+        # committed or rolled back since (both start a new hook list)
+        _pending.hooks = connection.run_on_commit
+        _pending.batches = {}
+    batches = _pending.batches
+    batches.setdefault(kind, set()).update(items)
+
+    def flush():
+        batch = batches.pop(kind, None)
+        if batch:
+            run(batch)
+
+    transaction.on_commit(flush)
+
+
+# -----------------------------
+#  SKILLS CHANGED
+# -----------------------------
+# Sent once per user whenever their have/want rows changed, whoever wrote
+# them. Downstream caches (mentor index, recommendations) only listen to
+# this, not to the individual rows.
+#   kwargs: user_id
+skills_changed = Signal()
+
+_muted = threading.local()
+
+
+@contextmanager
+def skill_row_signals_muted(user_id):
+    """
+    Ignore per-row saves/deletes of user_id's skills inside the block.
+    For bulk writers that send skills_changed themselves, once.
+    """
+    muted = getattr(_muted, "user_ids", None)
+    if muted is None:
+        muted = _muted.user_ids = set()
+    muted.add(user_id)
+    try:
+        yield
+    finally:
+        muted.discard(user_id)
+
+
+@receiver(post_save, sender=UserSkillHave)
+@receiver(post_delete, sender=UserSkillHave)
+@receiver(post_save, sender=UserSkillWant)
+@receiver(post_delete, sender=UserSkillWant)
+def skill_row_written(sender, instance, **kwargs):
+    # single-row writes (admin, shell)
+    if instance.user_id in getattr(_muted, "user_ids", ()):
+        return
+    skills_changed.send(sender=sender, user_id=instance.user_id)
+
+
+# -----------------------------
+#  RECOMMENDATIONS: SKILLS
+# -----------------------------
+# stands for "every user" in the mentor index batch
+SKILL_CATALOG_CHANGED = "catalog"
+
+
+def _refresh_mentor_index(batch):
+    rebuild = SKILL_CATALOG_CHANGED in batch
+    batch.discard(SKILL_CATALOG_CHANGED)
+    refresh_users_in_index(batch, rebuild=rebuild)
+
+
+@receiver(skills_changed)
+def refresh_recommendations(sender, user_id, **kwargs):
+    # update that user's row in the mentor index and make cached
+    # recommendations stale, once the write is committed
+    _after_commit("mentor_index", [user_id], _refresh_mentor_index)
+
+
+# -----------------------------
+#  MENTOR INDEX REBUILD
+# -----------------------------
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def skill_catalog_changed(sender, **kwargs):
+    # new / renamed / deleted skills (admin, imports): rebuild the index
+    # in the background, requests keep the current snapshot meanwhile.
+    # Replaces the per-user updates of the same transaction (cascades).
+    _after_commit("mentor_index", [SKILL_CATALOG_CHANGED], _refresh_mentor_index)
+
+
+# -----------------------------
+#  RECOMMENDATIONS: EXCLUSIONS
+# -----------------------------
+@receiver(post_save, sender=LearningRequest)
+@receiver(post_delete, sender=LearningRequest)
+def learning_request_written(sender, instance, **kwargs):
+    # sent / accepted / rejected / cancelled (LearningRequestCreateView,
+    # LearningRequestActionView, admin): both users' exclusion sets change
+    user_ids = (instance.from_user_id, instance.to_user_id)
+    _after_commit("exclusions", user_ids, lambda ids: invalidate_exclusions(*ids))
+
+
+# -----------------------------
+#  USER SEARCH INDEX
+# -----------------------------
+# The search rows are written in the same transaction as the data they
+# come from, so a rollback undoes both.
+SEARCHED_USER_FIELDS = {"username", "first_name", "last_name"}
+
+
+@receiver(post_save, sender=get_user_model())
+def user_saved(sender, instance, update_fields=None, **kwargs):
+    # logins save last_login only: nothing searchable changed
+    if update_fields is not None and not SEARCHED_USER_FIELDS & set(update_fields):
+        return
+    index_users([instance.id])
+
+
+@receiver(post_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    index_users([instance.id])  # drops the row
+
+
+# A Skill delete removes every holder's skill row first: those users are
+# reindexed in one batch once the Skill row itself is gone.
+_skill_delete = threading.local()
+
+
+def _skill_delete_user_ids():
+    """
+    The running Skill delete's user id set, or None outside of one.
+    """
+    state = getattr(_skill_delete, "state", None)
+    if state is None:
+        return None
+    hooks, origin, user_ids = state
+    if hooks is not transaction.get_connection().run_on_commit:
+        # that delete failed and was rolled back
+        _skill_delete.state = None
+        return None
+    return user_ids
+
+
+@receiver(pre_delete, sender=Skill)
+def skill_delete_started(sender, origin=None, **kwargs):
+    # once per skill for a queryset delete, all before any row is deleted
+    if _skill_delete_user_ids() is None:
+        hooks = transaction.get_connection().run_on_commit
+        _skill_delete.state = (hooks, origin, set())
+
+
+@receiver(skills_changed)
+def reindex_user_skills(sender, user_id, **kwargs):
+    deferred = _skill_delete_user_ids()
+    if deferred is not None:
+        deferred.add(user_id)
+    else:
+        index_users([user_id])
+
+
+@receiver(post_delete, sender=Skill)
+def skill_delete_finished(sender, origin=None, **kwargs):
+    user_ids = _skill_delete_user_ids()
+    if user_ids is not None and _skill_delete.state[1] is origin:
+        _skill_delete.state = None
+        index_users(sorted(user_ids))
+
+
+@receiver(post_save, sender=Skill)
+def skill_renamed(sender, instance, created, **kwargs):
+    if not created:
+        index_users_with_skill(instance.id)
+
+
+# -----------------------------
+#  RESPONSE VERSIONS (ETags)
+# -----------------------------
+# After commit, so no request caches pre-commit data under the new version.
+def _bump_versions(keys):
+    bump_versions(*keys)
+
+
+@receiver(post_save, sender=get_user_model())
+@receiver(post_delete, sender=get_user_model())
+def user_account_written(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    key = user_version_key(instance.id)
+    _after_commit("versions", [key], _bump_versions)
+
+
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+def user_profile_written(sender, instance, **kwargs):
+    key = user_version_key(instance.user_id)
+    _after_commit("versions", [key], _bump_versions)
+
+
+@receiver(skills_changed)
+def user_skills_written(sender, user_id, **kwargs):
+    key = user_version_key(user_id)
+    _after_commit("versions", [key], _bump_versions)
+
+
+@receiver(post_save, sender=Skill)
+@receiver(post_delete, sender=Skill)
+def skill_catalog_written(sender, **kwargs):
+    _after_commit("versions", [SKILL_CATALOG], _bump_versions)
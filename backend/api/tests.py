@@ -1,3 +1,886 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from core import metrics
+
+from .http_cache import (
+    RESPONSE_CACHE,
+    SKILL_CATALOG,
+    VERSION_CACHE,
+    bump_versions,
+    user_version_key,
+)
+from .search import index_users
+from .signals import skills_changed
+from .services import (
+    RECOMMENDATION_CACHE,
+    get_recommendations_for_user,
+    mentor_index_holder,
+    recommendation_cache_stats,
+    reset_mentor_index,
+)
+from .models import (
+    Conversation,
+    LearningRequest,
+    Skill,
+    UserProfile,
+    UserSkillHave,
+    UserSkillWant,
+)
+
+User = get_user_model()
+
+
+# -----------------------------
+#  HELPERS
+# -----------------------------
+def count_queries(fn):
+    """
+    (result, number of SQL queries fn() ran)
+    """
+    with CaptureQueriesContext(connection) as ctx:
+        result = fn()
+    return result, len(ctx.captured_queries)
+
+
+class QueryCountAssertions:
+    """
+    TestCase mixin pinning the number of queries an endpoint runs as
+    its data grows.
+    """
+
+    def assertQueriesAtSizes(self, expected, sizes, grow_to, fetch):
+        """
+        For every size: grow_to(size) adds rows until there are size of
+        them, then fetch() must run exactly `expected` queries.
+        """
+        counts = {}
+        for size in sizes:
+            grow_to(size)
+            response, counts[size] = count_queries(fetch)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(counts, {size: expected for size in sizes})
+
+
+def make_connections(user, count, with_conversation=True):
+    """
+    count accepted requests to user, from fresh learners.
+    """
+    start = User.objects.count()
+    learners = User.objects.bulk_create(
+        [
+            User(username=f"learner{start + i}", password="!")
+            for i in range(count)
+        ]
+    )
+    LearningRequest.objects.bulk_create(
+        [
+            LearningRequest(from_user=learner, to_user=user, status="accepted")
+            for learner in learners
+        ]
+    )
+    if with_conversation:
+        Conversation.objects.bulk_create(
+            [
+                Conversation(user1=user, user2=learner)
+                if user.id < learner.id
+                else Conversation(user1=learner, user2=user)
+                for learner in learners
+            ]
+        )
+    return learners
+
+
+def skill_named(name):
+    skill = Skill.objects.filter(name=name).first()
+    if skill is None:
+        # bulk_create: no background index rebuild racing the test database
+        [skill] = Skill.objects.bulk_create([Skill(name=name)])
+    return skill
+
+
+def user_with_skills(username, have=(), want=()):
+    """
+    have: (skill name, level) pairs, want: skill names.
+    """
+    user = User.objects.create_user(username, password="x")
+    for name, level in have:
+        UserSkillHave.objects.create(user=user, skill=skill_named(name), level=level)
+    for name in want:
+        UserSkillWant.objects.create(user=user, skill=skill_named(name))
+    return user
+
+
+class RecommendationTestCase(TestCase):
+    """
+    Fresh mentor index and recommendation cache for every test.
+    """
+
+    def setUp(self):
+        caches[RECOMMENDATION_CACHE].clear()
+        reset_mentor_index()
+        # a live index would rebuild in the background on later skill writes
+        self.addCleanup(reset_mentor_index)
+
+
+# -----------------------------
+#  CONNECTIONS
+# -----------------------------
+class ConnectionsViewTests(TestCase):
+    def setUp(self):
+        self.mentor = User.objects.create_user("mentor", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.mentor)
+
+    def get(self, url="/api/connections/"):
+        return self.client.get(url)
+
+    def test_query_count_does_not_grow_with_connections(self):
+        counts = []
+        for total in (1, 10, 100):
+            make_connections(self.mentor, total - LearningRequest.objects.count())
+            response, queries = count_queries(
+                lambda: self.get("/api/connections/?page_size=200")
+            )
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.json()["results"]), total)
+            counts.append(queries)
+
+        self.assertEqual(len(set(counts)), 1, counts)
+
+    def test_conversation_id_resolved_both_ways(self):
+        [learner] = make_connections(self.mentor, 1, with_conversation=False)
+        # stored in the "wrong" order on purpose
+        conv = Conversation.objects.create(user1=learner, user2=self.mentor)
+        other = User.objects.create_user("other", password="x")
+        Conversation.objects.create(user1=other, user2=learner)
+
+        [row] = self.get().json()["results"]
+        self.assertEqual(row["conversation_id"], conv.id)
+        self.assertEqual(row["other_user_id"], learner.id)
+        self.assertEqual(row["role"], "teacher")
+
+    def test_missing_conversation_is_none(self):
+        make_connections(self.mentor, 1, with_conversation=False)
+        [row] = self.get().json()["results"]
+        self.assertIsNone(row["conversation_id"])
+
+    def test_cursor_pages_cover_every_connection_once(self):
+        learners = make_connections(self.mentor, 7)
+
+        seen = []
+        url = "/api/connections/?page_size=3"
+        while url:
+            data = self.get(url).json()
+            seen += [row["other_user_id"] for row in data["results"]]
+            url = data["next"]
+
+        self.assertEqual(sorted(seen), sorted(learner.id for learner in learners))
+
+
+# -----------------------------
+#  REQUEST INBOXES
+# -----------------------------
+class RequestInboxTests(QueryCountAssertions, TestCase):
+    def test_incoming_is_paged_newest_first(self):
+        mentor = User.objects.create_user("mentor", password="x")
+        learners = make_connections(mentor, 5, with_conversation=False)
+        client = APIClient()
+        client.force_authenticate(mentor)
+
+        first = client.get("/api/requests/incoming/?page_size=3").json()
+        second = client.get(first["next"]).json()
+
+        ids = [row["from_user"] for row in first["results"] + second["results"]]
+        self.assertEqual(len(first["results"]), 3)
+        self.assertIsNone(second["next"])
+        self.assertEqual(ids, [learner.id for learner in reversed(learners)])
+
+    def test_inbox_query_counts_are_constant(self):
+        mentor = User.objects.create_user("mentor", password="x")
+        client = APIClient()
+        client.force_authenticate(mentor)
+
+        def grow_to(size):
+            received = LearningRequest.objects.filter(to_user=mentor).count()
+            make_connections(mentor, size - received, with_conversation=False)
+
+        # one query per page, both usernames joined in
+        self.assertQueriesAtSizes(
+            1,
+            (1, 10, 1000),
+            grow_to,
+            lambda: client.get("/api/requests/incoming/?page_size=200"),
+        )
+
+    def test_outbox_query_counts_are_constant(self):
+        learner = User.objects.create_user("learner", password="x")
+        client = APIClient()
+        client.force_authenticate(learner)
+
+        def grow_to(size):
+            start = User.objects.count()
+            mentors = User.objects.bulk_create(
+                [
+                    User(username=f"mentor{start + i}", password="!")
+                    for i in range(size - learner.learning_requests_sent.count())
+                ]
+            )
+            LearningRequest.objects.bulk_create(
+                [LearningRequest(from_user=learner, to_user=m) for m in mentors]
+            )
+
+        self.assertQueriesAtSizes(
+            1,
+            (1, 10, 1000),
+            grow_to,
+            lambda: client.get("/api/requests/outgoing/?page_size=200"),
+        )
+
+
+# -----------------------------
+#  USER DETAIL
+# -----------------------------
+class UserDetailViewTests(QueryCountAssertions, TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        caches[VERSION_CACHE].clear()
+
+    def test_query_count_does_not_grow_with_skills(self):
+        viewer = User.objects.create_user("viewer", password="x")
+        user = User.objects.create_user("mentor", password="x")
+        UserProfile.objects.create(user=user, github_url="https://github.com/m")
+        client = APIClient()
+        client.force_authenticate(viewer)
+
+        def grow_to(size):
+            start = Skill.objects.count()
+            skills = Skill.objects.bulk_create(
+                [Skill(name=f"skill{i}") for i in range(start, size)]
+            )
+            UserSkillHave.objects.bulk_create(
+                [UserSkillHave(user=user, skill=skill) for skill in skills]
+            )
+            UserSkillWant.objects.bulk_create(
+                [UserSkillWant(user=user, skill=skill) for skill in skills]
+            )
+            # bulk_create sends no signals: a new version, like an import would
+            bump_versions(user_version_key(user.id))
+
+        # user + profile, skills_have, skills_want
+        self.assertQueriesAtSizes(
+            3, (1, 10, 1000), grow_to, lambda: client.get(f"/api/users/{user.id}/")
+        )
+
+        data = client.get(f"/api/users/{user.id}/").json()
+        self.assertEqual(len(data["skills_have"]), 1000)
+        self.assertEqual(data["skills_want"][0]["skill_name"], "skill0")
+        self.assertEqual(data["profile"]["github_url"], "https://github.com/m")
+
+
+# -----------------------------
+#  MY SKILLS
+# -----------------------------
+class MySkillsUpdateTests(TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        caches[VERSION_CACHE].clear()
+        self.user = user_with_skills(
+            "me",
+            have=[("python", "beginner"), ("sql", "advanced")],
+            want=["react"],
+        )
+        self.skills = {
+            name: skill_named(name).id
+            for name in ("python", "sql", "react", "go", "rust")
+        }
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+        self.signals = []
+
+        def receiver(sender, user_id, **kwargs):
+            self.signals.append(user_id)
+
+        skills_changed.connect(receiver)
+        self.addCleanup(skills_changed.disconnect, receiver)
+
+    def post(self, have, want):
+        body = {
+            "have": [
+                {"skill_id": self.skills[name], "level": level} for name, level in have
+            ],
+            "want": [{"skill_id": self.skills[name]} for name in want],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post("/api/my-skills/", body, format="json")
+
+    def rows(self):
+        have = UserSkillHave.objects.filter(user=self.user).select_related("skill")
+        want = UserSkillWant.objects.filter(user=self.user).select_related("skill")
+        return (
+            {h.skill.name: (h.id, h.level) for h in have},
+            {w.skill.name: w.id for w in want},
+        )
+
+    def test_only_the_difference_is_written(self):
+        have_before, want_before = self.rows()
+
+        response = self.post(
+            have=[("python", "advanced"), ("go", "beginner")], want=["react", "rust"]
+        )
+        self.assertEqual(response.status_code, 200)
+
+        have, want = self.rows()
+        self.assertEqual(set(have), {"python", "go"})
+        # level changed in place, untouched rows keep their ids
+        self.assertEqual(have["python"], (have_before["python"][0], "advanced"))
+        self.assertEqual(have["go"][1], "beginner")
+        self.assertEqual(set(want), {"react", "rust"})
+        self.assertEqual(want["react"], want_before["react"])
+
+        # the response is the stored state, in get()'s shape
+        self.assertEqual(response.json(), self.client.get("/api/my-skills/").json())
+        self.assertEqual(
+            [row["skill_name"] for row in response.json()["have"]], ["go", "python"]
+        )
+
+    def test_one_skills_changed_signal_per_update(self):
+        self.post(have=[("go", "advanced")], want=["rust"])
+        self.assertEqual(self.signals, [self.user.id])
+
+        # same state again: nothing written, nothing sent
+        self.post(have=[("go", "advanced")], want=["rust"])
+        self.assertEqual(self.signals, [self.user.id])
+
+    def test_concurrent_insert_of_the_same_skill_is_retried(self):
+        bulk_create = UserSkillHave.objects.bulk_create
+        calls = []
+
+        def lose_the_race_once(rows):
+            calls.append(rows)
+            if len(calls) == 1:
+                raise IntegrityError("UNIQUE constraint failed")
+            return bulk_create(rows)
+
+        with mock.patch.object(
+            UserSkillHave.objects, "bulk_create", side_effect=lose_the_race_once
+        ):
+            response = self.post(have=[("go", "advanced")], want=[])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.rows(), ({"go": (mock.ANY, "advanced")}, {}))
+        self.assertEqual(self.signals, [self.user.id])
+
+    def test_persistent_conflicts_answer_409(self):
+        with mock.patch.object(
+            UserSkillHave.objects, "bulk_create", side_effect=IntegrityError
+        ):
+            response = self.post(have=[("go", "advanced")], want=[])
+
+        self.assertEqual(response.status_code, 409)
+        # nothing from the failed attempts was kept
+        have, want = self.rows()
+        self.assertEqual(set(have), {"python", "sql"})
+        self.assertEqual(set(want), {"react"})
+        self.assertEqual(self.signals, [])
+
+
+# -----------------------------
+#  CONDITIONAL GET / RESPONSE CACHE
+# -----------------------------
+class VersionedResponseTests(TestCase):
+    def setUp(self):
+        caches[RESPONSE_CACHE].clear()
+        caches[VERSION_CACHE].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user = User.objects.create_user("me", password="x")
+            self.skill = Skill.objects.create(name="Python")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_etag_answers_304_without_queries(self):
+        first = self.client.get("/api/skills/")
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json(), [{"id": self.skill.id, "name": "Python"}])
+
+        response, queries = count_queries(
+            lambda: self.client.get("/api/skills/", HTTP_IF_NONE_MATCH=first["ETag"])
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        self.assertEqual(queries, 0)
+
+
+    def test_cached_body_skips_queries_until_a_write(self):
+        self.client.get("/api/my-skills/")
+        hits = metrics.response_cache_results.series.get(("hit",), 0)
+        response, queries = count_queries(lambda: self.client.get("/api/my-skills/"))
+        self.assertEqual(queries, 0)
+        self.assertEqual(metrics.response_cache_results.series[("hit",)], hits + 1)
+        self.assertEqual(response.json(), {"have": [], "want": []})
+        old_etag = response["ETag"]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/my-skills/",
+                {"have": [{"skill_id": self.skill.id, "level": "advanced"}]},
+                format="json",
+            )
+
+        response = self.client.get("/api/my-skills/", HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["have"][0]["skill_name"], "Python")
+
+    def test_skill_rename_changes_dependent_etags(self):
+        detail = self.client.get(f"/api/users/{self.user.id}/")
+        me = self.client.get("/api/auth/me/")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.skill.name = "Python 3"
+            self.skill.save()
+
+        self.assertNotEqual(
+            self.client.get(f"/api/users/{self.user.id}/")["ETag"], detail["ETag"]
+        )
+        # /me doesn't show skills
+        self.assertEqual(self.client.get("/api/auth/me/")["ETag"], me["ETag"])
+
+    def test_writes_from_other_processes_change_the_etag(self):
+        shared = {
+            **settings.CACHES,
+            VERSION_CACHE: {
+                "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                "LOCATION": tempfile.mkdtemp(),
+            },
+        }
+        with self.settings(CACHES=shared):
+            response = self.client.get("/api/my-skills/")
+            # e.g. a bulk import from manage.py shell
+            bump = (
+                "from django.test import override_settings\n"
+                "from api.http_cache import bump_versions\n"
+                f"with override_settings(CACHES={shared!r}):\n"
+                f"    bump_versions('user:{self.user.id}')\n"
+            )
+            subprocess.run(
+                [sys.executable, "manage.py", "shell", "-c", bump],
+                cwd=settings.BASE_DIR,
+                check=True,
+            )
+
+            response = self.client.get(
+                "/api/my-skills/", HTTP_IF_NONE_MATCH=response["ETag"]
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_write_in_the_same_second_changes_the_etag(self):
+        first = self.client.get("/api/my-skills/")
+        self.assertNotIn("Last-Modified", first)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/my-skills/",
+                {"want": [{"skill_id": self.skill.id}]},
+                format="json",
+            )
+
+        response = self.client.get("/api/my-skills/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_user_is_not_cached(self):
+        self.assertEqual(self.client.get("/api/users/999/").status_code, 404)
+        self.assertEqual(self.client.get("/api/users/999/").status_code, 404)
+        self.assertIsNone(caches[VERSION_CACHE].get(user_version_key(999)))
+
+
+# -----------------------------
+#  USER SEARCH
+# -----------------------------
+class UserSearchTests(TestCase):
+    def setUp(self):
+        self.me = User.objects.create_user("me", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(self.me)
+
+    def search(self, **params):
+        response = self.client.get("/api/users/search/", params)
+        self.assertEqual(response.status_code, 200)
+        return [row["username"] for row in response.json()]
+
+    def teach(self, user, name):
+        skill, _ = Skill.objects.get_or_create(name=name)
+        UserSkillHave.objects.create(user=user, skill=skill)
+        return skill
+
+    def test_prefix_accent_and_skill_matches(self):
+        User.objects.create_user("jose_m", first_name="José", password="x")
+        ana = User.objects.create_user("ana", last_name="Reacher", password="x")
+        mentor = User.objects.create_user("mentor", password="x")
+        self.teach(mentor, "React")
+
+        self.assertEqual(self.search(q="jos"), ["jose_m"])
+        self.assertEqual(self.search(q="JOSE"), ["jose_m"])
+        self.assertEqual(self.search(q="m"), ["jose_m", "mentor"])
+        # a name hit ranks above a skill hit
+        self.assertEqual(self.search(q="reac"), ["ana", "mentor"])
+        self.assertEqual(self.search(teaches="react"), ["mentor"])
+        self.assertEqual(self.search(q="an", teaches="react"), [])
+
+        self.teach(ana, "React Native")
+        self.assertEqual(self.search(q="an", teaches="react"), ["ana"])
+        self.assertEqual(self.search(q="me"), ["mentor"])  # never yourself
+
+    def test_index_follows_writes(self):
+        user = User.objects.create_user("old_name", password="x")
+        skill = self.teach(user, "Django")
+
+        user.username = "new_name"
+        user.save()
+        self.assertEqual(self.search(q="old"), [])
+        self.assertEqual(self.search(q="new"), ["new_name"])
+
+        skill.name = "Flask"
+        skill.save()
+        self.assertEqual(self.search(teaches="django"), [])
+        self.assertEqual(self.search(teaches="flask"), ["new_name"])
+
+        user.delete()
+        self.assertEqual(self.search(q="new"), [])
+
+    def test_query_syntax_is_not_interpreted(self):
+        User.objects.create_user("or_not", password="x")
+        self.assertEqual(self.search(q='"or" NOT*'), ["or_not"])
+        self.assertEqual(self.search(q="***"), [])
+
+
+# -----------------------------
+#  RECOMMENDATIONS
+# -----------------------------
+class RecommendationCacheTests(RecommendationTestCase):
+    def recommended_ids(self, user):
+        return [
+            match["user"]["id"] for match in get_recommendations_for_user(user.id)
+        ]
+
+    def assertCounted(self, before, hits, misses):
+        after = recommendation_cache_stats()
+        self.assertEqual(after["hits"] - before["hits"], hits)
+        self.assertEqual(after["misses"] - before["misses"], misses)
+
+    def test_skill_writes_make_the_next_call_a_miss(self):
+        learner = user_with_skills("learner", want=["python"])
+        first = user_with_skills(
+            "first", have=[("python", "beginner"), ("sql", "advanced")]
+        )
+
+        stats = recommendation_cache_stats()
+        self.assertEqual(self.recommended_ids(learner), [first.id])
+        self.assertEqual(self.recommended_ids(learner), [first.id])
+        self.assertCounted(stats, hits=1, misses=1)
+
+        version = recommendation_cache_stats()["skills_version"]
+        with self.captureOnCommitCallbacks(execute=True):
+            second = user_with_skills("second", have=[("python", "advanced")])
+        self.assertGreater(recommendation_cache_stats()["skills_version"], version)
+
+        stats = recommendation_cache_stats()
+        self.assertEqual(self.recommended_ids(learner), [second.id, first.id])
+        self.assertEqual(self.recommended_ids(learner), [second.id, first.id])
+        self.assertCounted(stats, hits=1, misses=1)
+
+
+class RecommendationExclusionTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        self.learner = user_with_skills("learner", want=["python"])
+        # all tie on score: ranked by id
+        self.mentors = [
+            user_with_skills(name, have=[("python", "advanced")])
+            for name in ("a", "b", "c")
+        ]
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def recommended(self):
+        response = self.client_for(self.learner).get("/api/recommendations/")
+        self.assertEqual(response.status_code, 200)
+        return [rec["id"] for rec in response.json()]
+
+    def write(self, user, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client_for(user).post(url, data, format="json")
+        self.assertIn(response.status_code, (200, 201))
+        return response
+
+    def test_active_requests_in_either_direction_are_excluded(self):
+        a, b, c = self.mentors
+        self.assertEqual(self.recommended(), [a.id, b.id, c.id])
+        self.assertEqual(self.recommended(), [a.id, b.id, c.id])  # cached
+
+        # learner -> a, pending
+        to_a = self.write(self.learner, "/api/requests/", {"to_user_id": a.id})
+        self.assertEqual(self.recommended(), [b.id, c.id])
+
+        # b -> learner, pending
+        from_b = self.write(b, "/api/requests/", {"to_user_id": self.learner.id})
+        self.assertEqual(self.recommended(), [c.id])
+
+        # cancelled / rejected: recommended again
+        to_a_url = f"/api/requests/{to_a.json()['id']}/action/"
+        self.write(self.learner, to_a_url, {"action": "cancel"})
+        self.assertEqual(self.recommended(), [a.id, c.id])
+
+        from_b_url = f"/api/requests/{from_b.json()['id']}/action/"
+        self.write(self.learner, from_b_url, {"action": "reject"})
+        self.assertEqual(self.recommended(), [a.id, b.id, c.id])
+
+        # accepted stays excluded
+        from_c = self.write(c, "/api/requests/", {"to_user_id": self.learner.id})
+        from_c_url = f"/api/requests/{from_c.json()['id']}/action/"
+        self.write(self.learner, from_c_url, {"action": "accept"})
+        self.assertEqual(self.recommended(), [a.id, b.id])
+
+
+class RecommendationViewTests(RecommendationTestCase):
+    def setUp(self):
+        super().setUp()
+        learner = user_with_skills(
+            "learner", have=[("go", "advanced")], want=["python", "sql"]
+        )
+        self.both = user_with_skills(
+            "both", have=[("python", "advanced"), ("sql", "advanced")]
+        ).id
+        # the only one who wants something back
+        self.swap = user_with_skills(
+            "swap", have=[("python", "advanced")], want=["go"]
+        ).id
+        self.weak = user_with_skills(
+            "weak", have=[("python", "beginner"), ("rust", "advanced")]
+        ).id
+        self.client = APIClient()
+        self.client.force_authenticate(learner)
+
+    def get(self, **params):
+        return self.client.get("/api/recommendations/", params)
+
+    def recommended(self, **params):
+        response = self.get(**params)
+        self.assertEqual(response.status_code, 200)
+        return [rec["id"] for rec in response.json()]
+
+    def test_parameters_filter_the_ranking(self):
+        self.assertEqual(self.recommended(), [self.both, self.swap, self.weak])
+        self.assertEqual(self.recommended(top_k=1), [self.both])
+        self.assertEqual(self.recommended(min_score=0.5), [self.both, self.swap])
+        self.assertEqual(self.recommended(mutual=1), [self.swap])
+        self.assertEqual(self.recommended(mutual="true"), [self.swap])
+        self.assertEqual(self.recommended(mutual=0), self.recommended())
+
+    @override_settings(RECOMMENDATIONS_MAX_TOP_K=2)
+    def test_top_k_is_clamped(self):
+        self.assertEqual(self.recommended(top_k=50), [self.both, self.swap])
+        self.assertEqual(self.recommended(top_k=0), [self.both])
+        self.assertEqual(self.recommended(top_k=-3), [self.both])
+
+    def test_bad_values_answer_400(self):
+        for params in ({"top_k": "abc"}, {"top_k": "1.5"}, {"min_score": "high"}):
+            with self.subTest(**params):
+                response = self.get(**params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("top_k", response.json()["detail"])
+
+
+@override_settings(MENTOR_INDEX_REBUILD_OVER_USERS=100)
+class SkillRowCascadeTests(TestCase):
+    def setUp(self):
+        self.skill = skill_named("python")
+        with self.captureOnCommitCallbacks(execute=True):
+            me = User.objects.create_user("me", password="x")
+        self.client = APIClient()
+        self.client.force_authenticate(me)
+
+    def teachers(self, skill):
+        response = self.client.get("/api/users/search/", {"teaches": skill})
+        return [row["username"] for row in response.json()]
+
+    def holders(self, count):
+        users = User.objects.bulk_create(
+            [User(username=f"holder{i}", password="!") for i in range(count)]
+        )
+        UserSkillHave.objects.bulk_create(
+            [UserSkillHave(user=user, skill=self.skill, level="advanced")
+             for user in users]
+        )
+        return [user.id for user in users]
+
+    def follow_ups(self, delete):
+        """
+        (index updates, index rebuilds, version bumps, search reindexes)
+        delete() caused, after commit.
+        """
+        with mock.patch.object(mentor_index_holder, "update_user") as update, \
+                mock.patch.object(mentor_index_holder, "rebuild_async") as rebuild, \
+                mock.patch("api.signals.bump_versions") as bump, \
+                mock.patch("api.signals.index_users", wraps=index_users) as index, \
+                self.captureOnCommitCallbacks(execute=True):
+            delete()
+        return update, rebuild, bump, index
+
+    def test_skill_delete_is_one_batch_per_kind(self):
+        user_ids = self.holders(150)
+
+        update, rebuild, bump, index = self.follow_ups(self.skill.delete)
+
+        update.assert_not_called()
+        rebuild.assert_called_once_with()
+        bump.assert_called_once()
+        self.assertCountEqual(
+            bump.call_args.args,
+            [user_version_key(user_id) for user_id in user_ids] + [SKILL_CATALOG],
+        )
+        index.assert_called_once_with(sorted(user_ids))
+        self.assertEqual(self.teachers("python"), [])
+
+    def test_small_batches_update_rows_in_place(self):
+        user_ids = self.holders(3)
+
+        update, rebuild, bump, index = self.follow_ups(
+            UserSkillHave.objects.filter(user_id__in=user_ids).delete
+        )
+
+        self.assertCountEqual(
+            [call.args for call in update.call_args_list],
+            [(user_id,) for user_id in user_ids],
+        )
+        rebuild.assert_not_called()
+        bump.assert_called_once()
+        self.assertEqual(index.call_count, 3)
+
+
+class RecommendAllCommandTests(RecommendationTestCase):
+    def test_batch_output_matches_single_requests(self):
+        user_with_skills("learner1", want=["python", "react"])
+        user_with_skills("learner2", have=[("python", "beginner")], want=["sql"])
+        user_with_skills(
+            "mentor1", have=[("python", "advanced"), ("sql", "beginner")]
+        )
+        user_with_skills("mentor2", have=[("react", "advanced")], want=["python"])
+        user_with_skills("mentor3", have=[("sql", "advanced")])
+        learner_ids = list(
+            User.objects.filter(skills_want__isnull=False)
+            .distinct()
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+        for mutual in (False, True):
+            out = io.StringIO()
+            args = ["--top-k", "2"] + (["--mutual"] if mutual else [])
+            call_command("recommend_all", *args, stdout=out, stderr=io.StringIO())
+            lines = [json.loads(line) for line in out.getvalue().splitlines()]
+            self.assertEqual([line["user_id"] for line in lines], learner_ids)
+
+            for line in lines:
+                expected = get_recommendations_for_user(
+                    line["user_id"], top_k=2, mutual=mutual
+                )
+                self.assertEqual(
+                    [(rec["id"], rec["score"]) for rec in line["recommendations"]],
+                    [(match["user"]["id"], match["score"]) for match in expected],
+                )
+
+
+# -----------------------------
+#  PROFILING HOOK
+# -----------------------------
+class RecommendationProfilingTests(TestCase):
+    def setUp(self):
+        caches[RECOMMENDATION_CACHE].clear()
+        # bulk_create: no background index rebuild racing the test database
+        [python] = Skill.objects.bulk_create([Skill(name="Python")])
+        self.learner = User.objects.create_user("learner", password="x")
+        UserSkillWant.objects.create(user=self.learner, skill=python)
+        mentor = User.objects.create_user("mentor", password="x")
+        UserSkillHave.objects.create(user=mentor, skill=python, level="advanced")
+        reset_mentor_index()
+        # a live index would rebuild in the background on later skill writes
+        self.addCleanup(reset_mentor_index)
+
+        self.profile_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.profile_dir)
+        self.client = APIClient()
+        self.client.force_authenticate(self.learner)
+
+    def get(self, **extra):
+        with override_settings(PROFILE_DIR=self.profile_dir):
+            return self.client.get("/api/recommendations/", **extra)
+
+    def test_staff_get_stage_timings_and_a_collapsed_stack_file(self):
+        plain = self.get().json()
+        self.learner.is_staff = True
+        self.learner.save()
+
+        # cached by now, but a profiled request recomputes
+        response = self.get(HTTP_X_PROFILE="1")
+        self.assertEqual(response.json(), plain)
+        timing = response["Server-Timing"]
+        stages = [
+            "total",
+            "cache",
+            "index",
+            "compute.query",
+            "compute.query.candidates",
+            "compute.load_winners",
+        ]
+        for stage in stages:
+            self.assertIn(f"{stage};dur=", timing)
+
+        path = os.path.join(self.profile_dir, response["X-Profile-File"])
+        with open(path) as collapsed:
+            for line in collapsed:
+                stack, count = line.rsplit(" ", 1)
+                self.assertTrue(stack.startswith("recommendations;"))
+                self.assertGreater(int(count), 0)
+
+    def test_flag_is_ignored_for_other_users(self):
+        response = self.get(HTTP_X_PROFILE="1")
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(os.listdir(self.profile_dir), [])
+
+
+# -----------------------------
+#  QUERY PLANS
+# -----------------------------
+class HotQueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        # raises CommandError if any of them is a full table scan
+        call_command("explain_hot_queries", stdout=io.StringIO())
+
+    def test_full_scan_detection(self):
+        from api.management.commands.explain_hot_queries import full_scans
+
+        self.assertEqual(full_scans("2 0 0 SCAN api_skill"), ["2 0 0 SCAN api_skill"])
+        self.assertEqual(
+            full_scans("3 0 0 SEARCH api_skill USING INDEX x (user_id=?)"), []
+        )
+        self.assertEqual(full_scans("2 0 0 SCAN t USING COVERING INDEX i"), [])
@@ -1,22 +1,36 @@
 from django.shortcuts import render
-from django.db.models import Q
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Prefetch, Q, Subquery
 
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import status
 
 from django.contrib.auth import get_user_model
 
+from core.profiling import profiled
+
+from .http_cache import SKILL_CATALOG, user_version_key, versioned_response
+from .pagination import NewestFirstCursorPagination
 from .serializers import (
     RegisterSerializer,
     UserSerializer,
     LearningRequestSerializer,
     UserDetailSerializer,
     UserProfileSerializer,
+    UserSearchSerializer,
+)
+from .search import search_users
+from .signals import skill_row_signals_muted, skills_changed
+from .services import (
+    get_recommendations_for_user,
+    mentor_index_holder,
+    rebuild_mentor_index_async,
+    recommendation_cache_stats,
 )
-from .services import get_recommendations_for_user
 from .models import (
     LearningRequest,
     Conversation,
@@ -52,11 +66,19 @@ class RegisterView(APIView):
 #   CURRENT USER DETAILS
 # -------------------------------
 class MeView(APIView):
+    """
+    GET /api/auth/me/  (ETag / If-None-Match, see api/http_cache.py)
+    """
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        serializer = UserSerializer(request.user)
-        return Response(serializer.data)
+        user = request.user
+        return versioned_response(
+            request,
+            f"me:{user.id}",
+            [user_version_key(user.id)],
+            lambda: UserSerializer(user).data,
+        )
     
 
 class ProfileLinksView(APIView):
@@ -94,16 +116,34 @@ class UserDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request, pk):
+        return versioned_response(
+            request,
+            f"user-detail:{pk}",
+            [user_version_key(pk), SKILL_CATALOG],
+            lambda: self.build(pk),
+        )
+
+    def build(self, pk):
+        # 3 queries however many skills: user + profile, haves, wants
+        users = User.objects.select_related("profile").prefetch_related(
+            Prefetch(
+                "skills_have",
+                queryset=UserSkillHave.objects.select_related("skill"),
+            ),
+            Prefetch(
+                "skills_want",
+                queryset=UserSkillWant.objects.select_related("skill"),
+            ),
+        )
         try:
-            user = User.objects.get(pk=pk)
+            user = users.get(pk=pk)
         except User.DoesNotExist:
             return Response(
                 {"detail": "User not found."},
                 status=status.HTTP_404_NOT_FOUND,
             )
 
-        serializer = UserDetailSerializer(user)
-        return Response(serializer.data)
+        return UserDetailSerializer(user).data
 
 
 # -------------------------------
@@ -111,15 +151,35 @@ class UserDetailView(APIView):
 # -------------------------------
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@profiled("recommendations")
 def recommendations_view(request):
     """
-    GET /api/recommendations/
+    GET /api/recommendations/?top_k=5&min_score=0.2&mutual=1
     Uses the currently logged-in user (request.user)
+    Staff can profile it with ?profile=1 (see core/profiling.py).
+
+    top_k is capped at settings.RECOMMENDATIONS_MAX_TOP_K.
+    mutual=1 only returns swap partners (they also want one of your skills),
+    scored in both directions.
     """
     user = request.user
     user_id = user.id
 
-    matches = get_recommendations_for_user(current_user_id=user_id, top_k=5)
+    try:
+        top_k = int(request.query_params.get("top_k", 5))
+        min_score = float(request.query_params.get("min_score", 0.0))
+    except ValueError:
+        return Response(
+            {"detail": "top_k must be an integer and min_score a number."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    top_k = max(1, min(top_k, settings.RECOMMENDATIONS_MAX_TOP_K))
+    mutual = request.query_params.get("mutual", "").lower() in ("1", "true", "yes")
+
+    matches = get_recommendations_for_user(
+        current_user_id=user_id, top_k=top_k, min_score=min_score, mutual=mutual
+    )
 
     result = []
     for item in matches:
@@ -139,6 +199,35 @@ def recommendations_view(request):
     return Response(result)
 
 
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def recommendation_cache_stats_view(request):
+    """
+    GET /api/recommendations/cache-stats/
+    Hit/miss counters of the recommendation cache (this process only).
+    """
+    return Response(recommendation_cache_stats())
+
+
+@api_view(["GET", "POST"])
+@permission_classes([IsAdminUser])
+def mentor_index_health_view(request):
+    """
+    GET  /api/recommendations/index/
+        -> snapshot age, build duration and size (this process only)
+    POST /api/recommendations/index/
+        -> start a background rebuild
+    """
+    if request.method == "POST":
+        started = rebuild_mentor_index_async()
+        return Response(
+            {"started": started, **mentor_index_holder.status()},
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+    return Response(mentor_index_holder.status())
+
+
 
 # -------------------------------
 #   SKILLS: LIST ALL SKILLS
@@ -155,9 +244,12 @@ class SkillsListView(APIView):
     def get(self, request):
         from .serializers import SkillSerializer
 
-        qs = Skill.objects.all().order_by("name")
-        serializer = SkillSerializer(qs, many=True)
-        return Response(serializer.data)
+        def build():
+            qs = Skill.objects.all().order_by("name")
+            return SkillSerializer(qs, many=True).data
+
+        # one shared body for everyone, until a skill changes
+        return versioned_response(request, "skills", [SKILL_CATALOG], build)
 
 
 
@@ -223,68 +315,87 @@ class LearningRequestCreateView(APIView):
 
 class IncomingRequestsView(APIView):
     """
-    GET /api/requests/incoming/
-    Requests where current user is the teacher (to_user)
+    GET /api/requests/incoming/?page_size=50&cursor=...
+    Requests where current user is the teacher (to_user),
+    newest first, one cursor page at a time.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        qs = LearningRequest.objects.filter(
-            to_user=request.user
-        ).order_by("-created_at")
-        serializer = LearningRequestSerializer(qs, many=True)
-        return Response(serializer.data)
+        # the serializer reads both usernames
+        qs = LearningRequest.objects.filter(to_user=request.user).select_related(
+            "from_user", "to_user"
+        )
+
+        paginator = NewestFirstCursorPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        serializer = LearningRequestSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class OutgoingRequestsView(APIView):
     """
-    GET /api/requests/outgoing/
-    Requests current user has sent
+    GET /api/requests/outgoing/?page_size=50&cursor=...
+    Requests current user has sent,
+    newest first, one cursor page at a time.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        qs = LearningRequest.objects.filter(
-            from_user=request.user
-        ).order_by("-created_at")
-        serializer = LearningRequestSerializer(qs, many=True)
-        return Response(serializer.data)
+        # the serializer reads both usernames
+        qs = LearningRequest.objects.filter(from_user=request.user).select_related(
+            "from_user", "to_user"
+        )
+
+        paginator = NewestFirstCursorPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+        serializer = LearningRequestSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class ConnectionsView(APIView):
     """
-    GET /api/connections/
-    List all accepted learning relationships for the current user.
+    GET /api/connections/?page_size=50&cursor=...
+    List all accepted learning relationships for the current user,
+    newest first, one cursor page at a time.
     """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
+        # conversations are stored with user1.id < user2.id (see accept),
+        # but old rows may not be, so match the pair both ways
+        conversation = (
+            Conversation.objects.filter(
+                Q(user1=OuterRef("from_user"), user2=OuterRef("to_user"))
+                | Q(user1=OuterRef("to_user"), user2=OuterRef("from_user"))
+            )
+            .order_by("id")
+            .values("id")[:1]
+        )
         qs = (
             LearningRequest.objects.filter(status="accepted")
             .filter(
                 Q(from_user=request.user) | Q(to_user=request.user)
             )
             .select_related("from_user", "to_user")
-            .order_by("-created_at")
+            .annotate(conversation_id=Subquery(conversation))
         )
 
+        paginator = NewestFirstCursorPagination()
+        page = paginator.paginate_queryset(qs, request, view=self)
+
         results = []
-        for lr in qs:
-            if lr.from_user == request.user:
+        for lr in page:
+            if lr.from_user_id == request.user.id:
                 other = lr.to_user
                 role = "learner"
             else:
                 other = lr.from_user
                 role = "teacher"
 
-            conv = Conversation.objects.filter(
-                Q(user1=request.user, user2=other)
-                | Q(user1=other, user2=request.user)
-            ).first()
-
             results.append(
                 {
                     "id": lr.id,
@@ -294,11 +405,11 @@ class ConnectionsView(APIView):
                     "status": lr.status,
                     "role": role,
                     "created_at": lr.created_at,
-                    "conversation_id": conv.id if conv else None,
+                    "conversation_id": lr.conversation_id,
                 }
             )
 
-        return Response(results)
+        return paginator.get_paginated_response(results)
 
 
 class LearningRequestActionView(APIView):
@@ -409,8 +520,18 @@ class MySkillsView(APIView):
     """
 
     permission_classes = [IsAuthenticated]
+    save_attempts = 3
 
     def get(self, request):
+        user_id = request.user.id
+        return versioned_response(
+            request,
+            f"my-skills:{user_id}",
+            [user_version_key(user_id), SKILL_CATALOG],
+            lambda: self.build(request),
+        )
+
+    def build(self, request):
         have_qs = (
             UserSkillHave.objects
             .filter(user=request.user)
@@ -443,7 +564,7 @@ class MySkillsView(APIView):
             for w in want_qs
         ]
 
-        return Response({"have": have_data, "want": want_data})
+        return {"have": have_data, "want": want_data}
 
     def post(self, request):
         # expect: { "have": [ {...} ], "want": [ {...} ] }
@@ -461,63 +582,154 @@ class MySkillsView(APIView):
         want_ids = [item.get("skill_id") for item in want_list if item.get("skill_id")]
         all_ids = set(have_ids + want_ids)
 
-        skills = Skill.objects.filter(id__in=all_ids)
-        skill_map = {s.id: s for s in skills}
-
-        # clear previous skills for this user
-        UserSkillHave.objects.filter(user=request.user).delete()
-        UserSkillWant.objects.filter(user=request.user).delete()
+        skill_names = dict(
+            Skill.objects.filter(id__in=all_ids).values_list("id", "name")
+        )
 
-        # "have" with levels
+        # desired state: "have" with levels (a skill listed twice keeps its
+        # last level), "want" each skill once
+        have_levels = {}
         for item in have_list:
             sid = item.get("skill_id")
-            if not sid or sid not in skill_map:
+            if not sid or sid not in skill_names:
                 continue
 
             level = item.get("level", "intermediate")
             if level not in ["beginner", "intermediate", "advanced"]:
                 level = "intermediate"
+            have_levels[sid] = level
 
-            UserSkillHave.objects.create(
-                user=request.user,
-                skill=skill_map[sid],
-                level=level,
-            )
+        want_sids = {
+            item.get("skill_id")
+            for item in want_list
+            if item.get("skill_id") in skill_names
+        }
 
-        # "want"
-        for item in want_list:
-            sid = item.get("skill_id")
-            if not sid or sid not in skill_map:
+        for _ in range(self.save_attempts):
+            try:
+                have_rows, want_rows = self.apply_diff(
+                    request.user, have_levels, want_sids
+                )
+                break
+            except IntegrityError:
+                # a concurrent save added one of these skills first (the
+                # row locks only cover rows that existed): diff again
                 continue
-
-            UserSkillWant.objects.create(
-                user=request.user,
-                skill=skill_map[sid],
+        else:
+            return Response(
+                {"detail": "Your skills were changed meanwhile, please retry."},
+                status=status.HTTP_409_CONFLICT,
             )
 
-        # return fresh data so frontend can update its state
-        return self.get(request)
+        # new state from what we just wrote, same shape as get()
+        have_data = sorted(
+            (
+                {
+                    "id": have_rows[sid].id,
+                    "skill_id": sid,
+                    "skill_name": skill_names[sid],
+                    "level": level,
+                }
+                for sid, level in have_levels.items()
+            ),
+            key=lambda row: row["skill_name"],
+        )
+        want_data = sorted(
+            (
+                {
+                    "id": want_rows[sid].id,
+                    "skill_id": sid,
+                    "skill_name": skill_names[sid],
+                }
+                for sid in want_sids
+            ),
+            key=lambda row: row["skill_name"],
+        )
+
+        return Response({"have": have_data, "want": want_data})
+
+    def apply_diff(self, user, have_levels, want_sids):
+        """
+        Apply the desired state as a diff in one transaction; returns the
+        (have_rows, want_rows) now stored, by skill id.
+        """
+        with transaction.atomic(), skill_row_signals_muted(user.id):
+            have_qs = UserSkillHave.objects.select_for_update().filter(user=user)
+            want_qs = UserSkillWant.objects.select_for_update().filter(user=user)
+            have_rows = {h.skill_id: h for h in have_qs}
+            want_rows = {w.skill_id: w for w in want_qs}
+
+            # diff against what is stored
+            removed_have = [
+                h.id for sid, h in have_rows.items() if sid not in have_levels
+            ]
+            removed_want = [
+                w.id for sid, w in want_rows.items() if sid not in want_sids
+            ]
+            changed_have = []
+            for sid, h in have_rows.items():
+                if sid in have_levels and h.level != have_levels[sid]:
+                    h.level = have_levels[sid]
+                    changed_have.append(h)
+            added_have = [
+                UserSkillHave(user=user, skill_id=sid, level=level)
+                for sid, level in have_levels.items()
+                if sid not in have_rows
+            ]
+            added_want = [
+                UserSkillWant(user=user, skill_id=sid)
+                for sid in want_sids
+                if sid not in want_rows
+            ]
+
+            if removed_have:
+                UserSkillHave.objects.filter(id__in=removed_have).delete()
+            if removed_want:
+                UserSkillWant.objects.filter(id__in=removed_want).delete()
+            if changed_have:
+                UserSkillHave.objects.bulk_update(changed_have, ["level"])
+            if added_have:
+                UserSkillHave.objects.bulk_create(added_have)
+            if added_want:
+                UserSkillWant.objects.bulk_create(added_want)
+
+            if any(
+                (removed_have, removed_want, changed_have, added_have, added_want)
+            ):
+                # one notification for the whole update (index, caches)
+                skills_changed.send(sender=self.__class__, user_id=user.id)
+
+        for h in added_have:
+            have_rows[h.skill_id] = h
+        for w in added_want:
+            want_rows[w.skill_id] = w
+        return have_rows, want_rows
 
 
 
 class UserSearchView(APIView):
+    """
+    GET /api/users/search/?q=jo
+    GET /api/users/search/?teaches=react&q=ana
+    Users by name / username prefix (q, also matches their skills) and by
+    a skill they teach (teaches), best match first.
+    """
+
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         q = request.query_params.get("q", "").strip()
+        teaches = request.query_params.get("teaches", "").strip()
 
-        if not q:
+        if not q and not teaches:
             return Response([])
 
-        queryset = (
-            User.objects.filter(
-                Q(username__icontains=q)
-                | Q(first_name__icontains=q)
-                | Q(last_name__icontains=q)
-            )
-            .exclude(id=request.user.id)  # don’t show yourself
-            .order_by("username")[:20]    # limit some results
+        users = search_users(
+            q,
+            teaches,
+            exclude_id=request.user.id,  # don’t show yourself
+            limit=20,                    # limit some results
         )
 
-        serializer = UserSearchSerializer(queryset, many=True)
+        serializer = UserSearchSerializer(users, many=True)
         return Response(serializer.data)
\ No newline at end of file
@@ -0,0 +1,98 @@
+"""
+Recall vs latency of the approximate (LSH) matcher against the exact one.
+
+    cd backend
+    python -m benchmarks.ann_recall --users 10000 100000 1000000
+
+Prints one JSON document. Recall@k counts an approximate result as a hit
+when its score is at least the k-th best exact score (ties count).
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from ml.ann import DEFAULT_BITS, DEFAULT_PROBE, DEFAULT_TABLES
+from ml.index import EXACT, LSH, MentorIndex
+
+from .synthetic import make_population
+from .timing import percentile_ms
+
+
+def run(n_users, queries, top_k, lsh_params, seed):
+    arrays = make_population(n_users, seed=seed)
+
+    started = time.perf_counter()
+    index = MentorIndex.from_arrays(arrays)
+    index_seconds = time.perf_counter() - started
+
+    rng = np.random.default_rng(seed + 1)
+    learners = rng.choice(np.unique(arrays.want_user_ids), queries, replace=False)
+
+    # first LSH query builds the hash tables
+    started = time.perf_counter()
+    index.query(int(learners[0]), top_k=top_k, mode=LSH, lsh_params=lsh_params)
+    lsh_build_seconds = time.perf_counter() - started
+
+    exact_times, lsh_times, recalls = [], [], []
+    for user_id in learners.tolist():
+        started = time.perf_counter()
+        # min_score > 0: zero-score "fillers" are not real matches
+        exact = index.query(user_id, top_k=top_k, min_score=1e-12, mode=EXACT)
+        exact_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        approx = index.query(
+            user_id, top_k=top_k, min_score=1e-12, mode=LSH, lsh_params=lsh_params
+        )
+        lsh_times.append(time.perf_counter() - started)
+
+        if exact:
+            kth = exact[-1][1] - 1e-12
+            recalls.append(sum(score >= kth for _, score in approx) / len(exact))
+
+    return {
+        "users": n_users,
+        "queries": int(len(learners)),
+        "top_k": top_k,
+        "lsh": lsh_params,
+        "index_build_s": index_seconds,
+        "lsh_build_s": lsh_build_seconds,
+        "exact_ms": {
+            "p50": percentile_ms(exact_times, 50),
+            "p95": percentile_ms(exact_times, 95),
+        },
+        "lsh_ms": {
+            "p50": percentile_ms(lsh_times, 50),
+            "p95": percentile_ms(lsh_times, 95),
+        },
+        "recall_at_k": float(np.mean(recalls)) if recalls else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--users", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--tables", type=int, default=DEFAULT_TABLES)
+    parser.add_argument("--bits", type=int, default=DEFAULT_BITS)
+    parser.add_argument(
+        "--probe", action=argparse.BooleanOptionalAction, default=DEFAULT_PROBE
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    lsh_params = {"tables": args.tables, "bits": args.bits, "probe": args.probe}
+    results = [
+        run(n_users, args.queries, args.top_k, lsh_params, args.seed)
+        for n_users in args.users
+    ]
+    print(json.dumps({"benchmark": "ann_recall", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
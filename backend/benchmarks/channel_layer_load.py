@@ -0,0 +1,154 @@
+"""
+Throughput of UnixSocketChannelLayer as worker processes are added.
+
+    cd backend
+    python -m benchmarks.channel_layer_load --workers 1 2 4 8 --messages 2000
+
+For every worker count N, a fresh broker is started and N processes each
+add --channels channels to one group, then all of them group_send
+--messages messages at once while receiving on their own channels (every
+message reaches N * channels consumers, as in a chat room spread over
+the workers). Reported per N:
+
+  messages_per_s    group_send calls per second, all workers together
+  deliveries_per_s  messages taken off consumer channels per second
+  lost              deliveries that never arrived (full channels)
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def worker(path, n_channels, n_messages, expected, barrier, results):
+    from core.channel_layers import UnixSocketChannelLayer
+
+    layer = UnixSocketChannelLayer(path=path, autostart=False, capacity=100000)
+
+    async def consume(channel, counts, finished):
+        while True:
+            await layer.receive(channel)
+            counts[0] += 1
+            if counts[0] == expected:
+                finished.set()
+
+    async def run():
+        channels = [await layer.new_channel() for _ in range(n_channels)]
+        for channel in channels:
+            await layer.group_add("bench", channel)
+        await asyncio.get_running_loop().run_in_executor(None, barrier.wait)
+
+        started = time.perf_counter()
+        counts = [0]
+        finished = asyncio.Event()
+        consumers = [
+            asyncio.create_task(consume(channel, counts, finished))
+            for channel in channels
+        ]
+        for i in range(n_messages):
+            await layer.group_send("bench", {"type": "chat.message", "n": i})
+        sent = time.perf_counter()
+        try:
+            await asyncio.wait_for(finished.wait(), 30)
+        except asyncio.TimeoutError:
+            pass
+        done = time.perf_counter()
+        for task in consumers:
+            task.cancel()
+        await layer.close()
+        return started, sent, done, counts[0]
+
+    results.put(asyncio.run(run()))
+
+
+def measure(n_workers, n_channels, n_messages):
+    path = os.path.join(tempfile.mkdtemp(), "bench.sock")
+    broker = subprocess.Popen(
+        [sys.executable, "-m", "core.channel_broker", "--path", path,
+         "--capacity", "100000"],
+        cwd=BACKEND_DIR,
+        stderr=subprocess.DEVNULL,
+    )
+    try:
+        for _ in range(100):
+            if os.path.exists(path):
+                break
+            time.sleep(0.05)
+
+        # every worker receives every message on each of its channels
+        per_worker = n_workers * n_messages * n_channels
+        ctx = multiprocessing.get_context("spawn")
+        barrier = ctx.Barrier(n_workers)
+        results = ctx.Queue()
+        procs = [
+            ctx.Process(
+                target=worker,
+                args=(path, n_channels, n_messages, per_worker, barrier, results),
+            )
+            for _ in range(n_workers)
+        ]
+        for proc in procs:
+            proc.start()
+        runs = [results.get() for _ in procs]
+        for proc in procs:
+            proc.join()
+    finally:
+        broker.terminate()
+        broker.wait()
+
+    # perf_counter is system-wide on Linux, so the workers' clocks line up
+    started = min(run[0] for run in runs)
+    sent = max(run[1] for run in runs)
+    done = max(run[2] for run in runs)
+    received = sum(run[3] for run in runs)
+    messages = n_workers * n_messages
+    return {
+        "workers": n_workers,
+        "channels_per_worker": n_channels,
+        "messages": messages,
+        "deliveries": received,
+        "lost": per_worker * n_workers - received,
+        "send_s": sent - started,
+        "total_s": done - started,
+        "messages_per_s": messages / (sent - started),
+        "deliveries_per_s": received / (done - started),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--channels", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    results = [measure(n, args.channels, args.messages) for n in args.workers]
+    report = {
+        "benchmark": "channel_layer_load",
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
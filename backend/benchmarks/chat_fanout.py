@@ -0,0 +1,120 @@
+"""
+Chat broadcast throughput versus room size: encoding the frame once per
+message (ChatConsumer today) against once per room member (before).
+
+    cd backend
+    python -m benchmarks.chat_fanout --room-sizes 1 10 100 1000
+
+Each message goes through a real InMemoryChannelLayer group_send and is
+taken off every member's channel; "per_member" then json-encodes the
+event for each member, "once" sends the text the sender encoded. Every
+strategy is run with each available JSON codec (core.json_codec).
+Reported: messages/s and deliveries/s (messages * room size), and the
+time spent encoding, which is the part the two strategies differ in (the
+in-memory layer's own per-receive cost dominates large rooms).
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+from core.json_codec import CODECS
+
+MESSAGE = {"message": "Hey, are you free for a React session on Friday?",
+           "senderName": "learner1"}
+
+
+async def run_room(room_size, n_messages, strategy, dumps):
+    layer = InMemoryChannelLayer(capacity=n_messages + 1)
+    channels = [await layer.new_channel() for _ in range(room_size)]
+    for channel in channels:
+        await layer.group_add("room", channel)
+
+    sent_bytes = 0
+    encoding = 0.0  # time spent in dumps, the part the strategies change
+    started = time.perf_counter()
+    for _ in range(n_messages):
+        if strategy == "once":
+            t0 = time.perf_counter()
+            frame = dumps({"system": False, **MESSAGE})
+            encoding += time.perf_counter() - t0
+            await layer.group_send("room", {"type": "chat.message", "text": frame})
+        else:
+            await layer.group_send("room", {"type": "chat.message", **MESSAGE})
+
+        for channel in channels:
+            event = await layer.receive(channel)
+            if strategy == "once":
+                text = event["text"]
+            else:
+                t0 = time.perf_counter()
+                text = dumps(
+                    {
+                        "system": False,
+                        "message": event["message"],
+                        "senderName": event.get("senderName"),
+                    }
+                )
+                encoding += time.perf_counter() - t0
+            sent_bytes += len(text)
+    elapsed = time.perf_counter() - started
+
+    return {
+        "room_size": room_size,
+        "strategy": strategy,
+        "messages": n_messages,
+        "seconds": elapsed,
+        "messages_per_s": n_messages / elapsed,
+        "deliveries_per_s": n_messages * room_size / elapsed,
+        "encode_seconds": encoding,
+        "encode_us_per_message": encoding / n_messages * 1e6,
+        "bytes_sent": sent_bytes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--room-sizes", type=int, nargs="+", default=[1, 10, 100, 1000]
+    )
+    parser.add_argument(
+        "--deliveries",
+        type=int,
+        default=200000,
+        help="messages per run = deliveries // room size (at least 20)",
+    )
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = []
+    for codec, (dumps, _) in CODECS.items():
+        for room_size in args.room_sizes:
+            n_messages = max(20, args.deliveries // room_size)
+            for strategy in ("per_member", "once"):
+                result = asyncio.run(run_room(room_size, n_messages, strategy, dumps))
+                result["codec"] = codec
+                results.append(result)
+
+    report = {
+        "benchmark": "chat_fanout",
+        "python": platform.python_version(),
+        "codecs": list(CODECS),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Cold-start cost of the backend: how long importing each entry point takes
+in a fresh interpreter, and which packages that time goes to.
+
+    cd backend
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time core.asgi --budget-ms 1500
+
+Every target is imported in its own `python -X importtime` subprocess
+(nothing cached from a previous import), --repeat times; the median run
+is reported. "packages" is the self time of every module summed per
+top-level package (django, numpy, scipy, ...), heaviest first.
+
+With --budget-ms the exit status is 1 when a target's median wall time
+is over budget, so it can run in CI.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# what a web worker ends up importing, smallest first
+DEFAULT_TARGETS = ["ml.matcher", "ml.index", "core.wsgi", "core.asgi"]
+
+# reported as loaded / not loaded for every target
+HEAVY_PACKAGES = ("sklearn", "scipy", "pandas")
+
+
+def parse_importtime(stderr):
+    """
+    [(module, self_us, cumulative_us)] from `-X importtime` output.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue  # header line
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def import_once(target):
+    env = dict(os.environ)
+    env.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {target}"],
+        cwd=BACKEND_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {target} failed:\n{proc.stderr[-2000:]}")
+    return wall, parse_importtime(proc.stderr)
+
+
+def measure_target(target, repeat, top):
+    runs = sorted((import_once(target) for _ in range(repeat)), key=lambda r: r[0])
+    wall, modules = runs[len(runs) // 2]
+
+    packages = defaultdict(int)
+    cumulative = {}
+    for name, self_us, cumulative_us in modules:
+        packages[name.split(".")[0]] += self_us
+        cumulative.setdefault(name, cumulative_us)
+
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return {
+        "target": target,
+        "runs": repeat,
+        "wall_ms": wall * 1000,
+        "wall_ms_all": [run[0] * 1000 for run in runs],
+        "import_ms": cumulative.get(target, 0) / 1000,
+        "modules": len(modules),
+        "packages": {name: us / 1000 for name, us in heaviest},
+        "loaded": {name: name in packages for name in HEAVY_PACKAGES},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("targets", nargs="*", default=DEFAULT_TARGETS)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = [measure_target(t, args.repeat, args.top) for t in args.targets]
+    report = {
+        "benchmark": "import_time",
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+    if args.budget_ms is not None:
+        over = [r["target"] for r in results if r["wall_ms"] > args.budget_ms]
+        if over:
+            sys.stderr.write(
+                f"over the {args.budget_ms:.0f} ms budget: {', '.join(over)}\n"
+            )
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
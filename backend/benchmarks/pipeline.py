@@ -0,0 +1,190 @@
+"""
+Stage-by-stage timings of the recommendation pipeline on synthetic users.
+
+    cd backend
+    python -m benchmarks.pipeline --users 1000 10000 100000 --db --output run.json
+
+Stages (p50/p95 latency and peak traced memory each):
+  legacy.*  find_best_mentors() pieces on the list-of-dicts format
+            (vocabulary build, vectorization, similarity, top-k)
+  index.*   MentorIndex build, posting-list similarity, full query
+  db.*      build_users_list_for_ml() vs load_skill_arrays() on a
+            throwaway test database (only with --db)
+
+Output is one JSON document, so two runs can be diffed or compared.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+
+import numpy as np
+
+from ml import matcher
+from ml.index import MentorIndex
+
+from .synthetic import make_population, to_users_list
+from .timing import measure, peak_memory, summarize, timed
+
+
+def per_query(fn, learners):
+    """
+    Latency of fn(learner) over all learners, peak memory of the first.
+    """
+    _, peak = peak_memory(fn, learners[0])
+    samples = [timed(fn, learner)[1] for learner in learners]
+    return summarize(samples, peak)
+
+
+def legacy_stages(arrays, learners, repeat):
+    users_list = to_users_list(arrays)
+    by_id = {user["id"]: user for user in users_list}
+    stages = {}
+
+    vocab, stages["legacy.vocab"] = measure(
+        matcher.build_skill_vocab, repeat, users_list
+    )
+
+    def vectorize():
+        return np.stack(
+            [matcher.build_have_vector(user, vocab) for user in users_list]
+        )
+
+    mentor_matrix, stages["legacy.vectorize"] = measure(vectorize, repeat)
+
+    want_vectors = {
+        user_id: matcher.build_want_vector(by_id[user_id], vocab).reshape(1, -1)
+        for user_id in learners
+    }
+
+    def similarity(user_id):
+        return matcher.cosine_similarity(want_vectors[user_id], mentor_matrix)[0]
+
+    stages["legacy.similarity"] = per_query(similarity, learners)
+
+    sims = {user_id: similarity(user_id) for user_id in learners}
+    tie_keys = np.arange(mentor_matrix.shape[0])
+    stages["legacy.top_k"] = per_query(
+        lambda user_id: matcher.select_top_k(sims[user_id], tie_keys, 5), learners
+    )
+    return stages
+
+
+def index_stages(arrays, learners, repeat):
+    stages = {}
+    index, stages["index.build"] = measure(MentorIndex.from_arrays, repeat, arrays)
+
+    def similarity(user_id):
+        matrices = index.matrices
+        wanted = index.wanted_columns(user_id, matrices)
+        want_vec = np.zeros(matrices.have.shape[1])
+        want_vec[wanted] = 1.0
+        return index._overlapping_mentors(matrices, wanted, want_vec)
+
+    similarity(learners[0])  # builds the posting lists
+    stages["index.similarity"] = per_query(similarity, learners)
+    stages["index.query"] = per_query(lambda user_id: index.query(user_id), learners)
+    return stages
+
+
+def db_stages(arrays, repeat):
+    from django.core.management import call_command
+
+    from api.services import build_users_list_for_ml, load_skill_arrays
+
+    from .synthetic import seed_database
+
+    call_command("flush", interactive=False, verbosity=0)
+    seed_database(arrays)
+
+    stages = {}
+    _, stages["db.build_users_list_for_ml"] = measure(build_users_list_for_ml, repeat)
+    _, stages["db.load_skill_arrays"] = measure(load_skill_arrays, repeat)
+    return stages
+
+
+def setup_django():
+    """
+    Configure Django and switch to a throwaway test database.
+    Returns a function that drops it again.
+    """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
+    import django
+
+    django.setup()
+
+    from django.db import connection
+
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False
+    )
+    return lambda: connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--users", type=int, nargs="+", default=[1000, 10000, 100000]
+    )
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-legacy", action="store_true")
+    parser.add_argument("--db", action="store_true", help="also time the DB loaders")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    teardown = setup_django() if args.db else None
+
+    results = []
+    for n_users in args.users:
+        arrays = make_population(n_users, seed=args.seed)
+        rng = np.random.default_rng(args.seed + 1)
+        learners = rng.choice(
+            np.unique(arrays.want_user_ids),
+            min(args.queries, n_users),
+            replace=False,
+        ).tolist()
+
+        stages = {}
+        if not args.skip_legacy:
+            stages.update(legacy_stages(arrays, learners, args.repeat))
+        stages.update(index_stages(arrays, learners, args.repeat))
+        if args.db:
+            stages.update(db_stages(arrays, args.repeat))
+
+        results.append(
+            {
+                "users": n_users,
+                "have_rows": int(len(arrays.have_user_ids)),
+                "want_rows": int(len(arrays.want_user_ids)),
+                "stages": stages,
+            }
+        )
+
+    if teardown is not None:
+        teardown()
+
+    report = {
+        "benchmark": "pipeline",
+        "seed": args.seed,
+        "queries": args.queries,
+        "repeat": args.repeat,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+import numpy as np
+
+from ml.index import SkillArrays
+from ml.matcher import LEVEL_WEIGHTS
+
+
+# ----------------------------------------------------
+# SYNTHETIC POPULATIONS
+# ----------------------------------------------------
+# Seeded, so two runs with the same arguments see the same users.
+
+DEFAULT_SKILLS = 500
+
+# share of beginner / intermediate / advanced among "have" skills
+DEFAULT_LEVEL_MIX = (0.5, 0.35, 0.15)
+
+
+def zipf_popularity(n_skills, exponent=1.1):
+    """
+    Probability of each skill being picked: a few very popular skills
+    (react, python, dsa...) and a long tail.
+    """
+    ranks = np.arange(1, n_skills + 1, dtype=np.float64)
+    weights = ranks ** -exponent
+    return weights / weights.sum()
+
+
+def make_population(
+    n_users,
+    n_skills=DEFAULT_SKILLS,
+    have_range=(0, 5),
+    want_range=(1, 4),
+    level_mix=DEFAULT_LEVEL_MIX,
+    exponent=1.1,
+    seed=0,
+):
+    """
+    SkillArrays for n_users users (ids 1..n_users), skill ids 1..n_skills.
+    Each user has have_range / want_range skills drawn by Zipf popularity;
+    "have" levels follow level_mix.
+    """
+    rng = np.random.default_rng(seed)
+    popularity = zipf_popularity(n_skills, exponent)
+    user_ids = np.arange(1, n_users + 1, dtype=np.int64)
+
+    have_counts = rng.integers(have_range[0], have_range[1] + 1, n_users)
+    want_counts = rng.integers(want_range[0], want_range[1] + 1, n_users)
+
+    have_skills = rng.choice(n_skills, have_counts.sum(), p=popularity) + 1
+    want_skills = rng.choice(n_skills, want_counts.sum(), p=popularity) + 1
+    have_weights = rng.choice(
+        list(LEVEL_WEIGHTS.values()), len(have_skills), p=level_mix
+    )
+
+    have_users, have_skills, (have_weights,) = _unique_pairs(
+        np.repeat(user_ids, have_counts), have_skills, n_skills, have_weights
+    )
+    want_users, want_skills, _ = _unique_pairs(
+        np.repeat(user_ids, want_counts), want_skills, n_skills
+    )
+
+    return SkillArrays(
+        have_user_ids=have_users,
+        have_skill_ids=have_skills.astype(np.int64),
+        have_weights=have_weights.astype(np.int8),
+        want_user_ids=want_users,
+        want_skill_ids=want_skills.astype(np.int64),
+    )
+
+
+def _unique_pairs(users, skills, n_skills, *columns):
+    # a user lists each skill once (like the DB's (user, skill) rows)
+    _, first = np.unique(users * (n_skills + 1) + skills, return_index=True)
+    return users[first], skills[first], [column[first] for column in columns]
+
+
+def skill_name(skill_id):
+    return f"skill-{skill_id}"
+
+
+def to_users_list(arrays):
+    """
+    Same population in the list-of-dicts format of find_best_mentors().
+    """
+    levels = {weight: level for level, weight in LEVEL_WEIGHTS.items()}
+    users = {}
+
+    def user(user_id):
+        if user_id not in users:
+            users[user_id] = {
+                "id": user_id,
+                "name": f"user{user_id}",
+                "skills_have": [],
+                "skills_want": [],
+            }
+        return users[user_id]
+
+    for user_id, skill_id, weight in zip(
+        arrays.have_user_ids.tolist(),
+        arrays.have_skill_ids.tolist(),
+        arrays.have_weights.tolist(),
+    ):
+        user(user_id)["skills_have"].append(
+            {"name": skill_name(skill_id), "level": levels[weight]}
+        )
+
+    for user_id, skill_id in zip(
+        arrays.want_user_ids.tolist(), arrays.want_skill_ids.tolist()
+    ):
+        user(user_id)["skills_want"].append(skill_name(skill_id))
+
+    return [users[user_id] for user_id in sorted(users)]
+
+
+def seed_database(arrays, batch_size=5000):
+    """
+    Insert the population into the configured database (benchmarks only:
+    users get unusable passwords, rows go in with bulk_create).
+    Needs Django to be set up.
+    """
+    from django.contrib.auth import get_user_model
+
+    from api.models import Skill, UserSkillHave, UserSkillWant
+
+    User = get_user_model()
+    levels = {weight: level for level, weight in LEVEL_WEIGHTS.items()}
+
+    user_ids = np.unique(
+        np.concatenate([arrays.have_user_ids, arrays.want_user_ids])
+    )
+    skill_ids = np.unique(
+        np.concatenate([arrays.have_skill_ids, arrays.want_skill_ids])
+    )
+
+    User.objects.bulk_create(
+        (
+            User(id=user_id, username=f"user{user_id}", password="!")
+            for user_id in user_ids.tolist()
+        ),
+        batch_size=batch_size,
+    )
+    Skill.objects.bulk_create(
+        (
+            Skill(id=skill_id, name=skill_name(skill_id))
+            for skill_id in skill_ids.tolist()
+        ),
+        batch_size=batch_size,
+    )
+    UserSkillHave.objects.bulk_create(
+        (
+            UserSkillHave(user_id=user_id, skill_id=skill_id, level=levels[weight])
+            for user_id, skill_id, weight in zip(
+                arrays.have_user_ids.tolist(),
+                arrays.have_skill_ids.tolist(),
+                arrays.have_weights.tolist(),
+            )
+        ),
+        batch_size=batch_size,
+    )
+    UserSkillWant.objects.bulk_create(
+        (
+            UserSkillWant(user_id=user_id, skill_id=skill_id)
+            for user_id, skill_id in zip(
+                arrays.want_user_ids.tolist(), arrays.want_skill_ids.tolist()
+            )
+        ),
+        batch_size=batch_size,
+    )
@@ -0,0 +1,61 @@
+import time
+import tracemalloc
+
+import numpy as np
+
+
+# ----------------------------------------------------
+# TIMING HELPERS
+# ----------------------------------------------------
+def percentile_ms(samples, q):
+    return float(np.percentile(samples, q) * 1000) if len(samples) else None
+
+
+def summarize(samples, peak_bytes=None):
+    """
+    JSON-friendly latency summary of a list of durations (seconds).
+    """
+    summary = {
+        "runs": len(samples),
+        "p50_ms": percentile_ms(samples, 50),
+        "p95_ms": percentile_ms(samples, 95),
+        "max_ms": float(max(samples) * 1000) if samples else None,
+    }
+    if peak_bytes is not None:
+        summary["peak_mb"] = peak_bytes / (1024 * 1024)
+    return summary
+
+
+def peak_memory(fn, *args):
+    """
+    Run fn once under tracemalloc and return (result, peak bytes allocated
+    during the call). NumPy buffers are traced too.
+    """
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    baseline = tracemalloc.get_traced_memory()[0]
+    try:
+        result = fn(*args)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return result, peak
+
+
+def timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def measure(fn, repeat, *args):
+    """
+    Peak memory of one traced run + latency of `repeat` untraced runs
+    (tracemalloc slows code down, so it is kept out of the timings).
+    """
+    result, peak = peak_memory(fn, *args)
+    samples = []
+    for _ in range(repeat):
+        result, seconds = timed(fn, *args)
+        samples.append(seconds)
+    return result, summarize(samples, peak)
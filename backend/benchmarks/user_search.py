@@ -0,0 +1,244 @@
+"""
+Search-box latency: the FTS5 user search index (api/search.py) against
+the old icontains scan, on synthetic users.
+
+    cd backend
+    python -m benchmarks.user_search --users 10000 100000 1000000
+
+Users get generated first/last names, usernames built from them and
+the skills of benchmarks.synthetic (with word-like skill names). The
+queries replay typing: every prefix of a user's first name, of "first
+last", and of a skill name as ?teaches=. Reported per population:
+
+  index.rebuild          rebuilding the whole search table
+  fts.chars_N            search latency for N typed characters (5 = 5+)
+  fts.teaches            skill-name prefixes in the teaches column
+  legacy.chars_N         the previous username/first/last icontains query
+                         (--legacy-queries of them, it is slow)
+
+Runs on a throwaway test database; output is one JSON document.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+
+from .pipeline import setup_django
+from .synthetic import make_population
+from .timing import summarize, timed
+
+SYLLABLES = [
+    "an", "ba", "ce", "da", "el", "fi", "ga", "ha", "in", "jo", "ka", "li",
+    "ma", "ne", "ol", "pa", "ra", "sa", "ti", "ur", "va", "wi", "ya", "zo",
+    "ri", "lo", "mi", "no", "ku", "te",
+]
+
+
+def make_words(rng, count, min_syllables=2, max_syllables=3):
+    """
+    count distinct pronounceable words ("jomari", "kalite", ...).
+    """
+    words = set()
+    while len(words) < count:
+        n = rng.integers(min_syllables, max_syllables + 1)
+        words.add("".join(rng.choice(SYLLABLES, n)))
+    return sorted(words)
+
+
+def seed_users(arrays, rng, batch_size=20000):
+    """
+    Users with names plus the population's skills, inserted with raw
+    executemany (bulk_create is too slow for a million users).
+    """
+    from django.db import connection, transaction
+
+    from api.models import Skill, UserSkillHave, UserSkillWant
+    from ml.matcher import LEVEL_WEIGHTS
+
+    n_users = int(max(arrays.have_user_ids.max(), arrays.want_user_ids.max()))
+    n_skills = int(max(arrays.have_skill_ids.max(), arrays.want_skill_ids.max()))
+    first_names = make_words(rng, 3000)
+    last_names = make_words(rng, 8000, 3, 4)
+    skill_names = make_words(rng, n_skills, 2, 4)
+    firsts = rng.integers(0, len(first_names), n_users)
+    lasts = rng.integers(0, len(last_names), n_users)
+    levels = {weight: level for level, weight in LEVEL_WEIGHTS.items()}
+
+    def rows_in_batches(rows):
+        for start in range(0, len(rows), batch_size):
+            yield rows[start:start + batch_size]
+
+    users = [
+        (
+            user_id,
+            "!",
+            False,
+            f"{first_names[f]}_{last_names[l][:3]}{user_id}",
+            first_names[f].title(),
+            last_names[l].title(),
+            "",
+            False,
+            True,
+            "2026-01-01 00:00:00",
+        )
+        for user_id, f, l in zip(
+            range(1, n_users + 1), firsts.tolist(), lasts.tolist()
+        )
+    ]
+    haves = list(
+        zip(
+            arrays.have_user_ids.tolist(),
+            arrays.have_skill_ids.tolist(),
+            [levels[w] for w in arrays.have_weights.tolist()],
+        )
+    )
+    wants = list(
+        zip(arrays.want_user_ids.tolist(), arrays.want_skill_ids.tolist())
+    )
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        for batch in rows_in_batches(users):
+            cursor.executemany(
+                "INSERT INTO auth_user (id, password, is_superuser, username, "
+                "first_name, last_name, email, is_staff, is_active, date_joined) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                batch,
+            )
+        cursor.executemany(
+            f"INSERT INTO {Skill._meta.db_table} (id, name) VALUES (%s, %s)",
+            list(enumerate(skill_names, start=1)),
+        )
+        for batch in rows_in_batches(haves):
+            cursor.executemany(
+                f"INSERT INTO {UserSkillHave._meta.db_table} "
+                "(user_id, skill_id, level) VALUES (%s, %s, %s)",
+                batch,
+            )
+        for batch in rows_in_batches(wants):
+            cursor.executemany(
+                f"INSERT INTO {UserSkillWant._meta.db_table} "
+                "(user_id, skill_id) VALUES (%s, %s)",
+                batch,
+            )
+
+    return [
+        (first_names[f].title(), last_names[l].title())
+        for f, l in zip(firsts.tolist(), lasts.tolist())
+    ], skill_names
+
+
+def keystrokes(text):
+    return [text[:n] for n in range(1, len(text) + 1)]
+
+
+def bucket(prefix):
+    return f"chars_{min(len(prefix), 5)}"
+
+
+def legacy_search(q):
+    from django.contrib.auth import get_user_model
+    from django.db.models import Q
+
+    User = get_user_model()
+    return list(
+        User.objects.filter(
+            Q(username__icontains=q)
+            | Q(first_name__icontains=q)
+            | Q(last_name__icontains=q)
+        )
+        .order_by("username")
+        .values_list("id", flat=True)[:20]
+    )
+
+
+def run_population(n_users, n_typists, legacy_queries, seed):
+    from django.core.management import call_command
+    from django.db import transaction
+
+    from api.search import rebuild_search_index, search_user_ids
+
+    call_command("flush", interactive=False, verbosity=0)
+    rng = np.random.default_rng(seed)
+    arrays = make_population(n_users, seed=seed)
+
+    started = time.perf_counter()
+    names, skill_names = seed_users(arrays, rng)
+    seed_seconds = time.perf_counter() - started
+
+    with transaction.atomic():
+        _, rebuild_seconds = timed(rebuild_search_index)
+
+    typists = rng.choice(len(names), min(n_typists, len(names)), replace=False)
+    typed = []
+    for i in typists.tolist():
+        first, last = names[i]
+        typed += keystrokes(first.lower())
+        typed += keystrokes(f"{first} {last}".lower())
+
+    samples = {}
+    for prefix in typed:
+        _, seconds = timed(search_user_ids, prefix, "", 0, 20)
+        samples.setdefault(f"fts.{bucket(prefix)}", []).append(seconds)
+
+    popular = skill_names[: min(20, len(skill_names))]
+    for name in popular:
+        for prefix in keystrokes(name):
+            _, seconds = timed(search_user_ids, "", prefix, 0, 20)
+            samples.setdefault("fts.teaches", []).append(seconds)
+
+    for prefix in typed[:legacy_queries]:
+        _, seconds = timed(legacy_search, prefix)
+        samples.setdefault(f"legacy.{bucket(prefix)}", []).append(seconds)
+
+    stages = {"index.rebuild": summarize([rebuild_seconds])}
+    stages.update({name: summarize(s) for name, s in sorted(samples.items())})
+    return {
+        "users": n_users,
+        "seed_s": seed_seconds,
+        "queries": len(typed),
+        "stages": stages,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--users", type=int, nargs="+", default=[10000, 100000, 1000000]
+    )
+    parser.add_argument("--typists", type=int, default=50)
+    parser.add_argument("--legacy-queries", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    teardown = setup_django()
+    try:
+        results = [
+            run_population(n, args.typists, args.legacy_queries, args.seed)
+            for n in args.users
+        ]
+    finally:
+        teardown()
+
+    report = {
+        "benchmark": "user_search",
+        "seed": args.seed,
+        "python": platform.python_version(),
+        "results": results,
+    }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,32 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
-import json
+from django.conf import settings
+import asyncio
+import logging
+
+from core import json_codec
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------
+# SIGNALLING FRAMES
+# ----------------------------------------------------
+# The server only relays: frames are forwarded as the client sent them
+# (no json.loads / json.dumps per frame and recipient). The one thing it
+# looks at is the start of the text, which the frontend writes as
+# JSON.stringify({type, payload, sender}).
+#
+# ICE candidates arrive in bursts while a peer gathers them; they are
+# collected for CALL_ICE_BATCH_WINDOW seconds and relayed as one
+# {"type": "ice-batch", "payload": [<frame>, ...]} frame, built by
+# joining the raw frames. Any other frame first sends the candidates
+# collected so far, so peers see the frames in the order they were sent.
+ICE_PREFIX = '{"type":"ice"'
+ICE_BATCH_OPEN = '{"type":"ice-batch","payload":['
+ICE_BATCH_CLOSE = "]}"
+
+# a peer that stops reading gets closed instead of queueing without limit
+CLOSE_SLOW_PEER = 4008
 
 
 class CallConsumer(AsyncWebsocketConsumer):
@@ -7,6 +34,14 @@ class CallConsumer(AsyncWebsocketConsumer):
         self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
         self.room_group_name = f"video_{self.room_name}"
 
+        self.ice_batch = []
+        self.ice_timer = None
+        # the loop only keeps weak references to tasks: ours are kept here
+        self.tasks = set()
+        # frames for this peer wait here; one task writes them out
+        self.outbox = asyncio.Queue(maxsize=settings.CALL_SEND_QUEUE_MAX)
+        self.closing = False
+
         # join group
         await self.channel_layer.group_add(
             self.room_group_name,
@@ -14,10 +49,11 @@ class CallConsumer(AsyncWebsocketConsumer):
         )
 
         await self.accept()
+        self.writer = asyncio.create_task(self._write_outbox())
 
         # simple system message so we know it works
-        await self.send(
-            text_data=json.dumps(
+        self._enqueue(
+            json_codec.dumps(
                 {
                     "type": "system",
                     "message": f"Connected to video room {self.room_name}",
@@ -26,6 +62,18 @@ class CallConsumer(AsyncWebsocketConsumer):
         )
 
     async def disconnect(self, close_code):
+        if getattr(self, "writer", None) is not None:
+            self.writer.cancel()
+            if not self.outbox.empty():
+                logger.info(
+                    "video room %s: peer left with %d frames unsent",
+                    self.room_name,
+                    self.outbox.qsize(),
+                )
+
+        # the room still gets the candidates collected so far
+        await self._send_ice_batch()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
         await self.channel_layer.group_discard(
             self.room_group_name,
             self.channel_name,
@@ -33,23 +81,86 @@ class CallConsumer(AsyncWebsocketConsumer):
 
     async def receive(self, text_data=None, bytes_data=None):
         """
-        Later this will carry WebRTC signalling (offer/answer/ICE).
-        For now, we just broadcast whatever we get.
+        WebRTC signalling (offer/answer/ICE), relayed to everyone in the
+        room without being decoded.
         """
         if not text_data:
             return
+        if len(text_data) > settings.CALL_MAX_FRAME_BYTES or not (
+            text_data.startswith("{") and text_data.endswith("}")
+        ):
+            return  # not a signalling frame
+
+        if text_data.startswith(ICE_PREFIX):
+            self.ice_batch.append(text_data)
+            if len(self.ice_batch) >= settings.CALL_ICE_BATCH_MAX:
+                await self._send_ice_batch()
+            elif self.ice_timer is None:
+                self.ice_timer = asyncio.get_running_loop().call_later(
+                    settings.CALL_ICE_BATCH_WINDOW, self._on_ice_timer
+                )
+            return
+
+        await self._send_ice_batch()
+        await self._broadcast(text_data)
 
-        data = json.loads(text_data)
+    # ---------- outgoing (to the room) ----------
 
+    async def _broadcast(self, text):
         # broadcast to all peers in same video room
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 "type": "call.message",
-                "data": data,
+                "text": text,
             },
         )
 
+    def _on_ice_timer(self):
+        self.ice_timer = None
+        self._spawn(self._send_ice_batch())
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _send_ice_batch(self):
+        if self.ice_timer is not None:
+            self.ice_timer.cancel()
+            self.ice_timer = None
+
+        batch, self.ice_batch = self.ice_batch, []
+        if not batch:
+            return
+        if len(batch) == 1:
+            await self._broadcast(batch[0])
+        else:
+            await self._broadcast(ICE_BATCH_OPEN + ",".join(batch) + ICE_BATCH_CLOSE)
+
+    # ---------- incoming (to this peer) ----------
+
     async def call_message(self, event):
-        # send message to WebSocket
-        await self.send(text_data=json.dumps(event["data"]))
+        self._enqueue(event["text"])
+
+    def _enqueue(self, text):
+        if self.closing:
+            return
+        try:
+            self.outbox.put_nowait(text)
+        except asyncio.QueueFull:
+            # the writer is stuck on a peer that doesn't read
+            logger.warning(
+                "video room %s: %d frames queued for a slow peer, closing it",
+                self.room_name,
+                self.outbox.qsize(),
+            )
+            self.closing = True
+            self._spawn(self.close(code=CLOSE_SLOW_PEER))
+
+    async def _write_outbox(self):
+        # send() waits while the server's write buffer for this peer is
+        # full, so a slow peer backs up here, in the bounded outbox
+        while True:
+            text = await self.outbox.get()
+            await self.send(text_data=text)
@@ -1,3 +1,74 @@
-from django.test import TestCase
+import json
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.test import SimpleTestCase, override_settings
+
+from .routing import websocket_urlpatterns
+
+
+def signal(type, payload):
+    # what the frontend sends: JSON.stringify({type, payload, sender})
+    return json.dumps(
+        {"type": type, "payload": payload, "sender": "frontend"},
+        separators=(",", ":"),
+    )
+
+
+@override_settings(CALL_ICE_BATCH_WINDOW=60, CALL_ICE_BATCH_MAX=20)
+class CallSignallingTests(SimpleTestCase):
+    def test_frames_are_relayed_verbatim_and_ice_is_batched(self):
+        app = URLRouter(websocket_urlpatterns)
+
+        async def run():
+            caller = WebsocketCommunicator(app, "/ws/video/room1/")
+            callee = WebsocketCommunicator(app, "/ws/video/room1/")
+            await caller.connect()
+            await callee.connect()
+            await caller.receive_from()  # system messages
+            await callee.receive_from()
+
+            for i in range(3):
+                await caller.send_to(text_data=signal("ice", {"candidate": i}))
+            # the offer pushes the collected candidates out ahead of it
+            offer = signal("offer", {"sdp": "v=0 x"})
+            await caller.send_to(text_data=offer)
+
+            received = [await callee.receive_from() for _ in range(2)]
+            await caller.disconnect()
+            await callee.disconnect()
+            return offer, received
+
+        offer, (batch, relayed_offer) = async_to_sync(run)()
+
+        self.assertEqual(relayed_offer, offer)
+        batch = json.loads(batch)
+        self.assertEqual(batch["type"], "ice-batch")
+        self.assertEqual(
+            [frame["payload"]["candidate"] for frame in batch["payload"]],
+            [0, 1, 2],
+        )
+
+    def test_candidates_collected_before_leaving_are_sent(self):
+        app = URLRouter(websocket_urlpatterns)
+
+        async def run():
+            caller = WebsocketCommunicator(app, "/ws/video/room2/")
+            callee = WebsocketCommunicator(app, "/ws/video/room2/")
+            await caller.connect()
+            await callee.connect()
+            await caller.receive_from()
+            await callee.receive_from()
+
+            ice = signal("ice", {"candidate": 0})
+            await caller.send_to(text_data=ice)
+            await caller.disconnect()  # well within the batch window
+
+            received = await callee.receive_from()
+            await callee.disconnect()
+            return ice, received
+
+        ice, received = async_to_sync(run)()
+
+        self.assertEqual(received, ice)
@@ -0,0 +1,218 @@
+import asyncio
+import atexit
+import logging
+import threading
+import time
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Message
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------
+# WRITE-BEHIND MESSAGE BUFFER
+# ----------------------------------------------------
+# ChatConsumer broadcasts a message first and only queues it here. The
+# queue is written with one bulk_create once it holds max_size messages or
+# its oldest message is max_delay seconds old, whichever comes first.
+#
+# Ordering: messages are queued in the order the consumers received them,
+# get their created_at when queued, and batches are written one at a time
+# in queue order, so (created_at, id) follow the order of the chat.
+#
+# Messages still queued are written when a consumer disconnects and when
+# the process exits (atexit). A hard kill loses what is still queued
+# (normally at most max_delay seconds' worth).
+#
+# Failed batches go back to the front of the queue and are retried. While
+# the database stays down the queue keeps at most max_pending messages:
+# beyond that the oldest ones are dropped (they were broadcast already,
+# only their history is lost) and counted in stats()["dropped"].
+
+
+class MessageBuffer:
+    """
+    Per-process queue of chat.Message rows waiting to be inserted.
+    """
+
+    def __init__(self, max_size=50, max_delay=0.5, max_pending=10000):
+        self.max_size = max_size
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+
+        self._pending = []
+        # guards _pending between the event loop and atexit / sync flushes
+        self._pending_lock = threading.Lock()
+
+        self._loop = None
+        self._flush_lock = None  # asyncio.Lock, one flush at a time
+        self._timer = None
+        # the loop only keeps weak references to tasks: ours are kept here
+        self._tasks = set()
+
+        self._stats = {
+            "flushes": 0,
+            "flushed_messages": 0,
+            "failed_flushes": 0,
+            "dropped": 0,
+            "max_depth": 0,
+            "last_flush_ms": None,
+            "max_flush_ms": None,
+            "total_flush_ms": 0.0,
+        }
+
+    # ---------- queueing ----------
+
+    def add(self, room_id, sender_name, text):
+        """
+        Queue one message (call from the event loop).
+        Returns the unsaved Message.
+        """
+        self._bind_loop()
+        message = Message(
+            room_id=room_id,
+            sender_name=sender_name,
+            text=text,
+            created_at=timezone.now(),
+        )
+        with self._pending_lock:
+            self._pending.append(message)
+            dropped = self._drop_overflow()
+            depth = len(self._pending)
+            self._stats["max_depth"] = max(self._stats["max_depth"], depth)
+        if dropped:
+            logger.warning("chat buffer full: dropped %d messages", dropped)
+
+        if depth >= self.max_size:
+            self._cancel_timer()
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = self._loop.call_later(self.max_delay, self._on_timer)
+        return message
+
+    def _drop_overflow(self):
+        # caller holds _pending_lock; the oldest messages go first
+        excess = len(self._pending) - self.max_pending
+        if excess <= 0:
+            return 0
+        del self._pending[:excess]
+        self._stats["dropped"] += excess
+        return excess
+
+    def _bind_loop(self):
+        # the buffer outlives event loops (tests, server reloads): asyncio
+        # primitives belong to one loop, so recreate them on a new one
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._flush_lock = asyncio.Lock()
+            self._timer = None
+
+    def _on_timer(self):
+        self._timer = None
+        self._spawn_flush()
+
+    def _spawn_flush(self):
+        task = self._loop.create_task(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    # ---------- flushing ----------
+
+    async def flush(self):
+        """
+        Write everything queued so far. Batches never overlap, so they
+        reach the database in queue order.
+        """
+        self._bind_loop()
+        async with self._flush_lock:
+            with self._pending_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+
+            try:
+                await database_sync_to_async(self._write)(batch)
+            except Exception:
+                logger.exception(
+                    "chat buffer: writing %d messages failed", len(batch)
+                )
+                with self._pending_lock:
+                    # keep them, in front of anything queued meanwhile
+                    self._pending[:0] = batch
+                    self._stats["failed_flushes"] += 1
+                    dropped = self._drop_overflow()
+                if dropped:
+                    logger.warning("chat buffer full: dropped %d messages", dropped)
+                if self._timer is None:
+                    # try again later
+                    self._timer = self._loop.call_later(
+                        self.max_delay, self._on_timer
+                    )
+                return 0
+            return len(batch)
+
+    def flush_sync(self):
+        """
+        Blocking flush for code without an event loop (process exit).
+        """
+        with self._pending_lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            try:
+                self._write(batch)
+            except Exception:
+                logger.exception(
+                    "chat buffer: %d messages lost at shutdown", len(batch)
+                )
+        return len(batch)
+
+    def _write(self, batch):
+        started = time.perf_counter()
+        Message.objects.bulk_create(batch, batch_size=self.max_size)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        with self._pending_lock:
+            stats = self._stats
+            stats["flushes"] += 1
+            stats["flushed_messages"] += len(batch)
+            stats["last_flush_ms"] = elapsed_ms
+            stats["max_flush_ms"] = max(stats["max_flush_ms"] or 0.0, elapsed_ms)
+            stats["total_flush_ms"] += elapsed_ms
+
+    # ---------- metrics ----------
+
+    def depth(self):
+        with self._pending_lock:
+            return len(self._pending)
+
+    def stats(self):
+        with self._pending_lock:
+            stats = dict(self._stats)
+            stats["depth"] = len(self._pending)
+        total = stats.pop("total_flush_ms")
+        flushes = stats["flushes"]
+        stats["avg_flush_ms"] = total / flushes if flushes else None
+        stats["max_size"] = self.max_size
+        stats["max_delay"] = self.max_delay
+        stats["max_pending"] = self.max_pending
+        return stats
+
+
+message_buffer = MessageBuffer(
+    max_size=settings.CHAT_BUFFER_MAX_SIZE,
+    max_delay=settings.CHAT_BUFFER_MAX_DELAY,
+    max_pending=settings.CHAT_BUFFER_MAX_PENDING,
+)
+
+# server shutdown: whatever is still queued goes to the database
+atexit.register(message_buffer.flush_sync)
@@ -1,8 +1,8 @@
 from channels.generic.websocket import AsyncWebsocketConsumer
-from channels.db import database_sync_to_async
-import json
 
-from .models import Message
+from core import json_codec
+
+from .buffer import message_buffer
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
@@ -19,7 +19,7 @@ class ChatConsumer(AsyncWebsocketConsumer):
 
         # System message when someone connects
         await self.send(
-            text_data=json.dumps(
+            text_data=json_codec.dumps(
                 {
                     "system": True,
                     "message": f"Connected to room {self.room_id}",
@@ -33,44 +33,39 @@ class ChatConsumer(AsyncWebsocketConsumer):
             self.channel_name,
         )
 
+        # don't leave this user's last messages sitting in the buffer
+        await message_buffer.flush()
+
     async def receive(self, text_data=None, bytes_data=None):
         """
         Expect JSON: { "message": "...", "senderName": "learner1" }
         """
-        data = json.loads(text_data or "{}")
+        data = json_codec.loads(text_data or "{}")
 
         message = data.get("message", "").strip()
         sender_name = data.get("senderName", "Unknown")
 
         if message:
-            # save to DB
-            await self.save_message(self.room_id, sender_name, message)
-
-            # broadcast to group
+            # broadcast to group first, nobody waits for the database.
+            # The frame is encoded here, once, not by every member.
+            frame = json_codec.dumps(
+                {
+                    "system": False,
+                    "message": message,
+                    "senderName": sender_name,
+                }
+            )
             await self.channel_layer.group_send(
                 self.room_group_name,
                 {
                     "type": "chat.message",
-                    "message": message,
-                    "senderName": sender_name,
+                    "text": frame,
                 },
             )
 
-    async def chat_message(self, event):
-        await self.send(
-            text_data=json.dumps(
-                {
-                    "system": False,
-                    "message": event["message"],
-                    "senderName": event.get("senderName"),
-                }
-            )
-        )
+            # saved in the next batch insert (see chat/buffer.py)
+            message_buffer.add(self.room_id, sender_name, message)
 
-    @database_sync_to_async
-    def save_message(self, room_id, sender_name, text):
-        return Message.objects.create(
-            room_id=room_id,
-            sender_name=sender_name,
-            text=text,
-        )
+    async def chat_message(self, event):
+        # already encoded by the sender
+        await self.send(text_data=event["text"])
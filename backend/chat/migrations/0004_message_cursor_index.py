@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_remove_chatmessage_room_remove_chatmessage_sender_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room_id', '-created_at', '-id'], name='msg_room_created_idx'),
+        ),
+    ]
@@ -1,14 +1,24 @@
 from django.db import models
+from django.utils import timezone
 
 
 class Message(models.Model):
     room_id = models.CharField(max_length=100)
     sender_name = models.CharField(max_length=150)
     text = models.TextField()
-    created_at = models.DateTimeField(auto_now_add=True)
+    # set when the message is received, not when the buffered insert runs
+    # (see chat/buffer.py), hence no auto_now_add
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
 
     class Meta:
         ordering = ["created_at"]
+        indexes = [
+            # history cursor pages: WHERE room_id = ? ORDER BY created_at, id
+            models.Index(
+                fields=["room_id", "-created_at", "-id"],
+                name="msg_room_created_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.room_id} - {self.sender_name}: {self.text[:20]}"
@@ -1,8 +1,14 @@
 from django.urls import re_path
+
+from core.middleware import WebSocketMetricsMiddleware
+
 from .consumers import ChatConsumer
 
 # WebSocket URL patterns for the chat app
 websocket_urlpatterns = [
     # ws://127.0.0.1:8000/ws/chat/1/
-    re_path(r"ws/chat/(?P<room_id>\w+)/$", ChatConsumer.as_asgi()),
+    re_path(
+        r"ws/chat/(?P<room_id>\w+)/$",
+        WebSocketMetricsMiddleware(ChatConsumer.as_asgi()),
+    ),
 ]
@@ -1,3 +1,216 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from rest_framework.test import APIClient
+
+from core.channel_broker import ChannelBroker, ensure_private_dir
+from core.channel_layers import UnixSocketChannelLayer
+
+from .buffer import MessageBuffer
+from .models import Message
+from .routing import websocket_urlpatterns
+
+
+class MessageHistoryTests(TestCase):
+    def test_history_pages_go_back_in_time(self):
+        for i in range(5):
+            Message.objects.create(room_id="room1", sender_name="a", text=str(i))
+        Message.objects.create(room_id="room2", sender_name="a", text="other")
+
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user("a"))
+
+        url = "/api/chat/room1/messages/?page_size=2"
+        texts = []
+        while url:
+            page = client.get(url).json()
+            texts += [message["text"] for message in page["results"]]
+            url = page["next"]
+
+        self.assertEqual(texts, ["4", "3", "2", "1", "0"])
+
+
+class MessageBufferTests(TestCase):
+    def test_size_threshold_flushes_in_order(self):
+        buffer = MessageBuffer(max_size=3, max_delay=60)
+
+        async def send():
+            for i in range(7):
+                buffer.add("room1", "a", str(i))
+                await asyncio.sleep(0)  # let size-triggered flushes run
+            await asyncio.sleep(0.05)
+            written = buffer.stats()
+            await buffer.flush()
+            return written
+
+        before_final_flush = async_to_sync(send)()
+
+        # the timer (60 s) never fired: only the size threshold wrote
+        self.assertGreaterEqual(before_final_flush["flushed_messages"], 6)
+        texts = list(
+            Message.objects.order_by("created_at", "id")
+            .values_list("text", flat=True)
+        )
+        self.assertEqual(texts, [str(i) for i in range(7)])
+
+    def test_timer_and_explicit_flush(self):
+        buffer = MessageBuffer(max_size=100, max_delay=0.01)
+
+        async def send():
+            buffer.add("room1", "a", "first")
+            await asyncio.sleep(0.1)  # timer flush
+            buffer.add("room1", "a", "second")
+            await buffer.flush()  # e.g. disconnect
+
+        async_to_sync(send)()
+
+        self.assertEqual(buffer.depth(), 0)
+        self.assertEqual(Message.objects.count(), 2)
+        self.assertEqual(buffer.stats()["flushed_messages"], 2)
+
+    def test_pending_flushes_are_kept_alive(self):
+        buffer = MessageBuffer(max_size=2, max_delay=60)
+
+        async def send():
+            buffer.add("room1", "a", "0")
+            buffer.add("room1", "a", "1")  # size threshold: flush task
+            # held by the buffer, not only weakly by the loop
+            [task] = buffer._tasks
+            await task
+
+        async_to_sync(send)()
+
+        self.assertEqual(buffer._tasks, set())  # dropped once done
+        self.assertEqual(Message.objects.count(), 2)
+
+    def test_queue_is_capped_while_writes_fail(self):
+        buffer = MessageBuffer(max_size=100, max_delay=60, max_pending=5)
+
+        async def send():
+            with mock.patch.object(buffer, "_write", side_effect=RuntimeError):
+                for i in range(4):
+                    buffer.add("room1", "a", str(i))
+                with self.assertLogs("chat.buffer", "ERROR"):
+                    await buffer.flush()  # fails, batch goes back
+                with self.assertLogs("chat.buffer", "WARNING"):
+                    for i in range(4, 8):
+                        buffer.add("room1", "a", str(i))
+            stats = buffer.stats()
+            await buffer.flush()
+            return stats
+
+        stats = async_to_sync(send)()
+
+        self.assertEqual((stats["depth"], stats["dropped"]), (5, 3))
+        self.assertEqual(stats["failed_flushes"], 1)
+        texts = list(
+            Message.objects.order_by("created_at", "id")
+            .values_list("text", flat=True)
+        )
+        self.assertEqual(texts, ["3", "4", "5", "6", "7"])
+
+
+class ChatConsumerTests(TestCase):
+    def test_members_get_the_frame_encoded_by_the_sender(self):
+        app = URLRouter(websocket_urlpatterns)
+
+        async def run():
+            members = [
+                WebsocketCommunicator(app, "/ws/chat/7/") for _ in range(3)
+            ]
+            for member in members:
+                await member.connect()
+                await member.receive_from()  # "Connected to room 7"
+
+            await members[0].send_json_to(
+                {"message": "héllo", "senderName": "learner1"}
+            )
+            frames = [await member.receive_from() for member in members]
+            for member in members:
+                await member.disconnect()
+            return frames
+
+        frames = async_to_sync(run)()
+
+        self.assertEqual(len(set(frames)), 1)
+        self.assertEqual(
+            json.loads(frames[0]),
+            {"system": False, "message": "héllo", "senderName": "learner1"},
+        )
+
+
+class UnixSocketChannelLayerTests(SimpleTestCase):
+    def test_messages_cross_layer_instances(self):
+        # two instances stand in for two worker processes
+        path = os.path.join(tempfile.mkdtemp(), "channels.sock")
+        first = UnixSocketChannelLayer(path=path)
+        second = UnixSocketChannelLayer(path=path)
+
+        async def run():
+            a = await first.new_channel()
+            b1 = await second.new_channel()
+            b2 = await second.new_channel()
+            for layer, channel in ((first, a), (second, b1), (second, b2)):
+                await layer.group_add("room", channel)
+
+            await first.group_send("room", {"type": "chat.message", "text": "hi"})
+            fanned_out = [
+                await asyncio.wait_for(layer.receive(channel), 1)
+                for layer, channel in ((first, a), (second, b1), (second, b2))
+            ]
+
+            await second.send(a, {"type": "direct", "data": b"\x00\x01"})
+            direct = await asyncio.wait_for(first.receive(a), 1)
+
+            await second.group_discard("room", b2)
+            await first.group_send("room", {"type": "chat.message", "text": "2"})
+            await asyncio.wait_for(second.receive(b1), 1)
+            leftover = second.channels.get(b2)
+
+            await first.close()
+            await second.close()
+            return fanned_out, direct, leftover
+
+        fanned_out, direct, leftover = async_to_sync(run)()
+
+        self.assertEqual([m["text"] for m in fanned_out], ["hi"] * 3)
+        self.assertEqual(direct["data"], b"\x00\x01")
+        self.assertIsNone(leftover)
+
+    def test_socket_directory_must_be_private(self):
+        root = tempfile.mkdtemp()
+        path = os.path.join(root, "new", "channels.sock")
+        ensure_private_dir(path)
+        self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+
+        os.chmod(os.path.dirname(path), 0o755)
+        ensure_private_dir(path)
+        self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+
+        os.chmod(root, 0o1777)  # like /tmp
+        layer = UnixSocketChannelLayer(path=os.path.join(root, "channels.sock"))
+        with self.assertRaises(PermissionError):
+            async_to_sync(layer.new_channel)()
+        self.assertFalse(os.path.exists(layer.path))
+
+    def test_slow_processes_do_not_grow_the_broker_buffer(self):
+        broker = ChannelBroker(max_buffer=100)
+        slow = mock.Mock(**{"is_closing.return_value": False})
+        slow.transport.get_write_buffer_size.return_value = 0
+        broker.clients["slow"] = [slow]
+
+        broker._deliver("slow", ["a.slow!x"], b"{}")
+        slow.transport.get_write_buffer_size.return_value = 101
+        with self.assertLogs("core.channel_broker", "WARNING"):
+            broker._deliver("slow", ["a.slow!x", "a.slow!y"], b"{}")
+
+        self.assertEqual(slow.write.call_count, 1)
+        self.assertEqual((broker.stats["slow"], broker.stats["dropped"]), (1, 2))
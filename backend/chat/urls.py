@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import MessageListView
+from .views import MessageListView, buffer_stats_view
 
 urlpatterns = [
     # /api/chat/<room_id>/messages/
     path("chat/<str:room_id>/messages/", MessageListView.as_view(), name="chat-messages"),
+    path("chat/buffer-stats/", buffer_stats_view, name="chat-buffer-stats"),
 ]
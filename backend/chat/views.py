@@ -1,11 +1,35 @@
 from rest_framework import generics
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from api.pagination import NewestFirstCursorPagination
+
+from .buffer import message_buffer
 from .models import Message
 from .serializers import MessageSerializer
 
 
 class MessageListView(generics.ListAPIView):
+    """
+    GET /api/chat/<room_id>/messages/?page_size=50&cursor=...
+    Newest messages first; follow `next` for older ones.
+    """
+
     serializer_class = MessageSerializer
+    pagination_class = NewestFirstCursorPagination
 
     def get_queryset(self):
         room_id = self.kwargs["room_id"]
-        return Message.objects.filter(room_id=room_id).order_by("created_at")
+        # order comes from the paginator (-created_at, -id)
+        return Message.objects.filter(room_id=room_id)
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def buffer_stats_view(request):
+    """
+    GET /api/chat/buffer-stats/
+    Depth and flush latency of the chat write-behind buffer (this process).
+    """
+    return Response(message_buffer.stats())
@@ -0,0 +1,347 @@
+"""
+Single-host message broker for core.channel_layers.UnixSocketChannelLayer.
+
+Every ASGI worker process connects to one Unix-domain socket. The broker
+keeps the group memberships and forwards each message to the processes
+owning the target channels; it never decodes message bodies.
+
+    cd backend
+    python -m core.channel_broker --path "$XDG_RUNTIME_DIR/skillswap/channels.sock"
+
+The socket's directory must belong to the user running the workers and be
+closed to everyone else (mode 0700): whoever can create the socket path
+receives all the chat and call traffic.
+
+Without a standalone broker, the first worker that finds no socket starts
+one on a background thread (autostart=True in the layer config).
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import json
+import logging
+import os
+import stat
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def _runtime_dir():
+    # the user's private runtime directory, or backend/run when there is none
+    if os.environ.get("XDG_RUNTIME_DIR"):
+        return os.path.join(os.environ["XDG_RUNTIME_DIR"], "skillswap")
+    return os.path.join(os.path.dirname(os.path.dirname(__file__)), "run")
+
+
+DEFAULT_PATH = os.path.join(_runtime_dir(), "channels.sock")
+
+
+# ----------------------------------------------------
+# WIRE FORMAT
+# ----------------------------------------------------
+# frame = header length (4 bytes) + body length (4 bytes) + header + body
+#   header: small JSON object, the operation ({"op": "group_send", ...})
+#   body:   the channel message as JSON, passed through untouched
+_LENGTHS = struct.Struct(">II")
+
+
+def encode_frame(header, body=b""):
+    head = json.dumps(header, separators=(",", ":")).encode()
+    return _LENGTHS.pack(len(head), len(body)) + head + body
+
+
+async def read_frame(reader):
+    """
+    (header dict, body bytes); raises asyncio.IncompleteReadError on EOF.
+    """
+    head_len, body_len = _LENGTHS.unpack(await reader.readexactly(_LENGTHS.size))
+    header = json.loads(await reader.readexactly(head_len))
+    body = await reader.readexactly(body_len) if body_len else b""
+    return header, body
+
+
+def _default(value):
+    # bytes (e.g. bytes_data frames) survive the trip as tagged base64
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _object_hook(obj):
+    if len(obj) == 1 and "__bytes__" in obj:
+        return base64.b64decode(obj["__bytes__"])
+    return obj
+
+
+def encode_message(message):
+    return json.dumps(message, separators=(",", ":"), default=_default).encode()
+
+
+def decode_message(body):
+    return json.loads(body, object_hook=_object_hook)
+
+
+# ----------------------------------------------------
+# BROKER
+# ----------------------------------------------------
+def ensure_private_dir(path):
+    """
+    Create the directory of socket `path` (mode 0700) and make sure no
+    other user can create or replace files in it.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid():
+        raise PermissionError(f"{directory} is not a directory of this user")
+    if info.st_mode & 0o022:
+        raise PermissionError(
+            f"{directory} is writable by other users (mode "
+            f"{stat.S_IMODE(info.st_mode):o}), it must be 0700"
+        )
+    if info.st_mode & 0o077:
+        # ours and nobody else could write to it, e.g. made by another
+        # Django component with the default umask: close it
+        os.chmod(directory, 0o700)
+
+
+def channel_owner(channel):
+    """
+    Client id of a specific channel ("<prefix>.<client>!<local>"),
+    None for plain channel names.
+    """
+    bang = channel.find("!")
+    if bang < 0:
+        return None
+    return channel[:bang].rpartition(".")[2]
+
+
+class ChannelBroker:
+    """
+    Routes messages between connected channel layers.
+
+    Specific channels ("...!...") are delivered to a connection of the
+    client that created them. Plain channels are queued here until some
+    process pulls from them.
+    """
+
+    def __init__(
+        self, expiry=60, group_expiry=86400, capacity=100, max_buffer=4 * 2**20
+    ):
+        self.expiry = expiry
+        self.group_expiry = group_expiry
+        self.capacity = capacity
+        # bytes waiting for one slow process beyond which its deliveries
+        # are dropped, instead of piling up in the broker's memory
+        self.max_buffer = max_buffer
+
+        self.clients = {}  # client id -> [StreamWriter], oldest first
+        self.groups = {}  # group -> {channel: joined_at}
+        self.queues = {}  # plain channel -> deque of (expires_at, body)
+        self.pulls = {}  # plain channel -> deque of (writer, request id)
+
+        self.stats = collections.Counter()
+
+    async def serve(self, path, ready=None):
+        ensure_private_dir(path)
+        if os.path.exists(path):
+            os.unlink(path)
+        server = await asyncio.start_unix_server(self._handle, path=path)
+        if ready is not None:
+            ready.set()
+        async with server:
+            await server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        client = None
+        try:
+            while True:
+                header, body = await read_frame(reader)
+                op = header["op"]
+                if op == "hello":
+                    client = header["client"]
+                    self.clients.setdefault(client, []).append(writer)
+                elif op == "send":
+                    self._send(header["channel"], body)
+                elif op == "group_add":
+                    self.groups.setdefault(header["group"], {})[
+                        header["channel"]
+                    ] = header.get("at") or time.time()
+                    if "id" in header:
+                        # the layer waits for this: a group_send from another
+                        # process right after must already see the member
+                        writer.write(encode_frame({"op": "ack", "id": header["id"]}))
+                elif op == "group_discard":
+                    self._group_discard(header["group"], header["channel"])
+                elif op == "group_send":
+                    self._group_send(header["group"], body)
+                elif op == "pull":
+                    self._pull(header["channel"], writer, header["id"])
+                elif op == "flush":
+                    self.groups.clear()
+                    self.queues.clear()
+                self.stats[op] += 1
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if client is not None:
+                self._disconnect(client, writer)
+            writer.close()
+
+    def _disconnect(self, client, writer):
+        writers = self.clients.get(client, [])
+        if writer in writers:
+            writers.remove(writer)
+        if writers:
+            return
+
+        # last connection of that process: its channels are gone with it
+        del self.clients[client]
+        for group in list(self.groups):
+            members = self.groups[group]
+            for channel in [c for c in members if channel_owner(c) == client]:
+                del members[channel]
+            if not members:
+                del self.groups[group]
+
+    def _deliver(self, client, channels, body):
+        for writer in self.clients.get(client, ()):
+            if writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                # that process doesn't keep up: at most once, like a full channel
+                if not self.stats["slow"]:
+                    logger.warning("client %s is not reading, dropping", client)
+                self.stats["slow"] += 1
+                break
+            frame = encode_frame({"op": "deliver", "channels": channels}, body)
+            writer.write(frame)
+            return
+        self.stats["dropped"] += len(channels)
+
+    def _send(self, channel, body):
+        client = channel_owner(channel)
+        if client is not None:
+            self._deliver(client, [channel], body)
+            return
+
+        waiting = self.pulls.get(channel)
+        while waiting:
+            writer, request_id = waiting.popleft()
+            if not writer.is_closing():
+                self._pulled(writer, channel, request_id, body)
+                return
+
+        queue = self.queues.setdefault(channel, collections.deque())
+        self._expire(queue)
+        if len(queue) >= self.capacity:
+            self.stats["dropped"] += 1
+            return
+        queue.append((time.time() + self.expiry, body))
+
+    def _pull(self, channel, writer, request_id):
+        queue = self.queues.get(channel)
+        if queue:
+            self._expire(queue)
+        if queue:
+            _, body = queue.popleft()
+            self._pulled(writer, channel, request_id, body)
+        else:
+            self.pulls.setdefault(channel, collections.deque()).append(
+                (writer, request_id)
+            )
+
+    def _pulled(self, writer, channel, request_id, body):
+        header = {"op": "pulled", "channel": channel, "id": request_id}
+        writer.write(encode_frame(header, body))
+
+    def _expire(self, queue):
+        now = time.time()
+        while queue and queue[0][0] < now:
+            queue.popleft()
+            self.stats["expired"] += 1
+
+    def _group_discard(self, group, channel):
+        members = self.groups.get(group)
+        if members:
+            members.pop(channel, None)
+            if not members:
+                del self.groups[group]
+
+    def _group_send(self, group, body):
+        members = self.groups.get(group)
+        if not members:
+            return
+
+        cutoff = time.time() - self.group_expiry
+        by_client = {}
+        for channel, joined_at in list(members.items()):
+            if joined_at < cutoff:
+                del members[channel]
+                continue
+            client = channel_owner(channel)
+            if client is None:
+                self._send(channel, body)
+            else:
+                by_client.setdefault(client, []).append(channel)
+
+        # one frame per process, however many of its channels are in the group
+        for client, channels in by_client.items():
+            self._deliver(client, channels, body)
+
+
+def start_broker_thread(path, **kwargs):
+    """
+    Run a ChannelBroker on a daemon thread of this process.
+    Returns once the socket accepts connections.
+    """
+    ready = threading.Event()
+    broker = ChannelBroker(**kwargs)
+
+    def run():
+        try:
+            asyncio.run(broker.serve(path, ready))
+        except Exception:
+            logger.exception("channel broker on %s stopped", path)
+
+    threading.Thread(target=run, name="channel-broker", daemon=True).start()
+    if not ready.wait(5):
+        raise RuntimeError(f"channel broker did not start on {path}")
+    return broker
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--expiry", type=int, default=60)
+    parser.add_argument("--group-expiry", type=int, default=86400)
+    parser.add_argument("--capacity", type=int, default=100)
+    parser.add_argument("--max-buffer", type=int, default=4 * 2**20)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    logger.info("channel broker listening on %s", args.path)
+    broker = ChannelBroker(
+        expiry=args.expiry,
+        group_expiry=args.group_expiry,
+        capacity=args.capacity,
+        max_buffer=args.max_buffer,
+    )
+    try:
+        asyncio.run(broker.serve(args.path))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if os.path.exists(args.path):
+            os.unlink(args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import asyncio
+import fcntl
+import itertools
+import logging
+import random
+import socket
+import string
+import time
+
+from channels.layers import InMemoryChannelLayer
+
+from .channel_broker import (
+    DEFAULT_PATH,
+    channel_owner,
+    decode_message,
+    encode_frame,
+    encode_message,
+    ensure_private_dir,
+    read_frame,
+    start_broker_thread,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------
+# MULTI-PROCESS CHANNEL LAYER (single host)
+# ----------------------------------------------------
+# InMemoryChannelLayer only reaches consumers of its own process, so a
+# chat message sent from one worker never reaches a room member connected
+# to another. This layer keeps the in-memory queues for the channels of
+# this process and goes through core.channel_broker (a Unix socket) for
+# everything that crosses processes: sends to other workers' channels,
+# group membership and group_send fan-out.
+#
+# Delivery is at most once, like the Redis layer: messages for a process
+# whose connection is down, or for a full channel, are dropped.
+
+
+def _group_add(group, channel, joined_at):
+    return {"op": "group_add", "group": group, "channel": channel, "at": joined_at}
+
+
+class _Connection:
+    """
+    One broker connection, owned by one event loop.
+    """
+
+    def __init__(self, loop, reader, writer):
+        self.loop = loop
+        self.reader = reader
+        self.writer = writer
+        self.waiting = {}  # request id -> Future (plain receives, acks)
+        self.reader_task = None
+
+    @property
+    def alive(self):
+        return (
+            not self.loop.is_closed()
+            and self.reader_task is not None
+            and not self.reader_task.done()
+        )
+
+    def write(self, header, body=b""):
+        self.writer.write(encode_frame(header, body))
+
+    def abandon(self):
+        # the loop is gone, so the transport can't be closed the normal way
+        sock = self.writer.get_extra_info("socket")
+        if sock is not None:
+            sock.close()
+
+
+class UnixSocketChannelLayer(InMemoryChannelLayer):
+    """
+    Channel layer shared by the worker processes of one host through a
+    Unix-domain socket broker.
+
+    With autostart (the default) the first process that finds no broker
+    runs one on a background thread; otherwise start it separately with
+    `python -m core.channel_broker --path <path>`.
+    """
+
+    def __init__(
+        self,
+        path=DEFAULT_PATH,
+        autostart=True,
+        expiry=60,
+        group_expiry=86400,
+        capacity=100,
+        channel_capacity=None,
+        **kwargs,
+    ):
+        super().__init__(
+            expiry=expiry,
+            group_expiry=group_expiry,
+            capacity=capacity,
+            channel_capacity=channel_capacity,
+            **kwargs,
+        )
+        self.path = path
+        self.autostart = autostart
+        self.client_id = "".join(random.choices(string.ascii_letters, k=12))
+        self._connections = {}  # event loop -> _Connection
+        self._request_ids = itertools.count()
+
+    # ---------- connection ----------
+
+    async def _connection(self):
+        loop = asyncio.get_running_loop()
+        for other_loop, conn in list(self._connections.items()):
+            if other_loop.is_closed():
+                conn.abandon()
+                del self._connections[other_loop]
+
+        conn = self._connections.get(loop)
+        if conn is not None and conn.alive:
+            return conn
+
+        reader, writer = await self._open()
+        conn = _Connection(loop, reader, writer)
+        conn.write({"op": "hello", "client": self.client_id})
+        # memberships survive a broker restart / lost connection
+        for group, members in self.groups.items():
+            for channel, joined_at in members.items():
+                conn.write(_group_add(group, channel, joined_at))
+        await writer.drain()
+        conn.reader_task = loop.create_task(self._read(conn))
+        self._connections[loop] = conn
+        return conn
+
+    async def _open(self):
+        # never talk to a socket another user could have put there
+        ensure_private_dir(self.path)
+        try:
+            return await asyncio.open_unix_connection(self.path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            if not self.autostart:
+                raise
+        self._start_broker()
+        return await asyncio.open_unix_connection(self.path)
+
+    def _start_broker(self):
+        # several workers may get here at once: one of them starts it
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with socket.socket(socket.AF_UNIX) as probe:
+                    probe.connect(self.path)
+                return  # someone else was faster
+            except (FileNotFoundError, ConnectionRefusedError):
+                pass
+            logger.info("starting channel broker on %s", self.path)
+            start_broker_thread(
+                self.path,
+                expiry=self.expiry,
+                group_expiry=self.group_expiry,
+                capacity=self.capacity,
+            )
+
+    async def _read(self, conn):
+        try:
+            while True:
+                header, body = await read_frame(conn.reader)
+                if header["op"] == "deliver":
+                    self._deliver_local(header["channels"], body)
+                elif header["op"] == "ack":
+                    future = conn.waiting.pop(header["id"], None)
+                    if future is not None and not future.done():
+                        future.set_result(None)
+                elif header["op"] == "pulled":
+                    future = conn.waiting.pop(header["id"], None)
+                    if future is not None and not future.done():
+                        future.set_result(decode_message(body))
+                    else:
+                        # the receive was cancelled meanwhile: put it back
+                        conn.write({"op": "send", "channel": header["channel"]}, body)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            logger.warning("lost the channel broker connection on %s", self.path)
+        finally:
+            for future in conn.waiting.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("channel broker went away"))
+            conn.waiting.clear()
+            conn.writer.close()
+
+    def _deliver_local(self, channels, body):
+        for channel in channels:
+            queue = self.channels.setdefault(
+                channel, asyncio.Queue(maxsize=self.get_capacity(channel))
+            )
+            try:
+                queue.put_nowait((time.time() + self.expiry, decode_message(body)))
+            except asyncio.QueueFull:
+                logger.debug("channel %s is full, dropping a message", channel)
+
+    async def _request(self, conn, header):
+        # send and wait for the broker's answer ("pulled" / "ack")
+        header["id"] = next(self._request_ids)
+        future = conn.loop.create_future()
+        conn.waiting[header["id"]] = future
+        conn.write(header)
+        await conn.writer.drain()
+        return await future
+
+    def _is_local(self, channel):
+        return channel_owner(channel) == self.client_id
+
+    # ---------- channel layer API ----------
+
+    async def new_channel(self, prefix="specific."):
+        # connect now, so the broker knows where to deliver to this channel
+        await self._connection()
+        return "%s.%s!%s" % (
+            prefix,
+            self.client_id,
+            "".join(random.choices(string.ascii_letters, k=12)),
+        )
+
+    async def send(self, channel, message):
+        if self._is_local(channel):
+            return await super().send(channel, message)
+
+        assert isinstance(message, dict), "message is not a dict"
+        self.require_valid_channel_name(channel)
+        conn = await self._connection()
+        conn.write({"op": "send", "channel": channel}, encode_message(message))
+        await conn.writer.drain()
+
+    async def receive(self, channel):
+        if "!" in channel:
+            await self._connection()
+            return await super().receive(channel)
+
+        self.require_valid_channel_name(channel)
+        conn = await self._connection()
+        return await self._request(conn, {"op": "pull", "channel": channel})
+
+    async def group_add(self, group, channel):
+        await super().group_add(group, channel)
+        conn = await self._connection()
+        await self._request(
+            conn, _group_add(group, channel, self.groups[group][channel])
+        )
+
+    async def group_discard(self, group, channel):
+        await super().group_discard(group, channel)
+        conn = await self._connection()
+        conn.write({"op": "group_discard", "group": group, "channel": channel})
+        await conn.writer.drain()
+
+    async def group_send(self, group, message):
+        assert isinstance(message, dict), "Message is not a dict"
+        self.require_valid_group_name(group)
+        conn = await self._connection()
+        # encoded once; the broker fans the same bytes out to every process
+        conn.write({"op": "group_send", "group": group}, encode_message(message))
+        await conn.writer.drain()
+
+    async def flush(self):
+        await super().flush()
+        conn = await self._connection()
+        conn.write({"op": "flush"})
+        await conn.writer.drain()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        conn = self._connections.pop(loop, None)
+        if conn is not None:
+            conn.reader_task.cancel()
+            conn.writer.close()
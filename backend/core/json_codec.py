@@ -0,0 +1,28 @@
+"""
+JSON for websocket frames: orjson when it is installed, the standard
+library otherwise. Both produce compact UTF-8 JSON (no spaces, non-ASCII
+kept as is), so clients can't tell them apart.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional: pip install orjson
+    orjson = None
+
+
+def _json_dumps(obj):
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+
+def _orjson_dumps(obj):
+    return orjson.dumps(obj).decode()
+
+
+# name -> (dumps returning str, loads accepting str or bytes)
+CODECS = {"json": (_json_dumps, json.loads)}
+if orjson is not None:
+    CODECS["orjson"] = (_orjson_dumps, orjson.loads)
+
+CODEC = "orjson" if orjson is not None else "json"
+dumps, loads = CODECS[CODEC]
@@ -0,0 +1,214 @@
+"""
+In-process metrics (this worker only) in Prometheus text format.
+
+Filled by core.middleware.MetricsMiddleware (HTTP) and
+WebSocketMetricsMiddleware (consumers), served on /metrics.
+Memory is bounded: histograms have fixed buckets and each metric keeps at
+most METRICS_MAX_SERIES label sets; anything beyond that is counted
+under the label value "other".
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+# seconds; the usual Prometheus latency buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+OVERFLOW = "other"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series = {}  # label values -> value(s)
+        self.lock = threading.Lock()  # replaced by the registry's
+
+    def _key(self, values):
+        if values in self.series or len(self.series) < settings.METRICS_MAX_SERIES:
+            return values
+        return tuple(OVERFLOW for _ in values)
+
+    def _label_text(self, values, extra=""):
+        pairs = [
+            f'{label}="{_escape(value)}"' for label, value in zip(self.labels, values)
+        ]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in sorted(self.series.items()):
+            lines += self._render_series(values, value)
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *values, amount=1):
+        with self.lock:
+            key = self._key(values)
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def _render_series(self, values, value):
+        return [f"{self.name}{self._label_text(values)} {_number(value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *values, amount=1):
+        self.inc(*values, amount=-amount)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labels, buckets):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *values):
+        with self.lock:
+            key = self._key(values)
+            series = self.series.get(key)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def _render_series(self, values, value):
+        counts, total = value
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), counts):
+            cumulative += count
+            le = f'le="{_number(bound) if bound != "+Inf" else bound}"'
+            lines.append(
+                f"{self.name}_bucket{self._label_text(values, le)} {cumulative}"
+            )
+        lines.append(f"{self.name}_sum{self._label_text(values)} {_number(total)}")
+        lines.append(f"{self.name}_count{self._label_text(values)} {cumulative}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ----------------------------------------------------
+# REGISTRY
+# ----------------------------------------------------
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = []
+        self.started = time.time()
+
+    def add(self, metric):
+        metric.lock = self.lock
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self.lock:
+            lines = []
+            for metric in self.metrics:
+                lines += metric.render()
+        lines.append(f"process_start_time_seconds {self.started}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self.lock:
+            for metric in self.metrics:
+                metric.series.clear()
+
+
+registry = Registry()
+
+HTTP_LABELS = ("method", "route", "status")
+
+http_requests = registry.add(
+    Counter("http_requests_total", "HTTP requests handled.", HTTP_LABELS)
+)
+http_latency = registry.add(
+    Histogram(
+        "http_request_duration_seconds",
+        "Time from middleware entry to response.",
+        ("method", "route"),
+        LATENCY_BUCKETS,
+    )
+)
+http_queries = registry.add(
+    Histogram(
+        "http_request_db_queries",
+        "Database queries per request.",
+        ("method", "route"),
+        QUERY_COUNT_BUCKETS,
+    )
+)
+http_query_time = registry.add(
+    Histogram(
+        "http_request_db_seconds",
+        "Time spent in database queries per request.",
+        ("method", "route"),
+        LATENCY_BUCKETS,
+    )
+)
+http_response_bytes = registry.add(
+    Histogram(
+        "http_response_bytes",
+        "Response body size (streaming responses are not counted).",
+        ("method", "route"),
+        SIZE_BUCKETS,
+    )
+)
+slow_queries = registry.add(
+    Counter(
+        "db_slow_queries_total",
+        "Queries over METRICS_SLOW_QUERY_MS (only when it is set).",
+        ("route",),
+    )
+)
+response_cache_results = registry.add(
+    Counter(
+        "http_response_cache_total",
+        "Versioned GETs (api/http_cache.py): not_modified, hit or miss.",
+        ("result",),
+    )
+)
+
+ws_connections = registry.add(
+    Counter("ws_connections_total", "WebSocket connections.", ("consumer",))
+)
+ws_open = registry.add(
+    Gauge("ws_open_connections", "Open WebSocket connections.", ("consumer",))
+)
+ws_messages = registry.add(
+    Counter(
+        "ws_messages_total",
+        "WebSocket frames, by direction (in = from the client).",
+        ("consumer", "direction"),
+    )
+)
+ws_bytes = registry.add(
+    Counter(
+        "ws_bytes_total",
+        "WebSocket payload bytes, by direction.",
+        ("consumer", "direction"),
+    )
+)
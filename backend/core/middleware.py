@@ -0,0 +1,147 @@
+import logging
+import time
+import traceback
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import metrics
+
+slow_query_logger = logging.getLogger("core.slow_queries")
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+# ----------------------------------------------------
+# HTTP
+# ----------------------------------------------------
+class _QueryRecorder:
+    """
+    execute_wrapper counting a request's queries and their time; logs
+    the ones slower than METRICS_SLOW_QUERY_MS with a stack trace.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.count = 0
+        self.seconds = 0.0
+        self.slow_ms = settings.METRICS_SLOW_QUERY_MS
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            if self.slow_ms is not None and elapsed * 1000 >= self.slow_ms:
+                self._log_slow(sql, params, elapsed)
+
+    def _log_slow(self, sql, params, elapsed):
+        route = _route(self.request)
+        metrics.slow_queries.inc(route)
+        # our own frames only: where in the code the query came from
+        stack = [
+            frame
+            for frame in traceback.extract_stack()[:-2]
+            if frame.filename.startswith(str(settings.BASE_DIR))
+            and "site-packages" not in frame.filename
+        ]
+        slow_query_logger.warning(
+            "slow query (%.1f ms) on %s %s\n%s\nparams: %r\n%s",
+            elapsed * 1000,
+            self.request.method,
+            route,
+            sql,
+            params,
+            "".join(traceback.format_list(stack)),
+        )
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    # the URL pattern, never the raw path: keeps the label set bounded
+    return match.route if match is not None else UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    """
+    Per-route latency, DB query count/time and response size
+    (see core/metrics.py, served on /metrics).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = _QueryRecorder(request)
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        method = request.method
+        route = _route(request)
+        metrics.http_requests.inc(method, route, str(response.status_code))
+        metrics.http_latency.observe(elapsed, method, route)
+        metrics.http_queries.observe(recorder.count, method, route)
+        metrics.http_query_time.observe(recorder.seconds, method, route)
+        if not response.streaming:
+            metrics.http_response_bytes.observe(len(response.content), method, route)
+        return response
+
+
+# ----------------------------------------------------
+# WEBSOCKETS
+# ----------------------------------------------------
+class WebSocketMetricsMiddleware:
+    """
+    ASGI wrapper around one consumer (ChatConsumer.as_asgi(), ...):
+    connections and frames/bytes in each direction, labelled with the
+    consumer class name.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        consumer_class = getattr(app, "consumer_class", None)
+        self.name = consumer_class.__name__ if consumer_class else repr(app)
+
+    async def __call__(self, scope, receive, send):
+        name = self.name
+        accepted = False
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                _count_frame(name, "in", message)
+            return message
+
+        async def counting_send(message):
+            nonlocal accepted
+            if message["type"] == "websocket.send":
+                _count_frame(name, "out", message)
+            elif message["type"] == "websocket.accept" and not accepted:
+                accepted = True
+                metrics.ws_connections.inc(name)
+                metrics.ws_open.inc(name)
+            await send(message)
+
+        try:
+            return await self.app(scope, counting_receive, counting_send)
+        finally:
+            if accepted:
+                metrics.ws_open.dec(name)
+
+
+def _count_frame(name, direction, message):
+    text = message.get("text")
+    if text is not None:
+        size = len(text.encode())
+    else:
+        size = len(message.get("bytes") or b"")
+    metrics.ws_messages.inc(name, direction)
+    metrics.ws_bytes.inc(name, direction, amount=size)
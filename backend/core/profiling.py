@@ -0,0 +1,150 @@
+"""
+On-demand profiling of single requests.
+
+A view wrapped in @profiled("name") is profiled when a staff user sends
+"X-Profile: 1" (or ?profile=1). Two things are recorded:
+
+  - spans: `with span("stage"):` blocks in the code under the view,
+    timed and returned in a Server-Timing header;
+  - samples: a background thread reads the request thread's stack every
+    PROFILE_SAMPLE_INTERVAL seconds. The stacks are written to
+    PROFILE_DIR in collapsed format ("frame;frame;frame count", counts
+    in microseconds), which flamegraph.pl and speedscope read. Spans
+    show up in them as "[stage]" frames.
+
+Nothing runs unless a request asks for it: span() (ml/spans.py) outside
+a profiled request is one ContextVar lookup.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.conf import settings
+
+# the spans themselves live in ml (no Django there); re-exported for views
+from ml.spans import active, current, span  # noqa: F401
+
+
+# ----------------------------------------------------
+# SAMPLER
+# ----------------------------------------------------
+class Profile:
+    """
+    Spans and stack samples of the code running under one request.
+    """
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self.open_spans = []
+        self.span_seconds = {}  # "outer.inner" -> seconds
+        self.stacks = Counter()  # collapsed stack -> microseconds
+        self.total = 0.0
+        self._stop = threading.Event()
+
+    def __enter__(self):
+        self._thread_id = threading.get_ident()
+        self._root = sys._getframe(1)
+        self._token = current.set(self)
+        self._sampler = threading.Thread(
+            target=self._sample, name="request-profiler", daemon=True
+        )
+        self._started = time.perf_counter()
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.total = time.perf_counter() - self._started
+        self._stop.set()
+        self._sampler.join()
+        current.reset(self._token)
+
+    def _sample(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            now = time.perf_counter()
+            stack = self._collapse(frame) if frame is not None else None
+            if stack is not None:
+                # weighted by the time since the last sample: the GIL makes
+                # the actual interval longer than asked under CPU load
+                self.stacks[stack] += round((now - last) * 1e6)
+            last = now
+
+    def _collapse(self, frame):
+        spans_at = {}
+        for open_span in tuple(self.open_spans):
+            spans_at.setdefault(id(open_span.frame), []).append(open_span.name)
+
+        frames = []
+        while frame is not None and frame is not self._root:
+            frames.append(frame)
+            frame = frame.f_back
+        if frames and frames[-1].f_code is Profile.__exit__.__code__:
+            return None  # stopping: the profiler itself
+
+        parts = [self.name]
+        parts += [f"[{name}]" for name in spans_at.get(id(self._root), ())]
+        for frame in reversed(frames):
+            module = frame.f_globals.get("__name__", "?")
+            parts.append(f"{module}:{frame.f_code.co_name}")
+            parts += [f"[{name}]" for name in spans_at.get(id(frame), ())]
+        return ";".join(parts)
+
+    def collapsed(self):
+        return "".join(
+            f"{stack} {count}\n" for stack, count in sorted(self.stacks.items())
+        )
+
+    def server_timing(self):
+        metrics = [f"total;dur={self.total * 1000:.2f}"]
+        metrics += [
+            f"{path};dur={seconds * 1000:.2f}"
+            for path, seconds in self.span_seconds.items()
+        ]
+        return ", ".join(metrics)
+
+
+# ----------------------------------------------------
+# VIEW DECORATOR
+# ----------------------------------------------------
+def _requested(request):
+    if request.headers.get("X-Profile") != "1" and request.GET.get("profile") != "1":
+        return False
+    user = getattr(request, "user", None)
+    return bool(user and user.is_staff)
+
+
+def profiled(name):
+    """
+    Profile the view on request (see the module docstring). Goes under
+    @api_view, where request.user is already authenticated.
+    """
+
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not _requested(request):
+                return view(request, *args, **kwargs)
+
+            with Profile(name, settings.PROFILE_SAMPLE_INTERVAL) as profile:
+                response = view(request, *args, **kwargs)
+
+            stamp = time.strftime("%Y%m%d-%H%M%S")
+            filename = f"{stamp}-{name}-{uuid.uuid4().hex[:8]}.collapsed"
+            os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+            path = os.path.join(settings.PROFILE_DIR, filename)
+            with open(path, "w") as out:
+                out.write(profile.collapsed())
+
+            response["Server-Timing"] = profile.server_timing()
+            response["X-Profile-File"] = filename
+            return response
+
+        return wrapper
+
+    return decorator
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -68,8 +69,71 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
 }
 
+# Upper bound for ?top_k= on /api/recommendations/
+RECOMMENDATIONS_MAX_TOP_K = 50
+
+# Seconds before the mentor index snapshot is rebuilt in the background
+# (catches skill rows written without going through MySkillsView).
+MENTOR_INDEX_MAX_AGE = 15 * 60
+
+# More users than this changed in one transaction (a Skill delete, an
+# import): one background rebuild instead of one index update per user.
+MENTOR_INDEX_REBUILD_OVER_USERS = 100
+
+# How /api/recommendations/ scores mentors (see ml/index.py):
+#   "exact" - every mentor, exact cosine similarity
+#   "lsh"   - only mentors in the learner's random-projection buckets;
+#             approximate, faster at the median from ~1M users only, with
+#             a worse p95 and lower recall (measurements in ml/ann.py)
+MATCHER_MODE = "exact"
+MATCHER_LSH = {"tables": 8, "bits": 16, "probe": True}
+
+# Files shared by the processes of this host (channel socket, response
+# versions), kept in a directory only this user can open (mode 0700).
+_RUNTIME_DIR = (
+    Path(os.environ["XDG_RUNTIME_DIR"]) / "skillswap"
+    if os.environ.get("XDG_RUNTIME_DIR")
+    else BASE_DIR / "run"
+)
+
+# Local-memory caches are per process and evict least-recently-used
+# entries once MAX_ENTRIES is reached.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "default",
+    },
+    # results of get_recommendations_for_user, see api/services.py
+    "recommendations": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "recommendations",
+        "TIMEOUT": 300,
+        "OPTIONS": {"MAX_ENTRIES": 10000},
+    },
+    # rendered bodies of read-mostly GETs, see api/http_cache.py
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "responses",
+        "TIMEOUT": 3600,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+    # their version counters (ETags): every process that serves or writes
+    # the data must see the same ones, so this one is shared. Each write to
+    # a file cache lists its directory, hence the small MAX_ENTRIES (one key
+    # per user seen in the last day); point it at Redis/Memcached for more
+    # users, or when the workers run on more than one host.
+    "response_versions": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": str(_RUNTIME_DIR / "response-versions"),
+        "TIMEOUT": 86400,
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
 
 MIDDLEWARE = [
+    # first, so it times everything below it (see core/metrics.py)
+    'core.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -82,6 +146,26 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'core.urls'
 
+# in-process caches for the tests, see core/test_runner.py
+TEST_RUNNER = "core.test_runner.TestRunner"
+
+# Metrics on /metrics (Prometheus text format), for scrapers sending
+# METRICS_TOKEN; without a token only local requests in DEBUG may read
+# them. METRICS_SLOW_QUERY_MS turns on the slow-query log (logger
+# "core.slow_queries", with the stack of the calling code).
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+METRICS_MAX_SERIES = 500
+METRICS_SLOW_QUERY_MS = (
+    float(os.environ["METRICS_SLOW_QUERY_MS"])
+    if os.environ.get("METRICS_SLOW_QUERY_MS")
+    else None
+)
+
+# Staff can profile single requests to @profiled views with "X-Profile: 1"
+# (core/profiling.py). Collapsed stacks for flame graphs go to PROFILE_DIR.
+PROFILE_DIR = os.environ.get("PROFILE_DIR", BASE_DIR / "profiles")
+PROFILE_SAMPLE_INTERVAL = 0.001
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -102,12 +186,43 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 ASGI_APPLICATION = "core.asgi.application"
 
-# For now, simple in-memory layer (no Redis yet)
-CHANNEL_LAYERS = {
-    "default": {
+# "memory": one process only (runserver, tests).
+# "unix":   several worker processes on one host, connected through the
+#           Unix-socket broker in core/channel_broker.py (started by the
+#           first worker unless one is already running).
+CHANNEL_LAYER_BACKEND = os.environ.get("CHANNEL_LAYER_BACKEND", "memory")
+# Its directory is created with mode 0700, and a directory other users can
+# write to is refused: whoever owns the socket gets all chat/call traffic.
+CHANNEL_LAYER_SOCKET = os.environ.get(
+    "CHANNEL_LAYER_SOCKET", str(_RUNTIME_DIR / "channels.sock")
+)
+
+_CHANNEL_LAYER_CHOICES = {
+    "memory": {
         "BACKEND": "channels.layers.InMemoryChannelLayer",
     },
+    "unix": {
+        "BACKEND": "core.channel_layers.UnixSocketChannelLayer",
+        "CONFIG": {"path": CHANNEL_LAYER_SOCKET},
+    },
 }
+CHANNEL_LAYERS = {"default": _CHANNEL_LAYER_CHOICES[CHANNEL_LAYER_BACKEND]}
+
+# Chat messages are written behind the broadcast (chat/buffer.py):
+# one bulk insert per CHAT_BUFFER_MAX_SIZE messages or every
+# CHAT_BUFFER_MAX_DELAY seconds, whichever comes first.
+CHAT_BUFFER_MAX_SIZE = 50
+CHAT_BUFFER_MAX_DELAY = 0.5
+# queued messages kept while the database is down; older ones are dropped
+CHAT_BUFFER_MAX_PENDING = 10000
+
+# Video-call signalling (call/consumers.py): ICE candidates are relayed in
+# batches of up to CALL_ICE_BATCH_MAX per CALL_ICE_BATCH_WINDOW seconds; a
+# peer with CALL_SEND_QUEUE_MAX frames waiting to be sent is disconnected.
+CALL_ICE_BATCH_WINDOW = 0.05
+CALL_ICE_BATCH_MAX = 20
+CALL_SEND_QUEUE_MAX = 256
+CALL_MAX_FRAME_BYTES = 64 * 1024
 
 
 
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Keeps the tests off the host's shared caches (CACHES in settings.py):
+    the response versions in the runtime directory belong to the running
+    server.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(
+            CACHES={
+                **settings.CACHES,
+                "response_versions": {
+                    "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                    "LOCATION": "test-response-versions",
+                },
+            }
+        )
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
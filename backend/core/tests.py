@@ -0,0 +1,130 @@
+import time
+
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from call.routing import websocket_urlpatterns
+
+from . import metrics, profiling
+
+User = get_user_model()
+
+
+@override_settings(METRICS_TOKEN="s3cret")
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user("me", password="x"))
+
+    def scrape(self, **extra):
+        response = self.client.get(
+            "/metrics", HTTP_AUTHORIZATION="Bearer s3cret", **extra
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_http_requests_are_labelled_by_route(self):
+        missing = User.objects.latest("pk").pk + 1
+        self.client.get(f"/api/users/{missing}/")
+        self.client.get(f"/api/users/{missing + 1}/")
+        self.client.get("/no/such/page/")
+
+        text = self.scrape()
+        self.assertIn(
+            'http_requests_total{method="GET",route="api/users/<int:pk>/",'
+            'status="404"} 2',
+            text,
+        )
+        self.assertIn('route="<unmatched>"', text)
+        self.assertIn(
+            'http_request_db_queries_count{method="GET",'
+            'route="api/users/<int:pk>/"} 2',
+            text,
+        )
+
+    def test_token_is_required(self):
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        response = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer nope")
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_TOKEN="")
+    def test_without_a_token_only_local_debug_scrapes_are_answered(self):
+        # a reverse proxy on the same host makes every request local
+        self.assertEqual(self.client.get("/metrics").status_code, 403)
+        with self.settings(DEBUG=True):
+            self.assertEqual(self.client.get("/metrics").status_code, 200)
+            response = self.client.get("/metrics", REMOTE_ADDR="10.0.0.7")
+            self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_SLOW_QUERY_MS=0)
+    def test_slow_query_log_has_the_calling_code(self):
+        with self.assertLogs("core.slow_queries", "WARNING") as logs:
+            self.client.get("/api/skills/")
+        self.assertIn("api/views.py", logs.output[0])
+        self.assertIn('db_slow_queries_total{route="api/skills/"}', self.scrape())
+
+    @override_settings(METRICS_MAX_SERIES=2)
+    def test_label_sets_are_capped(self):
+        counter = metrics.Counter("test_total", "test", ("route",))
+        for route in ("a", "b", "c", "d"):
+            counter.inc(route)
+        self.assertEqual(counter.series, {("a",): 1, ("b",): 1, ("other",): 2})
+
+    def test_websocket_frames_are_counted_per_consumer(self):
+        app = URLRouter(websocket_urlpatterns)
+
+        async def run():
+            peer = WebsocketCommunicator(app, "/ws/video/room1/")
+            await peer.connect()
+            await peer.receive_from()
+            await peer.send_to(text_data='{"type":"offer","payload":{}}')
+            await peer.receive_from()
+            await peer.disconnect()
+
+        async_to_sync(run)()
+
+        text = self.scrape()
+        self.assertIn('ws_connections_total{consumer="CallConsumer"} 1', text)
+        self.assertIn('ws_open_connections{consumer="CallConsumer"} 0', text)
+        self.assertIn(
+            'ws_messages_total{consumer="CallConsumer",direction="in"} 1', text
+        )
+        self.assertIn(
+            'ws_messages_total{consumer="CallConsumer",direction="out"} 2', text
+        )
+
+
+class ProfilingTests(TestCase):
+    def test_spans_show_up_in_the_samples(self):
+        def busy(seconds):
+            until = time.perf_counter() + seconds
+            while time.perf_counter() < until:
+                pass
+
+        def stage():
+            with profiling.span("inner"):
+                busy(0.05)
+
+        with profiling.Profile("test", interval=0.001) as profile:
+            with profiling.span("outer"):
+                self.assertTrue(profiling.active())
+                stage()
+
+        self.assertFalse(profiling.active())
+        self.assertEqual(set(profile.span_seconds), {"outer", "outer.inner"})
+        self.assertGreaterEqual(profile.span_seconds["outer.inner"], 0.05)
+        self.assertTrue(
+            any(
+                "[outer];core.tests:stage;[inner];core.tests:busy" in stack
+                for stack in profile.stacks
+            ),
+            profile.collapsed(),
+        )
+
+    def test_span_is_a_no_op_outside_a_profile(self):
+        self.assertIs(profiling.span("a"), profiling.span("b"))
@@ -26,6 +26,8 @@ from api.views import (
     RegisterView,
     MeView,
     recommendations_view,
+    recommendation_cache_stats_view,
+    mentor_index_health_view,
     LearningRequestCreateView,
     IncomingRequestsView,
     OutgoingRequestsView,
@@ -45,10 +47,12 @@ from rest_framework_simplejwt.views import (
     TokenRefreshView,
 )
 from api.views import RegisterView, MeView
+from core.views import metrics_view
 
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
 
     # Auth endpoints
     path("api/auth/register/", RegisterView.as_view(), name="register"),
@@ -58,6 +62,16 @@ urlpatterns = [
 
     # Recommendations
     path("api/recommendations/", recommendations_view, name="recommendations"),
+    path(
+        "api/recommendations/cache-stats/",
+        recommendation_cache_stats_view,
+        name="recommendations-cache-stats",
+    ),
+    path(
+        "api/recommendations/index/",
+        mentor_index_health_view,
+        name="recommendations-index",
+    ),
 
     # Learning requests
     path("api/requests/", LearningRequestCreateView.as_view(), name="request-create"),
@@ -0,0 +1,32 @@
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+from .metrics import registry
+
+LOCAL_ADDRESSES = {"127.0.0.1", "::1"}
+
+
+def metrics_view(request):
+    """
+    GET /metrics  (Prometheus text format, this process only)
+
+    Scrapers send "Authorization: Bearer <METRICS_TOKEN>". Without a token
+    nothing is answered, except local requests in DEBUG: behind a reverse
+    proxy every request comes from a local address.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        sent = request.headers.get("Authorization", "").removeprefix("Bearer ")
+        allowed = hmac.compare_digest(sent.encode(), token.encode())
+    else:
+        allowed = (
+            settings.DEBUG and request.META.get("REMOTE_ADDR") in LOCAL_ADDRESSES
+        )
+    if not allowed:
+        return HttpResponseForbidden()
+
+    return HttpResponse(
+        registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
@@ -0,0 +1,791 @@
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from .ann import LSHIndex
+from .matcher import mutual_score, round_scores, select_top_k
+from .spans import span
+
+
+# ----------------------------------------------------
+# MENTOR INDEX
+# ----------------------------------------------------
+# find_best_mentors() rebuilds the vocabulary and one dense vector per user
+# every time it is called. The index below keeps that work around between
+# requests:
+#   - skill_cols:  skill_id -> column (the vocabulary)
+#   - user_rows:   user_id  -> row, shared by both matrices (see Matrices)
+#   - have-matrix: CSR, value = level weight
+#   - want-matrix: CSR, value = 1
+#
+# A query is one sparse matrix-vector product plus a top-k selection.
+# Mutual (swap) queries read the want-matrix the other way round: the
+# candidates' want-rows times the learner's have-row.
+
+# Columnar input, e.g. from api.services.load_skill_arrays():
+#   have_* arrays are parallel (one entry per UserSkillHave row),
+#   want_* arrays are parallel (one entry per UserSkillWant row).
+SkillArrays = namedtuple(
+    "SkillArrays",
+    [
+        "have_user_ids",
+        "have_skill_ids",
+        "have_weights",
+        "want_user_ids",
+        "want_skill_ids",
+    ],
+)
+
+# The arrays are published together so a reader never sees a have-matrix
+# with the norms of another one. Writers publish a new tuple, made of
+# longer views of the same append-only arrays (see _Rows), so an update
+# costs the size of one user's row, not of the matrices. Nothing a
+# published tuple can see is ever modified:
+#   - dead_since[row]: version of the first tuple in which the row is
+#     dead (its user got a new row or left), NEVER while it is live;
+#   - user_rows: user_id -> (row, version, previous entry), row None once
+#     the user left; each tuple follows the chain back to the newest
+#     entry not newer than its own version.
+# dead_since and user_rows are only replaced when rows are renumbered
+# (compaction).
+Matrices = namedtuple(
+    "Matrices",
+    ["have", "have_norms", "want", "row_users", "user_rows", "dead_since", "version"],
+)
+NEVER = np.iinfo(np.int64).max
+
+# Matching modes for MentorIndex.query()
+EXACT = "exact"  # every mentor sharing a wanted skill, exact scores
+LSH = "lsh"  # only score mentors in the learner's LSH buckets (approximate)
+
+# Structures derived from the have-matrix (posting lists, LSH tables) only
+# cover the rows that existed when they were built; rows appended later are
+# scored directly. They are rebuilt once this many rows were appended.
+DERIVED_REBUILD_MIN_ROWS = 1000
+DERIVED_REBUILD_RATIO = 0.1
+
+# Accumulate posting-list scores in a dense array (instead of sorting the
+# touched rows) once they exceed 1/DENSE_ACCUMULATE_RATIO of all rows.
+DENSE_ACCUMULATE_RATIO = 4
+
+# Compact the matrices once this fraction of their rows are dead
+# (users who changed their skills and got a fresh row).
+COMPACT_DEAD_RATIO = 0.25
+
+# scipy.sparse is imported where a matrix is built, not at module level:
+# api.services imports this module, so every web worker would pay for
+# SciPy at boot (~120 ms) before any recommendation is asked for.
+
+# Spare room given to the append-only arrays when they fill up. Below 2:
+# SciPy copies index/data arrays that are less than half of their base.
+GROWTH = 1.5
+
+
+def _row_norms(matrix):
+    return np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+
+
+def _csr(rows, cols, values, shape):
+    """
+    Build a CSR matrix from (row, col, value) triples.
+    Duplicate (row, col) pairs keep the LAST value instead of being summed,
+    like build_have_vector() overwriting vec[idx].
+    """
+    order = np.lexsort((np.arange(len(rows)), cols, rows))
+    rows, cols, values = rows[order], cols[order], values[order]
+
+    last = np.ones(len(rows), dtype=bool)
+    last[:-1] = (rows[1:] != rows[:-1]) | (cols[1:] != cols[:-1])
+    rows, cols, values = rows[last], cols[last], values[last]
+
+    indptr = np.zeros(shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=shape[0]), out=indptr[1:])
+
+    from scipy import sparse  # lazily, see the note above GROWTH
+
+    return sparse.csr_matrix(
+        (
+            values.astype(np.float64),
+            cols.astype(np.int32),
+            indptr,
+        ),
+        shape=shape,
+    )
+
+
+def _reserve(array, used, extra):
+    # array with room for used + extra entries: a bigger copy when full,
+    # so earlier views keep the old one
+    if used + extra <= len(array):
+        return array
+    bigger = np.empty(max(int((used + extra) * GROWTH), 16), dtype=array.dtype)
+    bigger[:used] = array[:used]
+    return bigger
+
+
+class _Column:
+    """
+    Append-only 1-D array; view() covers the values appended so far.
+    """
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.array = _reserve(np.zeros(0, dtype=values.dtype), 0, self.size)
+        self.array[:self.size] = values
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        end = self.size + len(values)
+        self.array = _reserve(self.array, self.size, len(values))
+        self.array[self.size:end] = values
+        self.size = end
+
+    def view(self):
+        return self.array[:self.size]
+
+
+class _Rows:
+    """
+    Append-only CSR rows; matrix() covers the rows appended so far.
+    """
+
+    def __init__(self, matrix):
+        self.n_rows = matrix.shape[0]
+        # int32 like SciPy's own choice, so matrix() needs no conversion
+        self.indptr = _Column(matrix.indptr.astype(np.int32))
+        self.indices = _Column(matrix.indices.astype(np.int32))
+        self.data = _Column(matrix.data.astype(np.float64))
+
+    def append(self, cols, values):
+        order = np.argsort(cols)
+        self.indices.extend(cols[order])
+        self.data.extend(values[order])
+        self.indptr.append(self.data.size)
+        self.n_rows += 1
+
+    def matrix(self, n_cols):
+        from scipy import sparse
+
+        return sparse.csr_matrix(
+            (self.data.view(), self.indices.view(), self.indptr.view()),
+            shape=(self.n_rows, n_cols),
+        )
+
+
+class MentorIndex:
+    """
+    Long-lived replacement for building vectors per request.
+
+    Readers (query) never take the lock: they grab the current Matrices
+    once and work on them. Writers (update_user) hold the lock, append to
+    the arrays and publish new Matrices in one assignment.
+    """
+
+    def __init__(self):
+        self.skill_cols = {}
+        self._lock = threading.Lock()
+        none = np.zeros(0, dtype=np.int64)
+        self._load(
+            _csr(none, none, np.zeros(0), (0, 0)),
+            _csr(none, none, np.zeros(0), (0, 0)),
+            np.zeros(0, dtype=np.int64),
+            version=0,
+        )
+
+        # key -> (structure, user_rows it was built for, rows covered)
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+
+    def _load(self, have, want, row_users, version):
+        # fresh arrays and numbering (build, compaction)
+        self._have = _Rows(have)
+        self._want = _Rows(want)
+        self._norms = _Column(_row_norms(have))
+        self._row_users = _Column(row_users)
+        self._dead_since = _Column(np.full(len(row_users), NEVER, dtype=np.int64))
+        self.dead_rows = 0
+        self.users = len(row_users)
+        self.version = version
+        user_rows = {
+            user_id: (row, version, None)
+            for row, user_id in enumerate(row_users.tolist())
+        }
+        self.matrices = self._snapshot(user_rows)
+
+    def _snapshot(self, user_rows):
+        n_cols = len(self.skill_cols)
+        return Matrices(
+            have=self._have.matrix(n_cols),
+            have_norms=self._norms.view(),
+            want=self._want.matrix(n_cols),
+            row_users=self._row_users.view(),
+            user_rows=user_rows,
+            dead_since=self._dead_since.view(),
+            version=self.version,
+        )
+
+    # ---------- building ----------
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """
+        Build the index from a SkillArrays tuple in a few vectorized passes.
+        """
+        index = cls()
+
+        # sorted so columns/rows are deterministic
+        skill_ids = np.unique(
+            np.concatenate([arrays.have_skill_ids, arrays.want_skill_ids])
+        )
+        user_ids = np.unique(
+            np.concatenate([arrays.have_user_ids, arrays.want_user_ids])
+        )
+        index.skill_cols = dict(zip(skill_ids.tolist(), range(len(skill_ids))))
+
+        shape = (len(user_ids), len(skill_ids))
+        have = _csr(
+            np.searchsorted(user_ids, arrays.have_user_ids),
+            np.searchsorted(skill_ids, arrays.have_skill_ids),
+            np.asarray(arrays.have_weights),
+            shape,
+        )
+        want = _csr(
+            np.searchsorted(user_ids, arrays.want_user_ids),
+            np.searchsorted(skill_ids, arrays.want_skill_ids),
+            np.ones(len(arrays.want_skill_ids)),
+            shape,
+        )
+        index._load(have, want, user_ids.astype(np.int64), version=0)
+        return index
+
+    @classmethod
+    def build(cls, have_rows, want_rows):
+        """
+        Convenience wrapper around from_arrays() for row tuples.
+
+        have_rows: iterable of (user_id, skill_id, weight)
+        want_rows: iterable of (user_id, skill_id)
+        """
+        have = np.array(list(have_rows), dtype=np.int64).reshape(-1, 3)
+        want = np.array(list(want_rows), dtype=np.int64).reshape(-1, 2)
+        return cls.from_arrays(
+            SkillArrays(
+                have_user_ids=have[:, 0],
+                have_skill_ids=have[:, 1],
+                have_weights=have[:, 2],
+                want_user_ids=want[:, 0],
+                want_skill_ids=want[:, 1],
+            )
+        )
+
+    def _column(self, skill_id):
+        col = self.skill_cols.get(skill_id)
+        if col is None:
+            col = len(self.skill_cols)
+            self.skill_cols[skill_id] = col
+        return col
+
+    # ---------- incremental updates ----------
+
+    def update_user(self, user_id, have_items, want_skill_ids):
+        """
+        Replace one user's skills.
+
+        have_items: list of (skill_id, weight)
+        want_skill_ids: list of skill ids
+
+        The old row (if any) is marked dead and a new row is appended.
+        Dead rows are dropped once they pile up.
+        """
+        have_map = dict(have_items)
+        want_set = set(want_skill_ids)
+
+        with self._lock:
+            have_cols = [self._column(s) for s in have_map]
+            want_cols = [self._column(s) for s in want_set]
+            version = self.version + 1
+
+            matrices = self.matrices
+            old_row = _row_of(matrices, user_id)
+            if old_row is not None:
+                # older snapshots have smaller versions: still live there
+                self._dead_since.array[old_row] = version
+                self.dead_rows += 1
+
+            if have_map or want_set:
+                weights = np.asarray(list(have_map.values()), dtype=np.float64)
+                self._have.append(np.asarray(have_cols, dtype=np.int32), weights)
+                self._want.append(
+                    np.asarray(want_cols, dtype=np.int32), np.ones(len(want_cols))
+                )
+                self._norms.append(np.sqrt(weights @ weights))
+                self._row_users.append(user_id)
+                self._dead_since.append(NEVER)
+                new_row = self._have.n_rows - 1
+            else:
+                new_row = None
+            self.users += (new_row is not None) - (old_row is not None)
+
+            # tagged with the new version: older snapshots skip this entry
+            user_rows = matrices.user_rows
+            previous = user_rows.get(user_id)
+            if previous is not None or new_row is not None:
+                user_rows[user_id] = (new_row, version, previous)
+
+            self.version = version
+            if self.dead_rows > COMPACT_DEAD_RATIO * max(self._have.n_rows, 1):
+                self._compact()
+            else:
+                self.matrices = self._snapshot(user_rows)
+
+    def _compact(self):
+        # caller holds _lock; only rows live in the newest version remain
+        live = np.flatnonzero(self._dead_since.view() == NEVER)
+        matrices = self._snapshot(None)
+        # new numbering -> new arrays and user_rows, older tuples keep theirs
+        self._load(
+            matrices.have[live],
+            matrices.want[live],
+            matrices.row_users[live],
+            version=self.version,
+        )
+
+    def stats(self):
+        have = self.matrices.have
+        return {
+            "users": self.users,
+            "skills": len(self.skill_cols),
+            "rows": have.shape[0],
+            "dead_rows": self.dead_rows,
+            "nnz": int(have.nnz),
+        }
+
+    # ---------- queries ----------
+
+    def row_of(self, user_id, matrices=None):
+        """
+        user_id's row in matrices (default: the current ones), or None.
+        """
+        return _row_of(matrices or self.matrices, user_id)
+
+    def mentor_rows(self, matrices=None):
+        """
+        Rows of the users with something to teach.
+        """
+        return np.flatnonzero(_live(matrices or self.matrices))
+
+    def wanted_columns(self, user_id, matrices=None):
+        """
+        Columns of the skills user_id wants (empty array if none).
+        """
+        matrices = matrices or self.matrices
+        return _wanted_at(matrices, _row_of(matrices, user_id))
+
+    def query(
+        self,
+        user_id,
+        top_k=5,
+        min_score=0.0,
+        mode=EXACT,
+        lsh_params=None,
+        mutual=False,
+        exclude=None,
+    ):
+        """
+        Return [(mentor_user_id, score), ...] sorted by score desc,
+        same cosine scores as find_best_mentors() (see round_scores).
+
+        mode=LSH only scores mentors that share an LSH bucket with the
+        learner (see ml/ann.py): faster on big populations, but a good
+        mentor can be missed. lsh_params are passed to LSHIndex.
+
+        mutual=True ranks swap partners, same scores as
+        find_best_mentors(mutual=True): only mentors who also want one of
+        the learner's skills are returned.
+
+        exclude: user ids never to return (e.g. existing connections);
+        they are dropped from the candidates before anything is scored.
+        """
+        matrices = self.matrices
+        have, have_norms, row_users = (
+            matrices.have,
+            matrices.have_norms,
+            matrices.row_users,
+        )
+
+        row = _row_of(matrices, user_id)
+        wanted = _wanted_at(matrices, row)
+        if not len(wanted):
+            # user has no "wants", can't match
+            return []
+
+        want_vec = np.zeros(have.shape[1], dtype=np.float64)
+        want_vec[wanted] = 1.0
+        # want values are all 1, so the norm is sqrt(number of wants)
+        want_norm = np.sqrt(len(wanted))
+
+        excluded = _id_array(exclude, user_id)
+
+        with span("candidates"):
+            if mode == LSH:
+                params = lsh_params or {}
+                lsh, covered = self._derived_for(
+                    ("lsh", tuple(sorted(params.items()))),
+                    matrices,
+                    lambda have: LSHIndex(have, **params),
+                )
+                rows = np.concatenate(
+                    [lsh.candidate_rows(want_vec), np.arange(covered, have.shape[0])]
+                )
+                keep = _live(matrices, rows) & _allowed(row_users[rows], excluded)
+                candidates = rows[keep]
+                dots = have[candidates] @ want_vec
+            else:
+                candidates, dots = self._overlapping_mentors(
+                    matrices, wanted, want_vec
+                )
+                keep = _live(matrices, candidates) & _allowed(
+                    row_users[candidates], excluded
+                )
+                candidates, dots = candidates[keep], dots[keep]
+
+            scores = dots / (have_norms[candidates] * want_norm)
+
+        if mutual:
+            with span("mutual"):
+                scores = round_scores(
+                    self._mutual_scores(matrices, row, candidates, scores)
+                )
+                keep = scores > 0
+                candidates, scores = candidates[keep], scores[keep]
+        else:
+            scores = round_scores(scores)
+
+        # highest score first, ties broken by user id
+        with span("top_k"):
+            winners = select_top_k(scores, row_users[candidates], top_k, min_score)
+            results = [
+                (int(row_users[candidates[i]]), float(scores[i])) for i in winners
+            ]
+
+        if mode != LSH and not mutual and len(results) < top_k and min_score <= 0:
+            # find_best_mentors() also returns mentors with score 0
+            with span("zero_score"):
+                results += self._zero_score_mentors(
+                    matrices, excluded, candidates, top_k - len(results)
+                )
+        return results
+
+    def _overlapping_mentors(self, matrices, wanted, want_vec):
+        """
+        Rows sharing at least one wanted skill, and their dot products.
+
+        Only the posting lists (skill -> mentor rows) of the wanted skills
+        are read, so the cost follows the popularity of those skills, not
+        the number of users.
+        """
+        have = matrices.have
+        postings, covered = self._derived_for(
+            "postings", matrices, lambda have: have.tocsc()
+        )
+
+        cols = wanted[wanted < postings.shape[1]]
+        starts, stops = postings.indptr[cols], postings.indptr[cols + 1]
+        rows = np.concatenate(
+            [postings.indices[a:b] for a, b in zip(starts, stops)]
+            + [np.zeros(0, dtype=postings.indices.dtype)]
+        )
+        weights = np.concatenate(
+            [postings.data[a:b] for a, b in zip(starts, stops)] + [np.zeros(0)]
+        )
+        if len(rows) * DENSE_ACCUMULATE_RATIO > covered:
+            # popular skills: one pass over a dense accumulator beats sorting
+            dense = np.bincount(rows, weights=weights, minlength=covered)
+            candidates = np.flatnonzero(dense)
+            dots = dense[candidates]
+        else:
+            candidates, inverse = np.unique(rows, return_inverse=True)
+            dots = np.bincount(inverse, weights=weights, minlength=len(candidates))
+
+        if covered < have.shape[0]:
+            # rows appended since the postings were built
+            tail = np.arange(covered, have.shape[0])
+            tail_dots = have[tail] @ want_vec
+            overlap = tail_dots > 0
+            candidates = np.concatenate([candidates, tail[overlap]])
+            dots = np.concatenate([dots, tail_dots[overlap]])
+
+        return candidates.astype(np.int64), dots
+
+    def _mutual_scores(self, matrices, row, candidates, forward):
+        """
+        Combine the forward scores of candidates with the reverse
+        direction: candidate's wants vs the learner's haves (row).
+        """
+        have, have_norms, want = matrices.have, matrices.have_norms, matrices.want
+        if not have_norms[row] or not len(candidates):
+            # learner has nothing to teach back
+            return np.zeros(len(candidates))
+
+        have_vec = np.zeros(have.shape[1], dtype=np.float64)
+        start, stop = have.indptr[row], have.indptr[row + 1]
+        have_vec[have.indices[start:stop]] = have.data[start:stop]
+
+        wants = want[candidates]
+        # want values are all 1, so each norm is sqrt(number of wants)
+        want_norms = np.sqrt(np.diff(wants.indptr))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            backward = (wants @ have_vec) / (want_norms * have_norms[row])
+        return mutual_score(forward, np.nan_to_num(backward, nan=0.0))
+
+    def _zero_score_mentors(self, matrices, excluded, scored_rows, count):
+        row_users = matrices.row_users
+        live = _live(matrices) & _allowed(row_users, excluded)
+        live[scored_rows] = False
+        rows = np.flatnonzero(live)
+
+        # all scores are 0 -> lowest user ids, like the stable sort did
+        picked = select_top_k(np.zeros(len(rows)), row_users[rows], count)
+        return [(int(row_users[rows[i]]), 0.0) for i in picked]
+
+    def _derived_for(self, key, matrices, build):
+        """
+        (structure, rows covered) built from this snapshot's have-matrix,
+        cached until compaction or until enough rows were appended.
+        """
+        n_rows = matrices.have.shape[0]
+
+        def usable(cached):
+            return (
+                cached is not None
+                and cached[1] is matrices.user_rows
+                and cached[2] <= n_rows
+            )
+
+        cached = self._derived.get(key)
+        if usable(cached):
+            structure, _, covered = cached
+            grown = n_rows - covered
+            if grown < max(DERIVED_REBUILD_MIN_ROWS, DERIVED_REBUILD_RATIO * covered):
+                return structure, covered
+            # still correct (new rows are scored directly), so only
+            # rebuild if nobody else is doing it right now
+            if not self._derived_lock.acquire(blocking=False):
+                return structure, covered
+            self._derived_lock.release()
+
+        with self._derived_lock:
+            cached = self._derived.get(key)
+            if usable(cached) and cached[2] == n_rows:
+                return cached[0], cached[2]
+            structure = build(matrices.have)
+            self._derived[key] = (structure, matrices.user_rows, n_rows)
+            return structure, n_rows
+
+
+def _row_of(matrices, user_id):
+    # the user's row in this snapshot, None if it has none
+    entry = matrices.user_rows.get(user_id)
+    while entry is not None and entry[1] > matrices.version:
+        entry = entry[2]  # written by a newer update_user()
+    return entry[0] if entry is not None else None
+
+
+def _live(matrices, rows=slice(None)):
+    # mentors of this snapshot: something to teach, not replaced since
+    return (matrices.have_norms[rows] > 0) & (
+        matrices.dead_since[rows] > matrices.version
+    )
+
+
+def _wanted_at(matrices, row):
+    if row is None:
+        return np.zeros(0, dtype=np.int32)
+    want = matrices.want
+    return want.indices[want.indptr[row]:want.indptr[row + 1]]
+
+
+def _id_array(exclude, user_id):
+    # the learner is always excluded (don't match with self)
+    ids = [user_id]
+    if exclude:
+        ids.extend(exclude)
+    return np.asarray(ids, dtype=np.int64)
+
+
+def _allowed(user_ids, excluded):
+    if len(excluded) == 1:
+        return user_ids != excluded[0]
+    return ~np.isin(user_ids, excluded)
+
+
+# ----------------------------------------------------
+# SNAPSHOT HOLDER (background rebuilds)
+# ----------------------------------------------------
+class IndexHolder:
+    """
+    Owns the current MentorIndex snapshot.
+
+    A full rebuild runs on a background thread; requests keep using the
+    previous snapshot until the new one replaces it in a single assignment.
+    Users whose skills change while a rebuild is running are re-applied to
+    the new snapshot before it goes live, so no update is lost.
+
+    loader():                 -> new MentorIndex (full build)
+    user_loader(user_id):     -> (have_items, want_skill_ids) for one user
+    on_swap():                called after a new snapshot went live
+    thread_cleanup():         called at the end of the background thread
+    max_age:                  seconds after which get() schedules a rebuild
+    """
+
+    def __init__(
+        self, loader, user_loader, on_swap=None, thread_cleanup=None, max_age=None
+    ):
+        self._loader = loader
+        self._user_loader = user_loader
+        self._on_swap = on_swap
+        self._thread_cleanup = thread_cleanup
+        self.max_age = max_age
+
+        self.index = None
+        self.generation = 0
+        self.built_at = None  # time.time() of the last swap
+        self.build_seconds = None
+
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()  # one build at a time
+        self._touched = None  # user ids updated during a build
+        self._thread = None
+        self._again = False
+
+    def get(self):
+        """
+        Current snapshot. Built synchronously on first use only.
+        """
+        index = self.index
+        if index is None:
+            with self._build_lock:
+                if self.index is None:
+                    self._build()
+            index = self.index
+        elif self.max_age and time.time() - self.built_at > self.max_age:
+            self.rebuild_async()
+        return index
+
+    def rebuild(self):
+        """
+        Build a new snapshot on the calling thread and swap it in.
+        """
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        # caller holds _build_lock
+        with self._lock:
+            self._touched = set()
+
+        started = time.monotonic()
+        try:
+            index = self._loader()
+        except BaseException:
+            with self._lock:
+                self._touched = None
+            raise
+
+        while True:
+            with self._lock:
+                touched, self._touched = self._touched, set()
+                if not touched:
+                    self._touched = None
+                    self.index = index
+                    self.generation += 1
+                    self.built_at = time.time()
+                    self.build_seconds = time.monotonic() - started
+                    break
+            # changed while we were loading -> re-read them
+            for user_id in touched:
+                index.update_user(user_id, *self._user_loader(user_id))
+
+        if self._on_swap is not None:
+            self._on_swap()
+
+    def rebuild_async(self):
+        """
+        Start a background rebuild. If one is already running, another one
+        is queued to start right after it (the running one may have read
+        the data before the change that asked for it).
+        """
+        with self._lock:
+            if self.index is None:
+                # nothing to refresh, the first get() builds it
+                return False
+            if self._thread is not None and self._thread.is_alive():
+                self._again = True
+                return False
+            self._thread = threading.Thread(
+                target=self._run, name="mentor-index-rebuild", daemon=True
+            )
+            self._thread.start()
+        return True
+
+    def _run(self):
+        try:
+            while True:
+                self.rebuild()
+                with self._lock:
+                    if not self._again:
+                        break
+                    self._again = False
+        finally:
+            if self._thread_cleanup is not None:
+                self._thread_cleanup()
+
+    def update_user(self, user_id):
+        """
+        Apply one user's current skills to the live snapshot.
+        """
+        with self._lock:
+            if self.index is None and self._touched is None:
+                # nothing built or building: the first build reads fresh data
+                return
+
+        items = self._user_loader(user_id)
+        with self._lock:
+            if self._touched is not None:
+                self._touched.add(user_id)
+            index = self.index
+        if index is not None:
+            index.update_user(user_id, *items)
+
+    def reset(self):
+        """
+        Forget the snapshot; the next get() rebuilds synchronously.
+        """
+        with self._build_lock:
+            with self._lock:
+                self.index = None
+                self.built_at = None
+                self.build_seconds = None
+
+    def is_rebuilding(self):
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def status(self):
+        index = self.index
+        status = {
+            "ready": index is not None,
+            "generation": self.generation,
+            "age_seconds": (
+                time.time() - self.built_at if self.built_at is not None else None
+            ),
+            "build_seconds": self.build_seconds,
+            "rebuilding": self.is_rebuilding(),
+        }
+        if index is not None:
+            status.update(index.stats())
+        return status
@@ -1,6 +1,16 @@
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
 
+try:
+    from .spans import span
+except ImportError:
+    # run as a script: python ml/matcher.py
+    from spans import span
+
+# No scikit-learn / SciPy at module level: api.services imports this module
+# and ml/index.py (which imports SciPy lazily for the same reason), so
+# everything imported here is paid for by every web worker at boot.
+# benchmarks/import_time.py and StandaloneTests keep an eye on that.
+
 # ----------------------------------------------------
 # LEVEL WEIGHTS (must match DB values: beginner/intermediate/advanced)
 # ----------------------------------------------------
@@ -72,14 +82,114 @@ def build_want_vector(user, skill_vocab):
     return vec
 
 
+# ----------------------------------------------------
+# COSINE SIMILARITY
+# ----------------------------------------------------
+def _normalize_rows(X):
+    # rows scaled to unit length; all-zero rows stay zero
+    norms = np.sqrt(np.einsum("ij,ij->i", X, X))
+    norms[norms == 0.0] = 1.0
+    return X / norms[:, np.newaxis]
+
+
+def cosine_similarity(X, Y=None):
+    """
+    Cosine similarity between every row of X and every row of Y
+    (shape: len(X) x len(Y)); Y=None compares X with itself.
+
+    Same steps as sklearn.metrics.pairwise.cosine_similarity (normalize
+    both sides, then one dot product), so the scores are identical,
+    without importing scikit-learn.
+    """
+    X_normalized = _normalize_rows(np.asarray(X, dtype=np.float64))
+    if Y is None or Y is X:
+        # one array on both sides, like scikit-learn: NumPy then takes
+        # the symmetric product, whose last bits differ from a general one
+        Y_normalized = X_normalized
+    else:
+        Y_normalized = _normalize_rows(np.asarray(Y, dtype=np.float64))
+    return X_normalized @ Y_normalized.T
+
+
+# The index (ml/index.py), the batch path and find_best_mentors() add up
+# the same terms in different orders, so equal scores can differ in the
+# last bit. Scores are rounded before ranking so ties (broken by user id)
+# come out the same everywhere.
+SCORE_DECIMALS = 12
+
+
+def round_scores(scores, out=None):
+    return np.round(scores, SCORE_DECIMALS, out=out)
+
+
+# ----------------------------------------------------
+# MUTUAL (SWAP) SCORE
+# ----------------------------------------------------
+def mutual_score(forward, backward):
+    """
+    Harmonic mean of the two directions of a swap:
+      forward  = learner's wants vs mentor's haves
+      backward = mentor's wants vs learner's haves
+    High only if BOTH sides can teach the other; 0 if either is 0.
+    """
+    total = forward + backward
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, 2.0 * forward * backward / total, 0.0)
+
+
+# ----------------------------------------------------
+# TOP-K SELECTION
+# ----------------------------------------------------
+def select_top_k(scores, tie_keys, top_k, min_score=0.0):
+    """
+    Indices of the top_k highest scores that are >= min_score,
+    highest first, ties broken by smallest tie_keys.
+
+    Uses argpartition, so only the k winners get sorted:
+    O(n + k log k) instead of sorting every candidate.
+    """
+    candidates = np.flatnonzero(scores >= min_score)
+    if top_k <= 0 or not len(candidates):
+        return np.zeros(0, dtype=np.int64)
+
+    cand_scores = scores[candidates]
+    if len(candidates) > top_k:
+        # k-th largest score; everything above it is in for sure
+        kth = np.partition(cand_scores, len(cand_scores) - top_k)[
+            len(cand_scores) - top_k
+        ]
+        above = candidates[cand_scores > kth]
+        ties = candidates[cand_scores == kth]
+
+        # fill the remaining slots with the smallest tie keys
+        need = top_k - len(above)
+        if len(ties) > need:
+            ties = ties[np.argpartition(tie_keys[ties], need - 1)[:need]]
+
+        candidates = np.concatenate([above, ties])
+
+    order = np.lexsort((tie_keys[candidates], -scores[candidates]))
+    return candidates[order]
+
+
 # ----------------------------------------------------
 # MAIN MATCHING FUNCTION
 # ----------------------------------------------------
-def find_best_mentors(current_user_id, users_list, top_k=5, min_score=0.0):
+def find_best_mentors(
+    current_user_id,
+    users_list,
+    top_k=5,
+    min_score=0.0,
+    mutual=False,
+    exclude=None,
+):
     """
     current_user_id: user who is LEARNING
     users_list: list of dicts with keys:
         id, name, skills_have (list of {name, level}), skills_want (list of names)
+    mutual: rank swap partners instead (see mutual_score); only users
+        who also want something the current user has are returned
+    exclude: user ids to leave out (e.g. existing connections)
 
     Returns: list of {"user": <user_dict>, "score": <float>} sorted by score desc.
     """
@@ -87,7 +197,8 @@ def find_best_mentors(current_user_id, users_list, top_k=5, min_score=0.0):
         return []
 
     # Build vocabulary of all skills
-    skill_vocab = build_skill_vocab(users_list)
+    with span("vocab"):
+        skill_vocab = build_skill_vocab(users_list)
 
     # Find the current user object
     current_user = None
@@ -107,41 +218,178 @@ def find_best_mentors(current_user_id, users_list, top_k=5, min_score=0.0):
 
     mentor_vectors = []
     mentor_meta = []
+    exclude = set(exclude or ())
 
     # Build HAVE vectors for all potential mentors
-    for user in users_list:
-        if user["id"] == current_user_id:
-            continue  # don't match with self
+    with span("vectorize"):
+        for user in users_list:
+            if user["id"] == current_user_id:
+                continue  # don't match with self
+            if user["id"] in exclude:
+                continue
 
-        have_vec = build_have_vector(user, skill_vocab)
-        if not have_vec.any():
-            # this user has no skills to teach
-            continue
+            have_vec = build_have_vector(user, skill_vocab)
+            if not have_vec.any():
+                # this user has no skills to teach
+                continue
 
-        mentor_vectors.append(have_vec)
-        mentor_meta.append(user)
+            mentor_vectors.append(have_vec)
+            mentor_meta.append(user)
 
     if not mentor_vectors:
         return []
 
-    mentor_matrix = np.stack(mentor_vectors)
+    with span("similarity"):
+        mentor_matrix = np.stack(mentor_vectors)
 
-    # Compute cosine similarity
-    sims = cosine_similarity(current_vec.reshape(1, -1), mentor_matrix)[0]
+        # Compute cosine similarity
+        sims = cosine_similarity(current_vec.reshape(1, -1), mentor_matrix)[0]
 
-    results = []
-    for meta, score in zip(mentor_meta, sims):
-        if score >= min_score:
-            results.append(
-                {
-                    "user": meta,
-                    "score": float(score),
-                }
+    if mutual:
+        with span("mutual"):
+            # other direction: what they want vs what the current user has
+            current_have = build_have_vector(current_user, skill_vocab)
+            their_wants = np.stack(
+                [build_want_vector(user, skill_vocab) for user in mentor_meta]
             )
+            back = cosine_similarity(current_have.reshape(1, -1), their_wants)[0]
+            sims = round_scores(mutual_score(sims, back))
+            sims[sims == 0] = -np.inf  # not a swap, never returned
+    else:
+        sims = round_scores(sims)
+
+    # Pick the winners on the score array, only they become dicts.
+    # Ties keep list order, like the old stable sort did.
+    with span("top_k"):
+        winners = select_top_k(sims, np.arange(len(sims)), top_k, min_score)
+    return [
+        {
+            "user": mentor_meta[i],
+            "score": float(sims[i]),
+        }
+        for i in winners
+    ]
+
 
-    # Sort highest score first
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:top_k]
+# ----------------------------------------------------
+# BATCH MATCHING (many learners at once)
+# ----------------------------------------------------
+# Learners are scored chunk by chunk against every mentor. A chunk holds
+# a few dense chunk x mentors float blocks (scores, the sparse product
+# before it, and with mutual=True the reverse direction and the total):
+# the chunk is as many learners as fit in BATCH_MEMORY_BYTES, at most
+# BATCH_CHUNK_SIZE.
+BATCH_CHUNK_SIZE = 256
+BATCH_MEMORY_BYTES = 64 * 2**20
+_BATCH_BLOCKS = 3  # float64 blocks per chunk, doubled for mutual
+
+
+def find_best_mentors_batch(
+    index,
+    learner_ids,
+    top_k=5,
+    min_score=0.0,
+    mutual=False,
+    exclude=None,
+    chunk_size=BATCH_CHUNK_SIZE,
+    memory_bytes=BATCH_MEMORY_BYTES,
+):
+    """
+    Score many learners against a ml.index.MentorIndex in one go.
+
+    The learners' want-rows are taken from the index as one sparse matrix
+    and multiplied with the mentors' have-matrix chunk by chunk. Chunks
+    are sized so their blocks stay around memory_bytes, and the math runs
+    in place on the score block.
+
+    mutual=True scores swap partners (see mutual_score): the reverse
+    direction is the learners' have-rows times the mentors' want-rows,
+    from the same matrices.
+
+    exclude: {learner_id: user ids never to return for that learner}.
+
+    Returns: {learner_id: [(mentor_id, score), ...]} with the same scores
+    and order as MentorIndex.query().
+    """
+    matrices = index.matrices
+    have, have_norms, want = matrices.have, matrices.have_norms, matrices.want
+    results = {user_id: [] for user_id in learner_ids}
+
+    learners = []
+    for user_id in results:
+        row = index.row_of(user_id, matrices)
+        if row is not None:
+            learners.append((user_id, row))
+
+    # only users with something to teach are mentors
+    mentor_rows = index.mentor_rows(matrices)
+    if not learners or not len(mentor_rows):
+        return results
+
+    mentor_ids = matrices.row_users[mentor_rows]
+    mentor_norms = have_norms[mentor_rows]
+    mentors_t = have[mentor_rows].T.tocsr()  # skills x mentors
+    if mutual:
+        mentor_wants_t = want[mentor_rows].T.tocsr()
+        mentor_want_norms = np.sqrt(np.diff(want[mentor_rows].indptr))
+
+    blocks = _BATCH_BLOCKS * (2 if mutual else 1)
+    fitting = memory_bytes // (8 * blocks * len(mentor_rows))
+    chunk_size = max(1, min(chunk_size, fitting))
+
+    for start in range(0, len(learners), chunk_size):
+        chunk = learners[start:start + chunk_size]
+        rows = [row for _, row in chunk]
+        wants = want[rows]
+
+        # want values are all 1, so each norm is sqrt(number of wants)
+        want_norms = np.sqrt(np.diff(wants.indptr))
+
+        scores = (wants @ mentors_t).toarray()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # row by row: same operations (and bits) as MentorIndex.query()
+            for i, want_norm in enumerate(want_norms):
+                np.divide(scores[i], mentor_norms * want_norm, out=scores[i])
+
+        if mutual:
+            back = (have[rows] @ mentor_wants_t).toarray()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                for i, have_norm in enumerate(have_norms[rows]):
+                    np.divide(back[i], mentor_want_norms * have_norm, out=back[i])
+            np.nan_to_num(scores, copy=False, nan=0.0)
+            np.nan_to_num(back, copy=False, nan=0.0)
+            _mutual_score_in_place(scores, back)
+            del back
+            round_scores(scores, out=scores)
+            scores[scores == 0] = -np.inf  # not a swap, never returned
+        else:
+            round_scores(scores, out=scores)
+
+        for i, (user_id, _) in enumerate(chunk):
+            if not want_norms[i]:
+                # user has no "wants", can't match
+                continue
+
+            row_scores = scores[i]
+            row_scores[mentor_ids == user_id] = -np.inf  # don't match with self
+            if exclude and exclude.get(user_id):
+                blocked = np.fromiter(exclude[user_id], dtype=np.int64)
+                row_scores[np.isin(mentor_ids, blocked)] = -np.inf
+
+            winners = select_top_k(row_scores, mentor_ids, top_k, min_score)
+            results[user_id] = [
+                (int(mentor_ids[j]), float(row_scores[j])) for j in winners
+            ]
+
+    return results
+
+
+def _mutual_score_in_place(forward, backward):
+    # mutual_score() into forward, with one extra block instead of four
+    total = forward + backward
+    forward *= 2.0
+    forward *= backward
+    np.divide(forward, total, out=forward, where=total > 0)
 
 
 # ----------------------------------------------------
@@ -0,0 +1,48 @@
+"""
+Named spans for profiling (core/profiling.py records them).
+
+Kept free of Django so the ML code can mark its stages: outside a
+profiled request span() returns a shared no-op context manager after one
+ContextVar lookup.
+"""
+import contextvars
+import sys
+import time
+from contextlib import nullcontext
+
+# the recorder of the running request: anything with open_spans (list)
+# and span_seconds (dict), i.e. a core.profiling.Profile
+current = contextvars.ContextVar("profile", default=None)
+_NO_SPAN = nullcontext()
+
+
+class _Span:
+    def __init__(self, recorder, name, frame):
+        self.recorder = recorder
+        self.name = name
+        self.frame = frame  # where the span was entered, for the samples
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.recorder.open_spans.append(self)
+
+    def __exit__(self, *exc_info):
+        recorder = self.recorder
+        path = ".".join(span.name for span in recorder.open_spans)
+        recorder.open_spans.pop()
+        elapsed = time.perf_counter() - self.started
+        recorder.span_seconds[path] = recorder.span_seconds.get(path, 0.0) + elapsed
+
+
+def span(name):
+    """
+    Context manager timing one stage of a profiled request (no-op otherwise).
+    """
+    recorder = current.get()
+    if recorder is None:
+        return _NO_SPAN
+    return _Span(recorder, name, sys._getframe(1))
+
+
+def active():
+    return current.get() is not None
@@ -0,0 +1,464 @@
+import importlib.util
+import os
+import subprocess
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from unittest import mock, skipUnless
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from .index import COMPACT_DEAD_RATIO, EXACT, LSH, IndexHolder, MentorIndex
+from .matcher import (
+    LEVEL_WEIGHTS,
+    cosine_similarity,
+    find_best_mentors,
+    find_best_mentors_batch,
+)
+
+LEVELS = list(LEVEL_WEIGHTS)
+
+
+# -----------------------------
+#  HELPERS
+# -----------------------------
+def population(n_users=400, n_skills=30, seed=7):
+    """
+    Seeded {user_id: (have {skill_id: level}, want [skill_id])}. Few
+    skills and levels, so many mentors tie on score.
+    """
+    rng = np.random.default_rng(seed)
+    return {
+        user_id: random_skills(rng, n_skills) for user_id in range(1, n_users + 1)
+    }
+
+
+def random_skills(rng, n_skills):
+    have_ids = rng.choice(n_skills, rng.integers(0, 5), replace=False)
+    want_ids = rng.choice(n_skills, rng.integers(0, 4), replace=False)
+    return (
+        {int(s) + 1: LEVELS[rng.integers(len(LEVELS))] for s in have_ids},
+        [int(s) + 1 for s in want_ids],
+    )
+
+
+def as_users_list(users):
+    # id order, like build_users_list_for_ml()
+    return [
+        {
+            "id": user_id,
+            "name": f"user{user_id}",
+            "skills_have": [
+                {"name": f"skill{s}", "level": level} for s, level in have.items()
+            ],
+            "skills_want": [f"skill{s}" for s in want],
+        }
+        for user_id, (have, want) in sorted(users.items())
+    ]
+
+
+def have_items(have):
+    return [(s, LEVEL_WEIGHTS[level]) for s, level in have.items()]
+
+
+def build_index(users):
+    return MentorIndex.build(
+        [
+            (user_id, s, weight)
+            for user_id, (have, _) in users.items()
+            for s, weight in have_items(have)
+        ],
+        [(user_id, s) for user_id, (_, want) in users.items() for s in want],
+    )
+
+
+# -----------------------------
+#  MENTOR INDEX
+# -----------------------------
+class MentorIndexTests(SimpleTestCase):
+    def assertSameRanking(self, got, expected):
+        self.assertEqual([user_id for user_id, _ in got], [u for u, _ in expected])
+        for (_, score), (_, expected_score) in zip(got, expected):
+            self.assertAlmostEqual(score, expected_score, places=12)
+
+    def test_query_matches_find_best_mentors(self):
+        users = population()
+        users_list = as_users_list(users)
+        index = build_index(users)
+
+        for mutual in (False, True):
+            for user_id in users:
+                expected = [
+                    (match["user"]["id"], match["score"])
+                    for match in find_best_mentors(
+                        user_id, users_list, top_k=10, mutual=mutual
+                    )
+                ]
+                self.assertSameRanking(
+                    index.query(user_id, top_k=10, mutual=mutual), expected
+                )
+
+    def test_mutual_scores_are_the_harmonic_mean_of_both_directions(self):
+        index = MentorIndex.build(
+            # learner 1 teaches skill 3; mentor 2 teaches 1 and 2 and wants 3
+            [(1, 3, 2), (2, 1, 3), (2, 2, 3), (3, 1, 3)],
+            [(1, 1), (2, 3), (2, 4)],
+        )
+        forward = 1 / np.sqrt(2)  # learner wants 1 of mentor 2's 2 skills
+        backward = 1 / np.sqrt(2)  # mentor 2 wants 2 skills, learner has 1
+        expected = 2 * forward * backward / (forward + backward)
+
+        [(mentor, score)] = index.query(1, mutual=True)
+        self.assertEqual(mentor, 2)  # mentor 3 wants nothing back
+        self.assertAlmostEqual(score, expected, places=12)
+
+    def test_mutual_query_survives_a_concurrent_update_of_the_learner(self):
+        users = population(n_users=100)
+        index = build_index(users)
+        learner = next(u for u, (have, want) in users.items() if have and want)
+        expected = index.query(learner, mutual=True)
+
+        overlapping = MentorIndex._overlapping_mentors
+
+        def update_meanwhile(self, *args):
+            # the learner gets a new row mid-query
+            index.update_user(learner, [(999, 3)], [998])
+            return overlapping(self, *args)
+
+        with mock.patch.object(MentorIndex, "_overlapping_mentors", update_meanwhile):
+            self.assertEqual(index.query(learner, mutual=True), expected)
+
+    def test_update_appends_without_copying_the_matrices(self):
+        users = population(n_users=100)
+        index = build_index(users)
+        learner = next(u for u, (have, want) in users.items() if have and want)
+        before = index.matrices
+        old_row = index.row_of(learner)
+
+        index.update_user(learner, [(3, 2)], [4])
+
+        after = index.matrices
+        shared = [
+            (before.have_norms, after.have_norms),
+            (before.row_users, after.row_users),
+            (before.dead_since, after.dead_since),
+            (before.have.data, after.have.data),
+            (before.want.indices, after.want.indices),
+        ]
+        for old, new in shared:
+            self.assertTrue(np.shares_memory(old, new))
+        # the older snapshot still sees the old row, the new one only the new
+        self.assertEqual(index.row_of(learner, before), old_row)
+        self.assertEqual(index.mentor_rows(before).tolist().count(old_row), 1)
+        self.assertNotIn(old_row, index.mentor_rows(after).tolist())
+        self.assertEqual(index.row_of(learner), after.have.shape[0] - 1)
+
+    def test_query_while_the_learner_is_updated(self):
+        users = population(n_users=100)
+        index = build_index(users)
+        learner = next(u for u, (have, want) in users.items() if have and want)
+        expected = index.query(learner, mutual=True)
+        seen = []
+        snapshot = MentorIndex._snapshot
+
+        def query_first(self, *args):
+            # update_user() has written its entries, not yet published
+            seen.append(self.query(learner, mutual=True))
+            return snapshot(self, *args)
+
+        with mock.patch.object(MentorIndex, "_snapshot", query_first):
+            index.update_user(learner, [(999, 3)], [998])
+        self.assertEqual(seen, [expected])
+
+    def test_updates_match_a_fresh_build(self):
+        rng = np.random.default_rng(11)
+        users = population(n_users=200)
+        index = build_index(users)
+        compactions = 0
+
+        for _ in range(15):
+            for _ in range(20):
+                # changed skills, new skills, emptied users and new users
+                user_id = int(rng.integers(1, 231))
+                have, want = users[user_id] = random_skills(rng, n_skills=40)
+                dead_before = index.dead_rows
+                index.update_user(user_id, have_items(have), want)
+                if index.dead_rows < dead_before:
+                    compactions += 1
+                    self.assertEqual(index.dead_rows, 0)
+
+            rows = index.matrices.have.shape[0]
+            self.assertLessEqual(index.dead_rows, COMPACT_DEAD_RATIO * rows)
+
+            fresh = build_index(users)
+            for learner in rng.choice(list(users), 30, replace=False).tolist():
+                for mutual in (False, True):
+                    self.assertSameRanking(
+                        index.query(learner, top_k=10, mutual=mutual),
+                        fresh.query(learner, top_k=10, mutual=mutual),
+                    )
+
+        self.assertGreater(compactions, 0)
+
+    def test_batch_matches_query(self):
+        users = population()
+        index = build_index(users)
+        rng = np.random.default_rng(3)
+        learners = list(users)
+        exclude = {
+            user_id: set(rng.choice(learners, 20).tolist()) for user_id in learners
+        }
+
+        for mutual in (False, True):
+            for min_score in (0.0, 0.3):
+                # several chunks, the last one partial
+                batch = find_best_mentors_batch(
+                    index,
+                    learners,
+                    top_k=10,
+                    min_score=min_score,
+                    mutual=mutual,
+                    exclude=exclude,
+                    chunk_size=7,
+                )
+                self.assertEqual(list(batch), learners)
+                for user_id in learners:
+                    expected = index.query(
+                        user_id,
+                        top_k=10,
+                        min_score=min_score,
+                        mutual=mutual,
+                        exclude=exclude[user_id],
+                    )
+                    self.assertSameRanking(batch[user_id], expected)
+
+    def test_batch_memory_follows_the_budget(self):
+        users = population(n_users=5000, n_skills=60)
+        index = build_index(users)
+        learners = list(users)[:300]
+
+        for mutual in (False, True):
+            expected = find_best_mentors_batch(index, learners, mutual=mutual)
+            tracemalloc.start()
+            try:
+                batch = find_best_mentors_batch(
+                    index, learners, mutual=mutual, memory_bytes=2**20
+                )
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            self.assertEqual(batch, expected)
+            # 256 x 5000 float blocks alone would be 10 MiB each
+            self.assertLess(peak, 4 * 2**20)
+
+        # at least one learner per chunk, whatever the budget
+        self.assertEqual(
+            find_best_mentors_batch(index, learners[:20], memory_bytes=1),
+            find_best_mentors_batch(index, learners[:20]),
+        )
+
+
+# -----------------------------
+#  APPROXIMATE (LSH) QUERIES
+# -----------------------------
+class LSHQueryTests(SimpleTestCase):
+    def setUp(self):
+        self.users = population(n_users=2000, n_skills=40)
+        self.index = build_index(self.users)
+        self.learners = [u for u, (_, want) in self.users.items() if want][:200]
+
+    def query(self, user_id, mode, mutual=False, top_k=5, **lsh_params):
+        # min_score > 0: exact mode also fills in zero-score mentors
+        return self.index.query(
+            user_id,
+            top_k=top_k,
+            min_score=1e-12,
+            mode=mode,
+            lsh_params=lsh_params or None,
+            mutual=mutual,
+        )
+
+    def test_probing_every_bucket_matches_exact(self):
+        # one bit per table, plus the bucket one bit away: every row
+        for mutual in (False, True):
+            for user_id in self.learners:
+                self.assertEqual(
+                    self.query(user_id, LSH, mutual, tables=1, bits=1),
+                    self.query(user_id, EXACT, mutual),
+                )
+
+    def test_results_have_exact_scores_and_most_of_the_top_k(self):
+        hits = total = 0
+        for user_id in self.learners:
+            exact = self.query(user_id, EXACT, top_k=len(self.users))
+            approx = self.query(user_id, LSH)
+            # never a mentor exact mode wouldn't score the same
+            self.assertLessEqual(set(approx), set(exact))
+            if exact[:5]:
+                kth = exact[:5][-1][1]
+                hits += sum(score >= kth for _, score in approx)
+                total += len(exact[:5])
+        # 0.78 for this population, see the recall table in ml/ann.py
+        self.assertGreater(hits / total, 0.5)
+
+    def test_rows_appended_after_the_build_are_scored(self):
+        learner, mentor = self.learners[:2]
+        self.query(learner, LSH)  # builds the hash tables
+        wanted = self.users[learner][1]
+
+        # a perfect match appears after the tables were built
+        self.index.update_user(mentor, [(s, 3) for s in wanted], [])
+        self.assertEqual(self.query(learner, LSH)[0], (mentor, 1.0))
+        self.assertEqual(self.query(learner, LSH), self.query(learner, EXACT))
+
+    def test_skills_added_after_the_build_are_matched(self):
+        learner, mentor = self.learners[:2]
+        self.query(learner, LSH)
+        new_skill = 41  # population() skills are 1..40
+
+        have = have_items(self.users[learner][0])
+        self.index.update_user(learner, have, [new_skill])
+        self.index.update_user(mentor, [(new_skill, 2)], [])
+        self.assertEqual(self.query(learner, LSH), [(mentor, 1.0)])
+
+
+# -----------------------------
+#  COSINE SIMILARITY
+# -----------------------------
+class CosineSimilarityTests(SimpleTestCase):
+    @skipUnless(importlib.util.find_spec("sklearn"), "needs scikit-learn")
+    def test_identical_to_scikit_learn(self):
+        from sklearn.metrics.pairwise import cosine_similarity as sklearn_cosine
+
+        rng = np.random.default_rng(5)
+        for _ in range(20):
+            X = rng.random((25, 12))
+            Y = rng.random((40, 12))
+            # sparse-ish rows, all-zero rows and integer level weights
+            X[X < 0.5] = 0
+            X[rng.random(25) < 0.2] = 0
+            Y[rng.random(40) < 0.2] = 0
+            Y = np.ceil(Y * 3)
+
+            np.testing.assert_array_equal(
+                cosine_similarity(X, Y), sklearn_cosine(X, Y)
+            )
+            np.testing.assert_array_equal(cosine_similarity(X), sklearn_cosine(X))
+            np.testing.assert_array_equal(
+                cosine_similarity(X, X), sklearn_cosine(X, X)
+            )
+
+        zeros = np.zeros((2, 3))
+        np.testing.assert_array_equal(
+            cosine_similarity(zeros, np.ones((1, 3))), np.zeros((2, 1))
+        )
+
+
+# -----------------------------
+#  SNAPSHOT HOLDER
+# -----------------------------
+class IndexHolderTests(SimpleTestCase):
+    def setUp(self):
+        self.users = population(n_users=100)
+        self.swaps = []
+        self.loading = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+        self.holder = IndexHolder(
+            loader=self.load,
+            user_loader=lambda user_id: self.user_items(self.users, user_id),
+            on_swap=lambda: self.swaps.append(self.holder.generation),
+        )
+
+    @staticmethod
+    def user_items(users, user_id):
+        have, want = users.get(user_id, ({}, []))
+        return have_items(have), want
+
+    def load(self):
+        # reads the data first, like the DB loader, then takes its time
+        users = dict(self.users)
+        self.loading.set()
+        self.release.wait(5)
+        return build_index(users)
+
+    def wait_for_rebuild(self):
+        deadline = time.monotonic() + 5
+        while self.holder.is_rebuilding():
+            self.assertLess(time.monotonic(), deadline)
+            time.sleep(0.01)
+
+    def assertMatchesData(self, index):
+        fresh = build_index(self.users)
+        for user_id in self.users:
+            self.assertEqual(index.query(user_id), fresh.query(user_id))
+
+    def test_rebuild_swaps_in_a_new_snapshot(self):
+        old = self.holder.get()
+        self.assertEqual((self.holder.generation, self.swaps), (1, [1]))
+        old_results = old.query(1)
+
+        self.users[1] = ({}, [2, 3])
+        self.users[500] = ({2: "advanced", 3: "advanced"}, [])
+        self.assertTrue(self.holder.rebuild_async())
+        self.wait_for_rebuild()
+
+        new = self.holder.get()
+        self.assertIsNot(new, old)
+        self.assertEqual((self.holder.generation, self.swaps), (2, [1, 2]))
+        self.assertEqual(new.query(1)[0][0], 500)
+        # readers still holding the old snapshot are not affected
+        self.assertEqual(old.query(1), old_results)
+        self.assertMatchesData(new)
+
+    def test_updates_during_a_rebuild_are_replayed(self):
+        live = self.holder.get()
+        self.loading.clear()
+        self.release.clear()
+        self.holder.rebuild_async()
+        self.assertTrue(self.loading.wait(5))
+
+        # the loader has read the data already: this change is not in it
+        self.users[1] = ({}, [2, 3])
+        self.users[500] = ({2: "advanced", 3: "advanced"}, [])
+        for user_id in (1, 500):
+            self.holder.update_user(user_id)
+        # the live snapshot is updated right away
+        self.assertEqual(live.query(1)[0][0], 500)
+
+        self.release.set()
+        self.wait_for_rebuild()
+        self.assertIsNot(self.holder.index, live)
+        self.assertEqual(self.holder.index.query(1)[0][0], 500)
+        self.assertMatchesData(self.holder.index)
+
+
+class StandaloneTests(SimpleTestCase):
+    def test_ml_does_not_need_django(self):
+        backend = Path(__file__).resolve().parent.parent
+        check = "import sys, ml.index; assert 'django' not in sys.modules"
+        subprocess.run([sys.executable, "-c", check], cwd=backend, check=True)
+        # the sample at the bottom of matcher.py
+        subprocess.run(
+            [sys.executable, "ml/matcher.py"],
+            cwd=backend,
+            check=True,
+            capture_output=True,
+        )
+
+    def test_workers_boot_without_scipy(self):
+        # the index imports SciPy when it builds its first matrix
+        backend = Path(__file__).resolve().parent.parent
+        check = (
+            "import sys, core.wsgi, api.services\n"
+            "assert not {'scipy', 'sklearn'} & set(sys.modules)"
+        )
+        subprocess.run(
+            [sys.executable, "-c", check],
+            cwd=backend,
+            env={**os.environ, "DJANGO_SETTINGS_MODULE": "core.settings"},
+            check=True,
+        )
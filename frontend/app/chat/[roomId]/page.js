@@ -25,6 +25,7 @@ export default function ChatRoomPage() {
   const [input, setInput] = useState("");
   const [me, setMe] = useState(null);
   const [loadingHistory, setLoadingHistory] = useState(true);
+  const [olderPage, setOlderPage] = useState(null); // cursor link, older messages
 
   const messagesEndRef = useRef(null);
 
@@ -44,21 +45,40 @@ export default function ChatRoomPage() {
     fetchMe();
   }, []);
 
-  // 2) Load chat history from REST API
+  // history pages come newest first; the chat shows oldest first
+  function historyToMessages(results) {
+    return results
+      .map((m) => ({
+        system: false,
+        message: m.text,
+        senderName: m.sender_name,
+        createdAt: m.created_at, // ISO string from backend
+      }))
+      .reverse();
+  }
+
+  async function loadOlder() {
+    if (!olderPage) return;
+    try {
+      const data = await apiGet(olderPage);
+      setMessages((prev) => [...historyToMessages(data.results), ...prev]);
+      setOlderPage(data.next);
+    } catch (err) {
+      console.error("Failed to load older messages:", err);
+    }
+  }
+
+  // 2) Load chat history from REST API (latest page only)
   useEffect(() => {
     if (!roomId) return;
 
     async function loadHistory() {
       try {
         const data = await apiGet(`/api/chat/${roomId}/messages/`);
-        const mapped = data.map((m) => ({
-          system: false,
-          message: m.text,
-          senderName: m.sender_name,
-          createdAt: m.created_at, // ISO string from backend
-        }));
+        const mapped = historyToMessages(data.results);
         console.log("History messages:", mapped);
         setMessages(mapped);
+        setOlderPage(data.next);
       } catch (err) {
         console.error("Failed to load chat history:", err);
       } finally {
@@ -207,6 +227,15 @@ export default function ChatRoomPage() {
             </p>
           )}
 
+          {olderPage && (
+            <button
+              onClick={loadOlder}
+              className="mx-auto text-[11px] text-indigo-300 hover:text-indigo-200 hover:underline"
+            >
+              Load older messages
+            </button>
+          )}
+
           {!loadingHistory && messages.length === 0 && (
             <p className="text-xs sm:text-sm text-slate-400">
               No messages yet. Say hi 👋
@@ -7,6 +7,8 @@ import Link from "next/link";
 
 export default function ConnectionsPage() {
   const [connections, setConnections] = useState([]);
+  const [nextPage, setNextPage] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState("");
   const router = useRouter();
@@ -15,7 +17,8 @@ export default function ConnectionsPage() {
     async function fetchConnections() {
       try {
         const data = await apiGet("/api/connections/");
-        setConnections(data);
+        setConnections(data.results);
+        setNextPage(data.next);
       } catch (err) {
         setError("Session expired. Please login again.");
         if (typeof window !== "undefined") {
@@ -31,6 +34,20 @@ export default function ConnectionsPage() {
     fetchConnections();
   }, [router]);
 
+  async function loadMore() {
+    if (!nextPage) return;
+    setLoadingMore(true);
+    try {
+      const data = await apiGet(nextPage);
+      setConnections((prev) => [...prev, ...data.results]);
+      setNextPage(data.next);
+    } catch (err) {
+      setError("Could not load more connections.");
+    } finally {
+      setLoadingMore(false);
+    }
+  }
+
   return (
     <div className="min-h-screen bg-slate-950 text-slate-50 flex items-start justify-center px-4 py-6 sm:px-6 sm:py-10">
       <div className="w-full max-w-4xl rounded-2xl border border-slate-800 bg-slate-900/70 shadow-2xl px-5 py-6 sm:px-7 sm:py-7 space-y-4">
@@ -165,6 +182,16 @@ export default function ConnectionsPage() {
                 </div>
               );
             })}
+
+            {nextPage && (
+              <button
+                onClick={loadMore}
+                disabled={loadingMore}
+                className="w-full rounded-lg border border-slate-700 px-3 py-2 text-[11px] sm:text-xs text-slate-300 hover:bg-slate-800 disabled:opacity-50"
+              >
+                {loadingMore ? "Loading…" : "Load more"}
+              </button>
+            )}
           </div>
         )}
       </div>
@@ -26,13 +26,13 @@ export default function DashboardPage() {
         const [me, recs, incoming, outgoing] = await Promise.all([
           apiGet("/api/auth/me/"),
           apiGet("/api/recommendations/"),
-          apiGet("/api/requests/incoming/"),
-          apiGet("/api/requests/outgoing/"),
+          apiGet("/api/requests/incoming/?page_size=200"),
+          apiGet("/api/requests/outgoing/?page_size=200"),
         ]);
         setUser(me);
         setMatches(recs);
-        setIncomingRequests(incoming);
-        setOutgoingRequests(outgoing);
+        setIncomingRequests(incoming.results);
+        setOutgoingRequests(outgoing.results);
       } catch (err) {
         setError("Session expired. Please login again.");
         if (typeof window !== "undefined") {
@@ -72,8 +72,8 @@ export default function DashboardPage() {
       setRequestMsg("Request sent successfully ✔");
 
       // refresh outgoing requests so learner sees status
-      const outgoing = await apiGet("/api/requests/outgoing/");
-      setOutgoingRequests(outgoing);
+      const outgoing = await apiGet("/api/requests/outgoing/?page_size=200");
+      setOutgoingRequests(outgoing.results);
     } catch (err) {
       setRequestMsg(
         err?.detail || "Could not send request. Maybe already pending?"
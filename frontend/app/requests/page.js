@@ -7,6 +7,8 @@ import { useRouter } from "next/navigation";
 export default function RequestsPage() {
   const [incoming, setIncoming] = useState([]);
   const [outgoing, setOutgoing] = useState([]);
+  const [nextIncoming, setNextIncoming] = useState(null);
+  const [nextOutgoing, setNextOutgoing] = useState(null);
   const [loading, setLoading] = useState(true);
   const [message, setMessage] = useState("");
   const [activeTab, setActiveTab] = useState("incoming"); // "incoming" | "outgoing"
@@ -18,8 +20,10 @@ export default function RequestsPage() {
         apiGet("/api/requests/incoming/"),
         apiGet("/api/requests/outgoing/"),
       ]);
-      setIncoming(incomingData);
-      setOutgoing(outgoingData);
+      setIncoming(incomingData.results);
+      setOutgoing(outgoingData.results);
+      setNextIncoming(incomingData.next);
+      setNextOutgoing(outgoingData.next);
     } catch (err) {
       setMessage("Error loading requests. Please login again.");
       if (typeof window !== "undefined") {
@@ -37,6 +41,25 @@ export default function RequestsPage() {
     // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [router]);
 
+  // next cursor page of the active tab
+  async function loadMore() {
+    const isIncoming = activeTab === "incoming";
+    const next = isIncoming ? nextIncoming : nextOutgoing;
+    if (!next) return;
+    try {
+      const data = await apiGet(next);
+      if (isIncoming) {
+        setIncoming((prev) => [...prev, ...data.results]);
+        setNextIncoming(data.next);
+      } else {
+        setOutgoing((prev) => [...prev, ...data.results]);
+        setNextOutgoing(data.next);
+      }
+    } catch (err) {
+      setMessage("Could not load more requests.");
+    }
+  }
+
   async function handleIncomingAction(id, action) {
     setMessage("");
     try {
@@ -139,6 +162,16 @@ export default function RequestsPage() {
             onCancel={handleCancelOutgoing}
           />
         )}
+
+        {!loading &&
+          (activeTab === "incoming" ? nextIncoming : nextOutgoing) && (
+            <button
+              onClick={loadMore}
+              className="w-full rounded-lg border border-slate-700 px-3 py-2 text-[11px] sm:text-xs text-slate-300 hover:bg-slate-800"
+            >
+              Load more
+            </button>
+          )}
       </div>
     </div>
   );
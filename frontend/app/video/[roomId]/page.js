@@ -97,7 +97,18 @@ export default function VideoCallPage() {
 
     ws.onmessage = async (event) => {
       const message = JSON.parse(event.data);
-      const { type, payload } = message;
+
+      // the server relays bursts of ICE candidates as one frame
+      if (message.type === "ice-batch") {
+        for (const candidate of message.payload) {
+          await handleSignal(candidate);
+        }
+        return;
+      }
+      await handleSignal(message);
+    };
+
+    async function handleSignal({ type, payload }) {
       console.log("Signal received:", type);
 
       const pc = peerConnectionRef.current;
@@ -121,7 +132,7 @@ export default function VideoCallPage() {
           console.error("Error adding ICE candidate:", err);
         }
       }
-    };
+    }
 
     ws.onerror = (err) => {
       console.error("WebSocket error:", err);
@@ -27,6 +27,7 @@ export async function apiPost(path, body, withAuth = false) {
   return data;
 }
 
+// `path` may also be a full URL, e.g. the `next` link of a paginated response
 export async function apiGet(path) {
   const headers = {};
   if (typeof window !== "undefined") {
@@ -34,7 +35,8 @@ export async function apiGet(path) {
     if (token) headers["Authorization"] = `Bearer ${token}`;
   }
 
-  const res = await fetch(`${BASE_URL}${path}`, { headers });
+  const url = path.startsWith("http") ? path : `${BASE_URL}${path}`;
+  const res = await fetch(url, { headers });
   let data = {};
   try {
     data = await res.json();